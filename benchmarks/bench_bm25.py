@@ -0,0 +1,120 @@
+# Benchmark da pergunta sobre um período (ação "Perguntar sobre um período (Gemini)"): monta, num cache
+# vazio em pasta temporária, um ano de publicações sintéticas (as mesmas da API simulada, mock_doe_api.py)
+# e mede a etapa local que antecede a chamada ao Gemini:
+# - ranqueamento BM25 das publicações do ano pelo índice invertido do cache;
+# - ranqueamento dos trechos das publicações mais relevantes (o que de fato vai ao Gemini).
+# A primeira consulta de cada termo lê as postings do SQLite; as seguintes usam as que o processo já
+# guardou em memória. Sai com código 1 se o p95 da etapa local completa com o processo já "aquecido"
+# (o caso normal do servidor) passar do orçamento (--orcamento-ms); o p95 a frio é apenas informado.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/bench_bm25.py [--dias 250] [--publicacoes-por-dia 80] [--repeticoes 5] [--orcamento-ms 100]
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_PROJETO = os.path.dirname(PASTA_BENCHMARKS)
+PERGUNTAS = [
+    "Quem foi designado promotor substituto na comarca?",
+    "Alguma publicação menciona Eduardo Tostes?",
+    "Quais resoluções tratam de entrância final?",
+    "Houve portarias da procuradoria geral sobre vagas de promotores?",
+    "Bruno Rigoni Barros foi designado para qual cargo?",
+]
+
+def dias_uteis(ultimo_dia, quantidade):
+    dias, dia = [], date.fromisoformat(ultimo_dia)
+    while len(dias) < quantidade:
+        if dia.weekday() < 5: dias.append(dia.isoformat())
+        dia -= timedelta(days=1)
+    return sorted(dias)
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, int(round(fracao * len(ordenados))) - 1))]
+
+def montar_acervo(app, mock, dias, publicacoes_por_dia):
+    # Grava os dias direto no cache (sem HTTP): lista do dia e conteúdo vêm dos geradores da API simulada
+    store = app.get_publication_store()
+    total = 0
+    for dia in dias:
+        publicacoes = []
+        for resumo in mock.gerar_resumo_do_dia(dia, publicacoes_por_dia)["publications"]:
+            if resumo["secondLevelSectionId"] != app.ID_MINISTERIO_PUBLICO_SECOND_LEVEL: continue
+            html = mock.gerar_conteudo(resumo["slug"])["content"]
+            publicacoes.append({"id": resumo["id"], "title": resumo["title"], "slug": resumo["slug"],
+                                "publicationDate": resumo["date"], "publicationTypeId": resumo["publicationTypeId"],
+                                "fullContent": app.clean_text_content(html), "rawHtmlContent": html})
+        store.save_day(dia, publicacoes)
+        total += len(publicacoes)
+    return total
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo da busca BM25 (publicações e trechos) sobre um ano de publicações sintéticas")
+    parser.add_argument("--dias", type=int, default=250, help="Dias úteis do acervo (250 = cerca de um ano).")
+    parser.add_argument("--ultimo-dia", default="2024-06-28")
+    parser.add_argument("--publicacoes-por-dia", type=int, default=80, help="Tamanho médio dos dias (cerca de metade é do MP).")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--orcamento-ms", type=float, default=100.0, help="Máximo para o p95 da etapa local completa.")
+    parser.add_argument("--verboso", action="store_true", help="Mostra as mensagens do app.")
+    args = parser.parse_args()
+
+    pasta_temporaria = tempfile.mkdtemp(prefix="bench_bm25_")
+    diretorio_original = os.getcwd()
+    os.chdir(pasta_temporaria) # O cache do app é criado na pasta de trabalho
+    sys.path.insert(0, PASTA_PROJETO)
+    sys.path.insert(0, PASTA_BENCHMARKS)
+    try:
+        import chatbot_doe_v10_github as app
+        import mock_doe_api as mock
+        dias = dias_uteis(args.ultimo_dia, args.dias)
+        with contextlib.redirect_stdout(sys.stdout if args.verboso else io.StringIO()):
+            inicio = time.perf_counter()
+            total = montar_acervo(app, mock, dias, args.publicacoes_por_dia)
+            segundos_montagem = time.perf_counter() - inicio
+        print(f"Acervo: {len(dias)} dias ({dias[0]} a {dias[-1]}), {total} publicações do MP indexadas em {segundos_montagem:.1f} s "
+              f"({total / segundos_montagem:.0f} publicações/s).\n")
+
+        store = app.get_publication_store()
+        tempos_frios, tempos_ranking, tempos_completos = [], [], []
+        print(f"{'a frio':>9} | {'p50 ranking':>11} | {'p50 completa':>12} | trechos | pergunta")
+        for pergunta in PERGUNTAS:
+            with contextlib.redirect_stdout(sys.stdout if args.verboso else io.StringIO()):
+                frio, _ = medir(lambda: app.retrieve_passages(pergunta, dias[0], dias[-1]), 1)
+                ranking, _ = medir(lambda: store.rank_publications(pergunta, dias[0], dias[-1], app.GEMINI_RETRIEVAL_TOP_PUBLICATIONS), args.repeticoes)
+                completa, (trechos, _) = medir(lambda: app.retrieve_passages(pergunta, dias[0], dias[-1]), args.repeticoes)
+            tempos_frios.extend(frio)
+            tempos_ranking.extend(ranking)
+            tempos_completos.extend(completa)
+            print(f"{frio[0] * 1000:>6.1f} ms | {percentil(ranking, 0.5) * 1000:>8.1f} ms | {percentil(completa, 0.5) * 1000:>9.1f} ms | "
+                  f"{len(trechos):>7} | {pergunta}")
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+    p95_ranking, p95_completa = percentil(tempos_ranking, 0.95) * 1000, percentil(tempos_completos, 0.95) * 1000
+    print(f"\np95: ranking das publicações {p95_ranking:.1f} ms; etapa local completa (com os trechos) {p95_completa:.1f} ms "
+          f"(orçamento: {args.orcamento_ms:.0f} ms); primeira consulta de cada pergunta {percentil(tempos_frios, 0.95) * 1000:.1f} ms")
+    if p95_completa > args.orcamento_ms:
+        print("FALHOU: etapa local acima do orçamento.")
+        return 1
+    print("OK: etapa local dentro do orçamento.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
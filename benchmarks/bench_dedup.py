@@ -0,0 +1,211 @@
+# Benchmark da detecção de publicações repetidas (texto idêntico) e quase idênticas (MinHash + LSH).
+# Usa um cache já preenchido (--banco, copiado para uma pasta temporária; o índice e as impressões
+# digitais são reconstruídos se vierem de uma versão anterior) ou monta, num cache vazio, um acervo
+# sintético com as publicações da API simulada (mock_doe_api.py) em que uma parte é republicação exata
+# de uma publicação anterior e outra parte é quase idêntica (um nome trocado). Mostra:
+# - grupos encontrados e, no acervo sintético, quantas das repetições injetadas foram encontradas;
+# - custo das impressões digitais: tempo na carga e espaço no banco (ao lado do HTML e do texto repetidos, para comparação);
+# - trabalho evitado: limpezas de HTML reaproveitadas, varredura das listas de monitoramento com e sem o
+#   cache por conteúdo (que só ganha ao varrer de novo) e chamadas ao Gemini (modelo simulado) numa análise de todo o acervo.
+# Sai com código 1 se alguma republicação exata injetada não for encontrada.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/bench_dedup.py [--banco DOE_JSONs_Cloud/DOE_MP_cache.sqlite3] [--dias 60] [--publicacoes-por-dia 80]
+#                                      [--fracao-exatas 0.1] [--fracao-quase 0.1]
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_PROJETO = os.path.dirname(PASTA_BENCHMARKS)
+PERGUNTA_GEMINI = "Quem foi designado nesta publicação?"
+
+def dias_uteis(ultimo_dia, quantidade):
+    dias, dia = [], date.fromisoformat(ultimo_dia)
+    while len(dias) < quantidade:
+        if dia.weekday() < 5: dias.append(dia.isoformat())
+        dia -= timedelta(days=1)
+    return sorted(dias)
+
+def megabytes(quantidade_bytes):
+    return f"{quantidade_bytes / 1024 / 1024:.2f} MB"
+
+def montar_acervo(app, mock, dias, publicacoes_por_dia, fracao_exatas, fracao_quase):
+    # Grava os dias direto no cache (sem HTTP), limpando o HTML como o app faz na carga (com o
+    # reaproveitamento de limpezas de HTML idêntico). Devolve os pares (original, cópia) injetados.
+    store = app.get_publication_store()
+    rng = random.Random(42)
+    anteriores, exatas, quase = [], [], []
+    segundos_limpeza = 0.0
+    for dia in dias:
+        publicacoes = []
+        for resumo in mock.gerar_resumo_do_dia(dia, publicacoes_por_dia)["publications"]:
+            if resumo["secondLevelSectionId"] != app.ID_MINISTERIO_PUBLICO_SECOND_LEVEL: continue
+            html = mock.gerar_conteudo(resumo["slug"])["content"]
+            sorteio = rng.random()
+            if anteriores and sorteio < fracao_exatas:
+                original_id, html = rng.choice(anteriores)
+                exatas.append((original_id, resumo["id"]))
+            elif anteriores and sorteio < fracao_exatas + fracao_quase:
+                original_id, html_original = rng.choice(anteriores)
+                # Troca uma palavra do meio do texto por um nome (como numa lista de designação corrigida)
+                palavra = next(palavra for palavra in rng.sample(mock.PALAVRAS, len(mock.PALAVRAS)) if f" {palavra} " in html_original)
+                html = html_original.replace(f" {palavra} ", f" {rng.choice(mock.NOMES)} {rng.choice(mock.SOBRENOMES)} ", 1)
+                quase.append((original_id, resumo["id"]))
+            inicio = time.perf_counter()
+            texto = app.reuse_cleaned_text(html)
+            if texto is None: texto = app.clean_text_content(html)
+            segundos_limpeza += time.perf_counter() - inicio
+            publicacoes.append({"id": resumo["id"], "title": resumo["title"], "slug": resumo["slug"],
+                                "publicationDate": resumo["date"], "publicationTypeId": resumo["publicationTypeId"],
+                                "fullContent": texto, "rawHtmlContent": html})
+        store.save_day(dia, publicacoes)
+        anteriores.extend((pub["id"], pub["rawHtmlContent"]) for pub in publicacoes)
+    return len(anteriores), exatas, quase, segundos_limpeza
+
+def medir_armazenamento(store):
+    with store._lock:
+        consulta = lambda sql: store.conn.execute(sql).fetchone()
+        html_total, = consulta("""SELECT COALESCE(SUM(b.size), 0) FROM publications p JOIN html_blobs b ON b.hash = p.html_hash
+                                  WHERE p.removed_at IS NULL""")
+        html_gravado, html_comprimido = consulta("SELECT COALESCE(SUM(size), 0), COALESCE(SUM(length(data)), 0) FROM html_blobs")
+        texto_total, texto_distinto = consulta("""SELECT COALESCE(SUM(t), 0), COALESCE(SUM(CASE WHEN n = 1 THEN t ELSE t / n END), 0) FROM (
+                                                      SELECT SUM(length(p.full_content)) AS t, COUNT(*) AS n FROM publications p
+                                                      JOIN index_docs d ON d.pub_id = p.id JOIN content_fingerprints f ON f.doc_id = d.doc_id
+                                                      WHERE p.removed_at IS NULL GROUP BY f.content_hash)""")
+        impressoes, = consulta("SELECT COALESCE(SUM(length(content_hash) + COALESCE(length(minhash), 0) + 8), 0) FROM content_fingerprints")
+        bandas, = consulta("SELECT COUNT(*) FROM lsh_bands")
+    return {"html_total": html_total, "html_gravado": html_gravado, "html_comprimido": html_comprimido,
+            "texto_total": texto_total, "texto_distinto": texto_distinto,
+            "impressoes": impressoes + bandas * 16} # 16 bytes por linha de lsh_bands (chave + doc_id), sem contar o índice
+
+def publicacoes_do_acervo(app, store):
+    with store._lock:
+        linhas = store.conn.execute("SELECT id, full_content FROM publications WHERE removed_at IS NULL AND full_content IS NOT NULL").fetchall()
+    return [{"id": linha[0], "fullContent": linha[1]} for linha in linhas if app.has_usable_content(linha[1])]
+
+def encontrados(pares_injetados, grupo_de):
+    return sum(1 for original, copia in pares_injetados if grupo_de.get(original) is not None and grupo_de.get(original) == grupo_de.get(copia))
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo e trabalho poupado da detecção de publicações repetidas")
+    parser.add_argument("--banco", help="Cache já preenchido (DOE_MP_cache.sqlite3). Sem ele, monta um acervo sintético.")
+    parser.add_argument("--dias", type=int, default=60, help="Dias úteis do acervo sintético.")
+    parser.add_argument("--ultimo-dia", default="2024-06-28")
+    parser.add_argument("--publicacoes-por-dia", type=int, default=80, help="Tamanho médio dos dias (cerca de metade é do MP).")
+    parser.add_argument("--fracao-exatas", type=float, default=0.1, help="Fração de republicações exatas no acervo sintético.")
+    parser.add_argument("--fracao-quase", type=float, default=0.1, help="Fração de publicações quase idênticas (um nome trocado).")
+    parser.add_argument("--verboso", action="store_true", help="Mostra as mensagens do app.")
+    args = parser.parse_args()
+
+    # Gemini simulado sem latência: interessa o número de chamadas, não o tempo de cada uma
+    os.environ.update({"GEMINI_FAKE_MODEL": "1", "GEMINI_FAKE_FIRST_TOKEN_SECONDS": "0", "GEMINI_FAKE_TOKEN_DELAY_SECONDS": "0",
+                       "GEMINI_CACHE_MAX_ENTRIES": "1000000"})
+    pasta_temporaria = tempfile.mkdtemp(prefix="bench_dedup_")
+    banco = os.path.abspath(args.banco) if args.banco else None
+    diretorio_original = os.getcwd()
+    os.chdir(pasta_temporaria) # O cache do app é criado na pasta de trabalho
+    sys.path.insert(0, PASTA_PROJETO)
+    sys.path.insert(0, PASTA_BENCHMARKS)
+    silencio = lambda: contextlib.redirect_stdout(sys.stdout if args.verboso else io.StringIO())
+    exatas = quase = None
+    try:
+        import chatbot_doe_v10_github as app
+        import mock_doe_api as mock
+        if banco:
+            os.makedirs(os.path.dirname(app.PATH_DB_FILE) or ".", exist_ok=True)
+            shutil.copyfile(banco, app.PATH_DB_FILE)
+        with silencio():
+            inicio = time.perf_counter()
+            store = app.get_publication_store() # Reconstrói o índice (e as impressões digitais) se a versão mudou
+            if banco: total = store.conn.execute("SELECT COUNT(*) FROM publications WHERE removed_at IS NULL").fetchone()[0]
+            else:
+                dias = dias_uteis(args.ultimo_dia, args.dias)
+                total, exatas, quase, segundos_limpeza = montar_acervo(app, mock, dias, args.publicacoes_por_dia, args.fracao_exatas, args.fracao_quase)
+            segundos_montagem = time.perf_counter() - inicio
+        origem = banco if banco else f"sintético, {len(dias)} dias ({dias[0]} a {dias[-1]})"
+        print(f"Acervo: {origem}; {total} publicações, prontas em {segundos_montagem:.1f} s.")
+        if exatas is not None: print(f"Injetadas: {len(exatas)} republicações exatas e {len(quase)} quase idênticas.")
+
+        publicacoes = publicacoes_do_acervo(app, store)
+        ids = [pub["id"] for pub in publicacoes]
+        with silencio():
+            inicio = time.perf_counter()
+            grupos = app.find_duplicate_groups(ids)
+            segundos_grupos = time.perf_counter() - inicio
+        grupo_de = {membro["id"]: i for i, grupo in enumerate(grupos) for membro in grupo}
+        identicos = sum(1 for grupo in grupos if all(membro["similarity"] == 1.0 for membro in grupo))
+        print(f"\n== Detecção ==\n{len(grupos)} grupos ({identicos} só de textos idênticos) com {len(grupo_de)} publicações, "
+              f"em {segundos_grupos * 1000:.0f} ms para o acervo todo ({segundos_grupos / max(1, len(ids)) * 1e6:.0f} µs por publicação).")
+        falhas = []
+        if exatas is not None:
+            exatas_encontradas, quase_encontradas = encontrados(exatas, grupo_de), encontrados(quase, grupo_de)
+            print(f"Encontradas: {exatas_encontradas}/{len(exatas)} republicações exatas e {quase_encontradas}/{len(quase)} quase idênticas "
+                  f"(limiar {app.NEAR_DUPLICATE_THRESHOLD:.2f}).")
+            if exatas_encontradas < len(exatas): falhas.append("republicações exatas não encontradas")
+        # Na carga, a impressão digital usa os termos que o índice já tokenizou: mede-se só o que ela acrescenta
+        termos_da_amostra = [[termo for termo, _ in app.tokenize_for_index(pub["fullContent"])] for pub in publicacoes[:500]]
+        inicio = time.perf_counter()
+        for termos in termos_da_amostra: app.lsh_band_keys(app.minhash_signature(termos))
+        print(f"Custo da impressão digital na carga: {(time.perf_counter() - inicio) / max(1, len(termos_da_amostra)) * 1e6:.0f} µs por publicação "
+              f"({sum(map(len, termos_da_amostra)) / max(1, len(termos_da_amostra)):.0f} termos em média).")
+
+        armazenamento = medir_armazenamento(store)
+        print(f"\n== Espaço no banco ==\nImpressões digitais (sha256, MinHash e bandas do LSH): {megabytes(armazenamento['impressoes'])} a mais.")
+        print(f"Para comparação: HTML bruto das publicações {megabytes(armazenamento['html_total'])}, gravado uma vez por conteúdo "
+              f"pelo formato compacto, independente das impressões digitais ({megabytes(armazenamento['html_gravado'])}, "
+              f"{megabytes(armazenamento['html_comprimido'])} comprimido).")
+        print(f"Texto limpo: {megabytes(armazenamento['texto_total'])}, dos quais {megabytes(armazenamento['texto_total'] - armazenamento['texto_distinto'])} "
+              f"repetem o texto de outra publicação (mantidos por linha: é a coluna lida nas buscas).")
+
+        print("\n== Trabalho evitado ==")
+        if exatas is not None:
+            _, contadores = app.get_metrics().snapshot()
+            reaproveitadas, limpas = contadores.get("html_cleaning_reused", 0), contadores.get("html_cleaning_needed", 0)
+            por_limpeza = segundos_limpeza / max(1, limpas)
+            print(f"Limpeza de HTML: {reaproveitadas} de {reaproveitadas + limpas} reaproveitadas de um HTML idêntico "
+                  f"(cerca de {reaproveitadas * por_limpeza:.1f} s poupados de {segundos_limpeza:.1f} s).")
+
+        watch_lists = app.watch_lists_from_config(app.DEFAULT_SEARCH_TERMS_CONFIG)
+        matcher = app.get_watch_list_matcher(watch_lists)
+        inicio = time.perf_counter()
+        for pub in publicacoes: matcher.scan(pub["fullContent"])
+        segundos_sem_cache = time.perf_counter() - inicio
+        app.get_watch_list_scan_cache()["entries"].clear()
+        segundos_com_cache = []
+        with silencio():
+            for _ in range(2): # A primeira passada preenche o cache; a segunda é a de uma nova varredura do período
+                inicio = time.perf_counter()
+                app.search_publications_for_watch_lists(publicacoes)
+                segundos_com_cache.append(time.perf_counter() - inicio)
+        textos_distintos = len({pub["fullContent"] for pub in publicacoes})
+        print(f"Listas de monitoramento: {len(publicacoes)} publicações, {textos_distintos} textos distintos; "
+              f"{segundos_sem_cache * 1000:.0f} ms varrendo todas x {segundos_com_cache[0] * 1000:.0f} ms na primeira passada com o cache "
+              f"por conteúdo (sem ganho: cada texto distinto ainda é varrido) e {segundos_com_cache[1] * 1000:.0f} ms ao varrer o mesmo período de novo.")
+
+        _, antes = app.get_metrics().snapshot()
+        with silencio():
+            respostas = app.analyze_publications_batch(publicacoes, PERGUNTA_GEMINI, max_concurrent=8, requests_per_minute=0)
+        _, depois = app.get_metrics().snapshot()
+        chamadas = depois.get("gemini_cache_misses", 0) - antes.get("gemini_cache_misses", 0)
+        falhas_gemini = sum(1 for resposta in respostas if app.is_gemini_failure(resposta))
+        print(f"Gemini: análise de todo o acervo com {chamadas} chamadas para {len(publicacoes)} publicações "
+              f"({len(publicacoes) - chamadas} evitadas; {falhas_gemini} falhas).")
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+    print()
+    for falha in falhas: print(f"FALHOU: {falha}")
+    if not falhas: print("OK: todas as republicações exatas foram agrupadas." if exatas is not None else "OK.")
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# Benchmark e verificação dos extratores de texto de clean_text_content (HTML_TEXT_EXTRACTORS).
+# O corpus é o rawHtmlContent salvo no cache SQLite (se houver) completado com publicações
+# sintéticas no formato do DOE. Cada extrator é conferido contra o de referência ("html.parser",
+# o BeautifulSoup original): a saída precisa ser idêntica, caractere a caractere.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/bench_html_extraction.py [--banco DOE_JSONs_Cloud/DOE_MP_cache.sqlite3]
+#                                                [--amostras 300] [--repeticoes 3] [--processos 4]
+# Sai com código 1 se algum extrator divergir da referência.
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatbot_doe_v10_github as app # noqa: E402
+
+EXTRATOR_REFERENCIA = "html.parser"
+PALAVRAS = ("designar promotor promotora justiça comarca substituto resolução artigo processo ministério público "
+            "procuradoria geral estado paulo secretaria exercício cargo vaga entrância final inicial portaria").split()
+ENTIDADES = ("&nbsp;", "&amp;", "&ordm;", "&ccedil;", "&atilde;", "&#8211;", "&#150;", "&quot;", "&lt;", "&gt;")
+
+def frase(rng, tamanho):
+    palavras = [rng.choice(PALAVRAS) for _ in range(tamanho)]
+    for _ in range(tamanho // 12): # Algumas entidades no meio do texto
+        palavras.insert(rng.randrange(len(palavras)), rng.choice(ENTIDADES))
+    return " ".join(palavras)
+
+def gerar_publicacao(rng):
+    # Estrutura parecida com a das publicações do DOE: título, parágrafos com estilos inline,
+    # quebras de linha, tabelas, listas, comentários e um ou outro bloco de estilo
+    partes = ['<div class="publicacao"><!-- cabeçalho -->',
+              f'<p style="text-align:center"><strong>RESOLUÇÃO Nº {rng.randint(1, 2000)}/2024</strong></p>']
+    if rng.random() < 0.3: partes.append("<style>p { margin: 0 }</style>")
+    for _ in range(rng.randint(3, 40)):
+        escolha = rng.random()
+        if escolha < 0.6:
+            partes.append(f'<p class="texto"><span style="font-size:11pt">{frase(rng, rng.randint(5, 80))}</span></p>\n')
+        elif escolha < 0.75:
+            partes.append(f"<p>{frase(rng, 8)}<br>{frase(rng, 8)}<br/>\n{frase(rng, 4)}</p>")
+        elif escolha < 0.9:
+            linhas = "".join(f"<tr><td>{frase(rng, 3)}</td><td> {frase(rng, 5)} </td></tr>\n" for _ in range(rng.randint(1, 8)))
+            partes.append(f"<table><tbody>{linhas}</tbody></table>")
+        else:
+            itens = "".join(f"<li>{frase(rng, 6)}</li>" for _ in range(rng.randint(1, 5)))
+            partes.append(f"<ul>{itens}</ul>\n\n")
+    partes.append("</div>")
+    return "".join(partes)
+
+def carregar_corpus(caminho_banco, amostras, rng):
+    corpus = []
+    if caminho_banco and os.path.exists(caminho_banco):
+        conn = sqlite3.connect(caminho_banco)
+        try:
+            corpus = [linha[0] for linha in conn.execute(
+                "SELECT raw_html FROM publications WHERE raw_html IS NOT NULL AND raw_html != '' LIMIT ?", (amostras,))]
+        except sqlite3.Error as e:
+            print(f"Aviso: não foi possível ler {caminho_banco}: {e}")
+        finally:
+            conn.close()
+    reais = len(corpus)
+    while len(corpus) < amostras: corpus.append(gerar_publicacao(rng))
+    return corpus, reais
+
+def verificar(corpus):
+    # {extrator: número de documentos com saída diferente da referência}
+    referencia = [app.clean_text_content(html, EXTRATOR_REFERENCIA) for html in corpus]
+    divergencias = {}
+    for nome in app.HTML_TEXT_EXTRACTORS:
+        if nome == EXTRATOR_REFERENCIA: continue
+        divergencias[nome] = sum(1 for html, esperado in zip(corpus, referencia) if app.clean_text_content(html, nome) != esperado)
+    return divergencias
+
+def cronometrar(funcao, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark e verificação dos extratores de texto do HTML")
+    parser.add_argument("--banco", default=app.PATH_DB_FILE, help="Cache SQLite com rawHtmlContent salvo.")
+    parser.add_argument("--amostras", type=int, default=300)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="Processos para a limpeza em lote.")
+    args = parser.parse_args()
+
+    corpus, reais = carregar_corpus(args.banco, args.amostras, random.Random(42))
+    tamanho_mb = sum(len(html.encode("utf-8")) for html in corpus) / 1e6
+    print(f"Corpus: {len(corpus)} documentos ({reais} do cache, {len(corpus) - reais} sintéticos), {tamanho_mb:.1f} MB")
+
+    divergencias = verificar(corpus)
+    for nome, quantidade in divergencias.items():
+        print(f"Verificação '{nome}' x '{EXTRATOR_REFERENCIA}': " + ("saída idêntica" if not quantidade else f"{quantidade} documento(s) divergentes"))
+
+    print(f"{'extrator':>22} | {'docs/s':>8} | {'MB/s':>6} | {'ganho':>6}")
+    tempo_referencia = None
+    for nome in app.HTML_TEXT_EXTRACTORS:
+        tempo = cronometrar(lambda: [app.clean_text_content(html, nome) for html in corpus], args.repeticoes)
+        tempo_referencia = tempo_referencia or tempo
+        print(f"{nome:>22} | {len(corpus) / tempo:>8.0f} | {tamanho_mb / tempo:>6.1f} | {tempo_referencia / tempo:>5.1f}x")
+
+    if args.processos > 1: # Limpeza em lote do backfill (extrator padrão, pool já aquecido)
+        app.clean_html_batch(corpus[:args.processos * 2], args.processos)
+        tempo = cronometrar(lambda: app.clean_html_batch(corpus, args.processos), args.repeticoes)
+        nome = f"lote {app.HTML_TEXT_EXTRACTOR} x{args.processos}"
+        print(f"{nome:>22} | {len(corpus) / tempo:>8.0f} | {tamanho_mb / tempo:>6.1f} | {tempo_referencia / tempo:>5.1f}x")
+
+    return 1 if any(divergencias.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# Suíte de benchmarks do app sem rede: sobe a API do DOE simulada (mock_doe_api.py), usa o modelo
+# Gemini falso (GEMINI_FAKE_MODEL=1) e mede, num cache vazio em pasta temporária, a carga de dias
+# (cache frio e quente), a busca local (por termos e BM25), a exportação das resoluções (pasta e ZIP) e a análise com o Gemini.
+# O resultado vai para um JSON, para comparar versões:
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/bench_suite.py [--dias 5] [--latencia-ms 80] [--taxa-erro 0] [--taxa-429 0]
+#                                      [--latencia-gemini-ms 300] [--saida benchmarks/resultados/AAAAMMDD-HHMMSS.json]
+#                                      [--comparar resultado_anterior.json] [--tolerancia 0.2]
+# Com --comparar, mostra a razão entre os tempos e sai com código 1 se algum caso ficou mais lento
+# que o anterior além da tolerância (0.2 = 20%).
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_PROJETO = os.path.dirname(PASTA_BENCHMARKS)
+TERMOS_BUSCA = ["Eduardo Tostes", "promotor substituto", "comarca", "Rigoni Barros", "entrância final"]
+PERGUNTA_GEMINI = "Quais promotores foram designados e para quais comarcas?"
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def dias_uteis(ultimo_dia, quantidade):
+    dias, dia = [], date.fromisoformat(ultimo_dia)
+    while len(dias) < quantidade:
+        if dia.weekday() < 5: dias.append(dia.isoformat())
+        dia -= timedelta(days=1)
+    return sorted(dias)
+
+def versao_do_codigo():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=PASTA_PROJETO, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def cronometrar(funcao, repeticoes=1):
+    # Melhor tempo entre as repetições e o valor devolvido pela última
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+def medida(segundos, itens, unidade):
+    return {"segundos": round(segundos, 6), "itens": itens, "unidade": unidade,
+            "itens_por_segundo": round(itens / segundos, 2) if segundos > 0 else None}
+
+def executar_suite(app, args, pasta_temporaria):
+    resultados = {}
+    store, cache_dias = app.get_publication_store(), app.get_day_dataset_cache()
+    dias = dias_uteis(args.ultimo_dia, args.dias * 2)
+    dias_completos, dias_preguicosos = dias[:args.dias], dias[args.dias:]
+
+    def registrar(nome, segundos, itens, unidade):
+        resultados[nome] = medida(segundos, itens, unidade)
+        print(f"{nome:>28} | {segundos * 1000:>10.1f} ms | {itens:>6} {unidade}", file=sys.__stdout__, flush=True)
+
+    # Carga de um dia com todo o conteúdo (backfill e DOE_LAZY_CONTENT=0), com o cache vazio
+    segundos, publicacoes = cronometrar(lambda: sum(len(app.fetch_day_once(dia) or []) for dia in dias_completos))
+    registrar("carga_dia_frio_completa", segundos / len(dias_completos), len(dias_completos), "dias")
+    resultados["carga_dia_frio_completa"]["publicacoes"] = publicacoes
+
+    # Carga em duas fases: tempo até a lista de títulos e, depois, até todo o conteúdo
+    inicio = time.perf_counter()
+    for dia in dias_preguicosos: app.fetch_day_once(dia, summary_only=True)
+    segundos_lista = time.perf_counter() - inicio
+    registrar("carga_dia_frio_lista", segundos_lista / len(dias_preguicosos), len(dias_preguicosos), "dias")
+    segundos, _ = cronometrar(lambda: [app.ensure_publications_content(cache_dias.get(dia)) for dia in dias_preguicosos])
+    registrar("carga_dia_frio_conteudo", segundos / len(dias_preguicosos), len(dias_preguicosos), "dias")
+
+    # Cache quente: do banco SQLite (entrada da memória invalidada) e da memória do processo
+    def carregar_do_banco():
+        for dia in dias:
+            cache_dias.invalidate(dia)
+            cache_dias.get(dia)
+    segundos, _ = cronometrar(carregar_do_banco, args.repeticoes)
+    registrar("carga_dia_quente_sqlite", segundos / len(dias), len(dias), "dias")
+    segundos, _ = cronometrar(lambda: [cache_dias.get(dia) for dia in dias], args.repeticoes)
+    registrar("carga_dia_quente_memoria", segundos / len(dias), len(dias), "dias")
+
+    # Busca local: índice invertido no período todo e listas de monitoramento dia a dia
+    segundos, _ = cronometrar(lambda: [store.search(termo, dias[0], dias[-1]) for termo in TERMOS_BUSCA], args.repeticoes)
+    registrar("busca_indice_periodo", segundos / len(TERMOS_BUSCA), len(TERMOS_BUSCA), "termos")
+    segundos, _ = cronometrar(lambda: app.retrieve_passages(PERGUNTA_GEMINI, dias[0], dias[-1]), args.repeticoes)
+    registrar("pergunta_periodo_bm25", segundos, 1, "perguntas")
+    segundos, _ = cronometrar(lambda: [app.search_publications_for_terms_local(cache_dias.get(dia), TERMOS_BUSCA[:2], day=dia)
+                                       for dia in dias], args.repeticoes)
+    registrar("busca_termos_dia", segundos / len(dias), len(dias), "dias")
+    segundos, _ = cronometrar(lambda: [app.search_publications_for_watch_lists(cache_dias.get(dia)) for dia in dias], args.repeticoes)
+    registrar("listas_monitoramento_dia", segundos / len(dias), len(dias), "dias")
+
+    # Exportação das resoluções do MP em HTML (uma pasta nova a cada execução)
+    publicacoes = [pub for dia in dias for pub in cache_dias.get(dia)]
+    resolucoes = sum(1 for pub in publicacoes if pub.get("publicationTypeId") == app.ID_TIPO_RESOLUCAO)
+    pasta_html = os.path.join(pasta_temporaria, "resolucoes_html")
+    segundos, _ = cronometrar(lambda: app.save_resolutions_as_html_files(publicacoes, pasta_html))
+    registrar("exportacao_resolucoes", segundos, resolucoes, "resoluções")
+    segundos, exportacao = cronometrar(lambda: app.export_resolutions_zip(dias[0], dias[-1]), args.repeticoes)
+    registrar("exportacao_resolucoes_zip", segundos, exportacao["count"], "resoluções")
+    os.remove(exportacao["path"])
+
+    # Análise em lote com o Gemini falso: respostas novas e, em seguida, as mesmas vindas do cache
+    amostra = [pub for pub in publicacoes if app.has_usable_content(pub.get("fullContent"))][:args.publicacoes_gemini]
+    analisar = lambda: app.analyze_publications_batch(amostra, PERGUNTA_GEMINI, max_concurrent=args.gemini_simultaneas, requests_per_minute=0)
+    segundos, respostas = cronometrar(analisar)
+    registrar("gemini_lote_frio", segundos, len(amostra), "publicações")
+    resultados["gemini_lote_frio"]["falhas"] = sum(1 for resposta in respostas if app.is_gemini_failure(resposta))
+    segundos, _ = cronometrar(analisar, args.repeticoes)
+    registrar("gemini_lote_quente", segundos, len(amostra), "publicações")
+    if amostra:
+        segundos, _ = cronometrar(lambda: app.answer_open_question(amostra[0]["fullContent"], f"{PERGUNTA_GEMINI} (isolada)"))
+        registrar("gemini_pergunta_unica", segundos, 1, "publicações")
+    return resultados
+
+def comparar(resultados, caminho_anterior, tolerancia):
+    # Razão tempo_atual / tempo_anterior por caso; devolve os casos mais lentos que a tolerância
+    with open(caminho_anterior, encoding="utf-8") as f: anterior = json.load(f)
+    print(f"\nComparação com {caminho_anterior} (versão {anterior.get('versao')}):")
+    regressoes = []
+    for nome, atual in resultados.items():
+        antes = anterior.get("resultados", {}).get(nome)
+        if not antes or not antes.get("segundos"):
+            print(f"{nome:>28} | novo")
+            continue
+        razao = atual["segundos"] / antes["segundos"]
+        marcador = ""
+        if razao > 1 + tolerancia:
+            regressoes.append(nome)
+            marcador = "  <-- mais lento"
+        print(f"{nome:>28} | {razao:>6.2f}x o tempo anterior{marcador}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks do app com a API do DOE e o Gemini simulados")
+    parser.add_argument("--dias", type=int, default=5, help="Dias úteis em cada fase (carga completa e em duas fases).")
+    parser.add_argument("--ultimo-dia", default="2024-06-28", help="Os dias medidos são os dias úteis até esta data.")
+    parser.add_argument("--publicacoes-por-dia", type=int, default=40, help="Tamanho médio dos dias sintéticos.")
+    parser.add_argument("--gravacoes", help="Pasta com respostas gravadas da API (ver mock_doe_api.py).")
+    parser.add_argument("--latencia-ms", type=float, default=80.0, help="Latência da API simulada.")
+    parser.add_argument("--variacao-ms", type=float, default=40.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 503 da API simulada.")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429 da API simulada.")
+    parser.add_argument("--taxa", type=float, default=0.0, help="DOE_FETCH_RATE_PER_SECOND do app (0 desativa o limite).")
+    parser.add_argument("--latencia-gemini-ms", type=float, default=300.0, help="Tempo até o primeiro token do Gemini falso.")
+    parser.add_argument("--publicacoes-gemini", type=int, default=12)
+    parser.add_argument("--gemini-simultaneas", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições dos casos com cache quente (vale o melhor tempo).")
+    parser.add_argument("--saida", help="Arquivo JSON de resultados. Padrão: benchmarks/resultados/AAAAMMDD-HHMMSS.json")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior, para comparar.")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--verboso", action="store_true", help="Mostra as mensagens do app durante a suíte.")
+    args = parser.parse_args()
+
+    # O app lê a configuração ao ser importado: ambiente e pasta de trabalho (cache vazio) vêm antes
+    porta = porta_livre()
+    os.environ.update({"DOE_API_BASE_URL": f"http://127.0.0.1:{porta}/v2", "GEMINI_FAKE_MODEL": "1",
+                       "GEMINI_FAKE_FIRST_TOKEN_SECONDS": str(args.latencia_gemini_ms / 1000),
+                       "GEMINI_FAKE_TOKEN_DELAY_SECONDS": "0.002", "DOE_FETCH_RATE_PER_SECOND": str(args.taxa)})
+    gravacoes = os.path.abspath(args.gravacoes) if args.gravacoes else None
+    saida = os.path.abspath(args.saida or os.path.join(PASTA_BENCHMARKS, "resultados", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"))
+    pasta_temporaria = tempfile.mkdtemp(prefix="bench_doe_")
+    diretorio_original = os.getcwd()
+    os.chdir(pasta_temporaria)
+    sys.path.insert(0, PASTA_PROJETO)
+    import chatbot_doe_v10_github as app
+    from mock_doe_api import MockDOEAPI
+
+    servidor = MockDOEAPI(porta, gravacoes, args.latencia_ms, args.variacao_ms, args.taxa_erro, args.taxa_429,
+                          args.publicacoes_por_dia).iniciar()
+    print(f"API simulada em {servidor.base_url}; cache temporário em {pasta_temporaria}\n")
+    try:
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verboso else io.StringIO()): # Os prints do app
+            resultados = executar_suite(app, args, pasta_temporaria)
+        duracao = time.perf_counter() - inicio
+    finally:
+        servidor.parar()
+        os.chdir(diretorio_original)
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+    relatorio = {"suite": "bench_suite", "versao": versao_do_codigo(), "criado_em": datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(),
+                 "parametros": {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "comparar", "verboso")},
+                 "duracao_segundos": round(duracao, 3), "servidor": servidor.contadores,
+                 "cliente_doe": app.get_doe_client().get_stats(), "resultados": resultados,
+                 "metricas_do_app": dict(zip(("etapas", "contadores"), app.get_metrics().snapshot()))}
+    os.makedirs(os.path.dirname(saida), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f: json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nAPI simulada: {servidor.contadores}")
+    print(f"Resultados gravados em {saida}")
+    if args.comparar and comparar(resultados, args.comparar, args.tolerancia): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# Benchmark: listas de monitoramento com o laço atual (uma varredura por termo)
+# versus o autômato Aho–Corasick (WatchListMatcher), com 10, 100 e 1000 termos.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/bench_watchlist_matcher.py [--publicacoes 60] [--repeticoes 3]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatbot_doe_v10_github as app # noqa: E402
+
+PALAVRAS = ("designar promotor promotora justiça comarca substituto resolução artigo processo ministério público "
+            "procuradoria geral estado paulo secretaria exercício cargo vaga entrância final inicial portaria "
+            "atribuições auxiliar criminal cível infância juventude execução ofício regional").split()
+NOMES = "alice bruno carla daniel eduardo fernanda gustavo helena igor julia lucas mariana nuno otavio paula rafael".split()
+SOBRENOMES = "almeida barros costa dias ferreira gomes lima martins nunes oliveira pereira ribeiro santos silva tostes".split()
+
+def gerar_termos(quantidade, rng):
+    termos = set()
+    while len(termos) < quantidade:
+        termos.add(f"{rng.choice(NOMES).title()} {rng.choice(SOBRENOMES).title()} {rng.choice(SOBRENOMES).title()}")
+    return sorted(termos)
+
+def gerar_publicacao(rng, termos, tamanho_palavras=1500):
+    palavras = [rng.choice(PALAVRAS) for _ in range(tamanho_palavras)]
+    for _ in range(3): # Algumas menções a nomes das listas
+        palavras.insert(rng.randrange(len(palavras)), rng.choice(termos).upper())
+    return " ".join(palavras)
+
+def laco_atual(publicacoes, termos):
+    # Mesmo critério do código original: term.lower() in content.lower(), termo a termo
+    return [[termo for termo in termos if termo.lower() in texto.lower()] for texto in publicacoes]
+
+def automato(matcher, publicacoes):
+    return [matcher.scan(texto) for texto in publicacoes]
+
+def cronometrar(funcao, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das listas de monitoramento: laço atual x autômato")
+    parser.add_argument("--publicacoes", type=int, default=60)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'termos':>6} | {'laço atual (ms)':>15} | {'compilação (ms)':>15} | {'autômato (ms)':>13} | {'ganho':>6}")
+    for quantidade in (10, 100, 1000):
+        termos = gerar_termos(quantidade, rng)
+        publicacoes = [gerar_publicacao(rng, termos) for _ in range(args.publicacoes)]
+        listas = (("benchmark", tuple(termos)),)
+
+        inicio = time.perf_counter()
+        matcher = app.WatchListMatcher(listas)
+        tempo_compilacao = time.perf_counter() - inicio
+
+        # Os dois métodos devem encontrar os mesmos termos: os nomes gerados são ASCII e nenhum
+        # deles aparece dentro de outra palavra (onde o laço atual casaria e o autômato não)
+        esperado = [set(encontrados) for encontrados in laco_atual(publicacoes, termos)]
+        obtido = [{occ["term"] for occ in hits.get("benchmark", [])} for hits in automato(matcher, publicacoes)]
+        assert esperado == obtido, "Autômato e laço atual divergiram"
+
+        tempo_laco = cronometrar(lambda: laco_atual(publicacoes, termos), args.repeticoes)
+        tempo_automato = cronometrar(lambda: automato(matcher, publicacoes), args.repeticoes)
+        print(f"{quantidade:>6} | {tempo_laco * 1000:>15.1f} | {tempo_compilacao * 1000:>15.1f} | "
+              f"{tempo_automato * 1000:>13.1f} | {tempo_laco / tempo_automato:>5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Verificação do tempo de importação do app (o que todo início a frio do servidor paga), a partir de
+# `python -X importtime`. Mostra os módulos que mais pesam na importação e sai com código 1 se:
+# - o custo próprio do app (importação total menos a do streamlit, que o servidor já carrega) passar
+#   do orçamento; ou
+# - alguma biblioteca que deve ser importada só no primeiro uso (requests, bs4, google.generativeai)
+#   for carregada já na importação.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/check_import_time.py [--orcamento-ms 250] [--repeticoes 5] [--top 15]
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULO_APP = "chatbot_doe_v10_github"
+MODULO_STREAMLIT = "streamlit"
+IMPORTACOES_ADIADAS = ("requests", "bs4", "google.generativeai")
+LINHA_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def medir_importacao():
+    # [(nível, módulo, próprio_us, acumulado_us), ...] na ordem em que o Python os imprime
+    resultado = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULO_APP}"], cwd=PASTA_PROJETO,
+                               capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=PASTA_PROJETO))
+    if resultado.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {MODULO_APP}:\n{resultado.stderr[-2000:]}")
+    modulos = []
+    for linha in resultado.stderr.splitlines():
+        casamento = LINHA_IMPORTTIME.match(linha)
+        if casamento:
+            proprio, acumulado, recuo, nome = casamento.groups()
+            modulos.append((len(recuo) // 2, nome, int(proprio), int(acumulado)))
+    return modulos
+
+def subarvore_do_app(modulos):
+    # O -X importtime imprime cada módulo depois dos que ele importa: a subárvore do app são as linhas
+    # entre a linha de nível 0 anterior (importações do início do interpretador) e a do próprio app
+    fim = max(i for i, (nivel, nome, _, _) in enumerate(modulos) if nivel == 0 and nome == MODULO_APP)
+    inicio = fim
+    while inicio > 0 and modulos[inicio - 1][0] > 0: inicio -= 1
+    return modulos[inicio:fim + 1]
+
+def resumir(modulos):
+    subarvore = subarvore_do_app(modulos)
+    total_us = subarvore[-1][3]
+    streamlit_us = sum(acumulado for nivel, nome, _, acumulado in subarvore if nivel == 1 and nome == MODULO_STREAMLIT)
+    carregados = {nome for _, nome, _, _ in subarvore}
+    adiadas_carregadas = [nome for nome in IMPORTACOES_ADIADAS if nome in carregados]
+    return total_us, streamlit_us, adiadas_carregadas
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação do app (início a frio)")
+    parser.add_argument("--orcamento-ms", type=float, default=250.0, help="Máximo para o custo próprio do app (sem o streamlit).")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Vale a menor medida (o sistema de arquivos oscila).")
+    parser.add_argument("--top", type=int, default=15, help="Quantos módulos mostrar no relatório.")
+    args = parser.parse_args()
+
+    melhor = None
+    for _ in range(max(1, args.repeticoes)):
+        modulos = medir_importacao()
+        total_us, streamlit_us, adiadas_carregadas = resumir(modulos)
+        if melhor is None or total_us - streamlit_us < melhor[1] - melhor[2]: melhor = (modulos, total_us, streamlit_us, adiadas_carregadas)
+    modulos, total_us, streamlit_us, adiadas_carregadas = melhor
+    custo_app_ms = (total_us - streamlit_us) / 1000
+
+    print(f"Importação de {MODULO_APP}: {total_us / 1000:.0f} ms no total, {streamlit_us / 1000:.0f} ms do streamlit, "
+          f"{custo_app_ms:.0f} ms do próprio app (orçamento: {args.orcamento_ms:.0f} ms)")
+    print(f"\n{'acumulado (ms)':>14} | {'próprio (ms)':>12} | módulo (importado diretamente pelo app)")
+    diretos = sorted((modulo for modulo in subarvore_do_app(modulos) if modulo[0] == 1), key=lambda modulo: modulo[3], reverse=True)
+    for _, nome, proprio, acumulado in diretos[:args.top]:
+        print(f"{acumulado / 1000:>14.1f} | {proprio / 1000:>12.1f} | {nome}")
+
+    falhas = []
+    if custo_app_ms > args.orcamento_ms:
+        falhas.append(f"custo próprio do app ({custo_app_ms:.0f} ms) acima do orçamento ({args.orcamento_ms:.0f} ms)")
+    if adiadas_carregadas:
+        falhas.append(f"importadas já no início (deveriam ser só no primeiro uso): {', '.join(adiadas_carregadas)}")
+    print()
+    for falha in falhas: print(f"FALHOU: {falha}")
+    if not falhas: print("OK: importação dentro do orçamento e sem as bibliotecas adiadas.")
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
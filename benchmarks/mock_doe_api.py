@@ -0,0 +1,205 @@
+# Servidor local que imita a API do DOE (/summary/list e /publications/{slug}), para medir o app
+# sem rede e sem depender do servidor real. As respostas vêm de gravações (um JSON por resposta,
+# exatamente como a API devolve) ou, quando não há gravação, de publicações sintéticas geradas de
+# forma determinística a partir da data e do slug. Latência, erros 5xx e 429 (com Retry-After) são
+# configuráveis.
+#
+# Gravações (--gravacoes PASTA):
+#     PASTA/summary/AAAA-MM-DD.json    corpo de /summary/list para a data
+#     PASTA/publications/<slug>.json   corpo de /publications/<slug>
+# Para gerar as gravações a partir do cache SQLite já preenchido pelo app:
+#     python benchmarks/mock_doe_api.py --exportar-cache DOE_JSONs_Cloud/DOE_MP_cache.sqlite3 --gravacoes gravacoes_doe
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/mock_doe_api.py [--porta 8765] [--gravacoes PASTA] [--latencia-ms 80] [--variacao-ms 40]
+#                                       [--taxa-erro 0.02] [--taxa-429 0.05] [--publicacoes-por-dia 40]
+#     DOE_API_BASE_URL=http://127.0.0.1:8765/v2 streamlit run chatbot_doe_v10_github.py
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chatbot_doe_v10_github as app # noqa: E402
+
+ID_OUTRA_SECAO = "00000000-0000-0000-0000-000000000000" # Publicações de outros órgãos, que o app descarta
+ID_OUTRO_TIPO = "11111111-1111-1111-1111-111111111111"
+PALAVRAS = ("designar promotor promotora justiça comarca substituto resolução artigo processo ministério público "
+            "procuradoria geral estado paulo secretaria exercício cargo vaga entrância final inicial portaria").split()
+NOMES = "Alice Bruno Carla Daniel Eduardo Fernanda Gustavo Helena Igor Julia Lucas Mariana".split()
+SOBRENOMES = "Almeida Barros Costa Dias Ferreira Gomes Lima Martins Nunes Oliveira Tostes Rigoni".split()
+
+def semente(*partes):
+    return int(hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()[:16], 16)
+
+def gerar_resumo_do_dia(dia, publicacoes_por_dia):
+    # Dias úteis têm publicações do MP misturadas com as de outras seções; fins de semana vêm vazios
+    rng = random.Random(semente("dia", dia))
+    if date.fromisoformat(dia).weekday() >= 5: return {"publications": []}
+    publicacoes = []
+    for i in range(int(publicacoes_por_dia * rng.uniform(0.7, 1.3))):
+        do_mp = rng.random() < 0.5
+        resolucao = do_mp and rng.random() < 0.3
+        tipo = "RESOLUÇÃO" if resolucao else rng.choice(("PORTARIA", "ATO", "COMUNICADO"))
+        publicacoes.append({"id": f"sim-{dia}-{i}", "slug": f"sim-{dia}-{i}",
+                            "title": f"{tipo} Nº {rng.randint(1, 3000)}/{dia[:4]}", "date": f"{dia}T00:00:00",
+                            "publicationTypeId": app.ID_TIPO_RESOLUCAO if resolucao else ID_OUTRO_TIPO,
+                            "secondLevelSectionId": app.ID_MINISTERIO_PUBLICO_SECOND_LEVEL if do_mp else ID_OUTRA_SECAO})
+    return {"publications": publicacoes}
+
+def gerar_conteudo(slug):
+    rng = random.Random(semente("conteudo", slug))
+    paragrafos = []
+    for _ in range(rng.randint(3, 30)):
+        palavras = [rng.choice(PALAVRAS) for _ in range(rng.randint(10, 90))]
+        if rng.random() < 0.3: # Nomes para as buscas e listas de monitoramento
+            palavras.insert(rng.randrange(len(palavras)), f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)}")
+        paragrafos.append(f'<p class="texto"><span style="font-size:11pt">{" ".join(palavras)}</span></p>')
+    return {"content": f"<div>{''.join(paragrafos)}</div>"}
+
+class MockDOEAPI:
+    # Servidor HTTP em uma thread; `base_url` é o valor para DOE_API_BASE_URL
+    def __init__(self, porta=0, gravacoes=None, latencia_ms=0.0, variacao_ms=0.0, taxa_erro=0.0, taxa_429=0.0,
+                 publicacoes_por_dia=40, semente_aleatoria=42):
+        self.gravacoes = gravacoes
+        self.latencia_ms, self.variacao_ms = latencia_ms, variacao_ms
+        self.taxa_erro, self.taxa_429 = taxa_erro, taxa_429
+        self.publicacoes_por_dia = publicacoes_por_dia
+        self._rng = random.Random(semente_aleatoria)
+        self._lock = threading.Lock()
+        self.contadores = {"requisicoes": 0, "lista": 0, "conteudo": 0, "erros_5xx": 0, "respostas_429": 0, "gravadas": 0, "sinteticas": 0}
+        servidor = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, como a API real
+            def do_GET(self): servidor._atender(self)
+            def log_message(self, *args): pass
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", porta), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v2"
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _contar(self, *nomes):
+        with self._lock:
+            for nome in nomes: self.contadores[nome] += 1
+
+    def _sortear(self):
+        with self._lock:
+            latencia = max(0.0, self.latencia_ms + self._rng.uniform(-self.variacao_ms, self.variacao_ms)) / 1000
+            falha = self._rng.random()
+        if falha < self.taxa_429: return latencia, 429
+        if falha < self.taxa_429 + self.taxa_erro: return latencia, 503
+        return latencia, 200
+
+    def _ler_gravacao(self, *caminho):
+        if not self.gravacoes: return None
+        arquivo = os.path.join(self.gravacoes, *caminho)
+        if not os.path.exists(arquivo): return None
+        with open(arquivo, "rb") as f: return f.read()
+
+    def _corpo(self, caminho, parametros):
+        # (status, corpo em bytes, tipo da resposta) para o caminho pedido
+        if caminho.endswith("/summary/list"):
+            dia = (parametros.get("Date") or [""])[0]
+            try: date.fromisoformat(dia)
+            except ValueError: return 400, b'{"error": "Date invalida"}', None
+            self._contar("lista")
+            gravado = self._ler_gravacao("summary", f"{dia}.json")
+            if gravado is not None: return 200, gravado, "gravadas"
+            return 200, json.dumps(gerar_resumo_do_dia(dia, self.publicacoes_por_dia)).encode("utf-8"), "sinteticas"
+        if "/publications/" in caminho:
+            slug = unquote(caminho.rsplit("/publications/", 1)[1])
+            if not slug or "/" in slug or "\\" in slug or slug.startswith("."): return 404, b'{"error": "slug invalido"}', None
+            self._contar("conteudo")
+            gravado = self._ler_gravacao("publications", f"{slug}.json")
+            if gravado is not None: return 200, gravado, "gravadas"
+            return 200, json.dumps(gerar_conteudo(slug)).encode("utf-8"), "sinteticas"
+        return 404, b'{"error": "nao encontrado"}', None
+
+    def _atender(self, handler):
+        self._contar("requisicoes")
+        url = urlsplit(handler.path)
+        latencia, status = self._sortear()
+        time.sleep(latencia)
+        if status == 200:
+            status, corpo, origem = self._corpo(url.path, parse_qs(url.query))
+            if origem: self._contar(origem)
+        elif status == 429:
+            self._contar("respostas_429")
+            corpo = b'{"error": "too many requests"}'
+        else:
+            self._contar("erros_5xx")
+            corpo = b'{"error": "service unavailable"}'
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(corpo)))
+        if status == 429: handler.send_header("Retry-After", "0")
+        handler.end_headers()
+        handler.wfile.write(corpo)
+
+def exportar_cache(caminho_banco, pasta):
+    # Grava, para cada dia do cache SQLite, as respostas que a API deu (só as publicações do MP,
+    # que são as que o app guarda). Publicações sem HTML salvo ficam sem gravação de conteúdo.
+    store = app.PublicationStore(caminho_banco)
+    os.makedirs(os.path.join(pasta, "summary"), exist_ok=True)
+    os.makedirs(os.path.join(pasta, "publications"), exist_ok=True)
+    dias = conteudos = 0
+    for dia in store.list_days():
+        publicacoes = store.load_day(dia, include_raw_html=True)
+        resumo = {"publications": [{"id": pub["id"], "slug": pub["slug"], "title": pub["title"], "date": pub["publicationDate"],
+                                    "publicationTypeId": pub["publicationTypeId"],
+                                    "secondLevelSectionId": app.ID_MINISTERIO_PUBLICO_SECOND_LEVEL} for pub in publicacoes]}
+        with open(os.path.join(pasta, "summary", f"{dia}.json"), "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False)
+        dias += 1
+        for pub in publicacoes:
+            if not pub.get("rawHtmlContent") or not pub.get("slug"): continue
+            with open(os.path.join(pasta, "publications", f"{pub['slug']}.json"), "w", encoding="utf-8") as f:
+                json.dump({"content": pub["rawHtmlContent"]}, f, ensure_ascii=False)
+            conteudos += 1
+    print(f"{dias} dia(s) e {conteudos} conteúdo(s) gravados em '{pasta}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="API do DOE simulada, para benchmarks e testes sem rede")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--gravacoes", help="Pasta com respostas gravadas (summary/ e publications/).")
+    parser.add_argument("--latencia-ms", type=float, default=80.0)
+    parser.add_argument("--variacao-ms", type=float, default=40.0, help="Variação aleatória (±) da latência.")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração das requisições respondidas com 503.")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração das requisições respondidas com 429.")
+    parser.add_argument("--publicacoes-por-dia", type=int, default=40, help="Tamanho médio dos dias sintéticos.")
+    parser.add_argument("--exportar-cache", metavar="BANCO", help="Gera as gravações a partir do cache SQLite e sai.")
+    args = parser.parse_args()
+
+    if args.exportar_cache:
+        if not args.gravacoes: parser.error("--exportar-cache precisa de --gravacoes")
+        exportar_cache(args.exportar_cache, args.gravacoes)
+        return
+    servidor = MockDOEAPI(args.porta, args.gravacoes, args.latencia_ms, args.variacao_ms, args.taxa_erro, args.taxa_429,
+                          args.publicacoes_por_dia)
+    print(f"API do DOE simulada em {servidor.base_url} (use DOE_API_BASE_URL={servidor.base_url}). Ctrl-C para sair.")
+    try:
+        servidor.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.httpd.server_close()
+        print(f"Atendidas: {servidor.contadores}")
+
+if __name__ == "__main__":
+    main()
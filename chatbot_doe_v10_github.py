@@ -1,66 +1,97 @@
 import streamlit as st
-import requests
 import json
-from datetime import datetime, date
-from bs4 import BeautifulSoup
+import sys
+import hashlib
+import heapq
+import csv
+import io
+import math
+import argparse
+from datetime import datetime, date, timedelta
+from html.parser import HTMLParser
+import html.entities as html_entities
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import parsedate_to_datetime
 import re
 import os
+import sqlite3
 import time
+import random
+import threading
+import tempfile
+import zipfile
+import zlib
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import groupby
+from types import SimpleNamespace
 import unicodedata # Para normalize_and_clean_text_for_fpdf, se usada
-import google.generativeai as genai # Mova a importação para cá
+# requests, bs4 e google.generativeai são importados só quando usados pela primeira vez
+# (ver benchmarks/check_import_time.py): quem só navega pelos títulos em cache não paga por eles.
+try:
+    import zstandard # Opcional: compressão do HTML bruto mais rápida e menor que a do zlib
+except ImportError:
+    zstandard = None
+try:
+    import fcntl # Lock de arquivo entre processos (Linux/macOS)
+except ImportError:
+    fcntl = None
+    import msvcrt # Windows
 
 
-# --- Configuração da API do Google Gemini (Executa apenas uma vez por sessão) ---
-if 'api_key_setup_attempted' not in st.session_state:
-    st.session_state.api_key_setup_attempted = True
-    st.session_state.gemini_ready = False 
-    print("INFO: Tentando configurar a API Key do Google Gemini...")
+# GEMINI_FAKE_MODEL=1 troca o Gemini por um modelo local simulado (FakeGenerativeModel),
+# para usar e testar a análise sem chave de API e sem rede.
+GEMINI_USE_FAKE_MODEL = os.getenv("GEMINI_FAKE_MODEL") == "1"
 
+# --- Configuração da API do Google Gemini (uma vez por processo, na primeira vez que é necessária) ---
+@st.cache_resource
+def get_gemini_api_key():
+    # 1. Streamlit Secrets (deploy no Cloud); 2. variável de ambiente GOOGLE_API_KEY (local e outros deploys).
+    # Nunca coloque a chave no código.
+    print("INFO: Procurando a API Key do Google Gemini...")
     gemini_api_key_to_use = None
     try:
-        # 1. Tenta Streamlit Secrets (para deploy no Cloud)
         gemini_api_key_to_use = st.secrets.get("GOOGLE_API_KEY") # Use .get() para evitar KeyError se não existir
         if gemini_api_key_to_use:
             print("INFO: GOOGLE_API_KEY encontrada nos Streamlit Secrets.")
-    except Exception: 
+    except Exception:
         print("INFO: Streamlit Secrets não disponíveis ou GOOGLE_API_KEY não encontrada neles (normal ao rodar localmente sem configurar secrets locais).")
-        pass 
-
     if not gemini_api_key_to_use:
-        # 2. Tenta Variável de Ambiente (bom para local e alguns deploys)
         gemini_api_key_to_use = os.getenv('GOOGLE_API_KEY')
         if gemini_api_key_to_use:
             print("INFO: GOOGLE_API_KEY encontrada na variável de ambiente.")
-    
-    # Removido o fallback para chave hardcoded aqui para segurança no deploy.
-    # Para desenvolvimento local, use variáveis de ambiente ou configure st.secrets localmente.
-    # Se você PRECISAR de um fallback hardcoded para teste local extremo, adicione-o aqui com MUITO CUIDADO:
-    # if not gemini_api_key_to_use:
-    #     gemini_api_key_to_use = "SUA_CHAVE_LOCAL_DE_TESTE_SOMENTE" # NUNCA ENVIE PARA O GITHUB
-    #     if gemini_api_key_to_use and gemini_api_key_to_use != "SUA_CHAVE_LOCAL_DE_TESTE_SOMENTE":
-    #         print("INFO: Usando API Key hardcoded local.")
-    #     else:
-    #         gemini_api_key_to_use = None
-
-
-    if gemini_api_key_to_use:
-        try:
-            genai.configure(api_key=gemini_api_key_to_use)
-            print("INFO: API Key do Google Gemini configurada e pronta para uso.")
-            st.session_state.gemini_ready = True
-        except Exception as e_configure:
-            print(f"ERRO: Falha ao configurar genai com a API Key: {e_configure}")
-            st.session_state.gemini_ready = False
-    else:
+    if not gemini_api_key_to_use and not GEMINI_USE_FAKE_MODEL:
         print("AVISO: Nenhuma API Key válida do Gemini encontrada. Análise com Gemini desabilitada.")
-        st.session_state.gemini_ready = False
+    return gemini_api_key_to_use
+
+def is_gemini_ready():
+    # Não importa o google.generativeai: a biblioteca só é carregada e configurada em get_gemini_model()
+    return GEMINI_USE_FAKE_MODEL or bool(get_gemini_api_key())
+
+def import_genai():
+    import google.generativeai as genai # Quase 1 s de importação
+    return genai
 
 # --- CAMINHOS CONFIGURÁVEIS PELO USUÁRIO ---
 PATH_JSON_FILES = "DOE_JSONs_Cloud" 
 PATH_HTML_RESOLUTIONS = "DOE_Resolutions_HTML_Cloud"
+# Banco SQLite com o cache das publicações (substitui os arquivos DOE_MP_AAAAMMDD.json,
+# que são importados automaticamente na primeira execução)
+PATH_DB_FILE = os.path.join(PATH_JSON_FILES or ".", "DOE_MP_cache.sqlite3")
+# Cache das respostas do Gemini, compartilhado por todas as sessões
+PATH_GEMINI_CACHE_DB_FILE = os.path.join(PATH_JSON_FILES or ".", "gemini_cache.sqlite3")
+# Progresso do backfill pela linha de comando (permite retomar após falha ou Ctrl-C)
+PATH_BACKFILL_CHECKPOINT = os.path.join(PATH_JSON_FILES or ".", "backfill_checkpoint.json")
+# Arquivos de lock que coordenam a busca de um mesmo dia entre processos (vários workers do servidor, backfill)
+PATH_LOCK_DIR = os.path.join(PATH_JSON_FILES or ".", "locks")
 
 # --- Constantes para a API do DOE ---
-BASE_URL_API_DOE = "https://do-api-web-search.doe.sp.gov.br/v2"
+# DOE_API_BASE_URL aponta o app para outro servidor com a mesma API (ex.: benchmarks/mock_doe_api.py)
+BASE_URL_API_DOE = os.getenv("DOE_API_BASE_URL", "https://do-api-web-search.doe.sp.gov.br/v2").rstrip("/")
 JOURNAL_ID_EXECUTIVO_I = "ca96256b-6ca1-407f-866e-567ef9430123"
 SECTION_ID_ATOS_NORMATIVOS = "257b103f-1eb2-4f24-a170-4e553c7e4aac"
 ID_MINISTERIO_PUBLICO_SECOND_LEVEL = "d6f11cbc-adff-46cd-7d5e-08db6b94d2bf"
@@ -68,33 +99,455 @@ URL_SUMMARY_LIST_PUBLICATIONS = f"{BASE_URL_API_DOE}/summary/list"
 URL_PUBLICATION_CONTENT_BASE = f"{BASE_URL_API_DOE}/publications"
 ID_TIPO_RESOLUCAO = "a452e8e9-a073-4ed2-99c9-df55add8cdec"
 
+# --- Concorrência e limite de taxa das requisições de conteúdo ao DOE ---
+# Podem ser ajustados por variáveis de ambiente sem alterar o código.
+DOE_FETCH_MAX_WORKERS = int(os.getenv("DOE_FETCH_MAX_WORKERS", "8")) # Requisições simultâneas
+DOE_FETCH_RATE_PER_SECOND = float(os.getenv("DOE_FETCH_RATE_PER_SECOND", "10")) # 0 desativa o limite
+DOE_FETCH_BURST = int(os.getenv("DOE_FETCH_BURST", "10")) # Rajada máxima permitida pelo token bucket
+DOE_BACKGROUND_DAY_WORKERS = int(os.getenv("DOE_BACKGROUND_DAY_WORKERS", "2")) # Dias buscados em segundo plano ao mesmo tempo
+# Pesquisa em período: dias fora do cache agendados por clique (os mais recentes primeiro) e espera
+# máxima por eles antes de mostrar o resultado (os que não terminarem continuam em segundo plano)
+RANGE_SEARCH_MAX_SCHEDULED_DAYS = int(os.getenv("RANGE_SEARCH_MAX_SCHEDULED_DAYS", "10"))
+RANGE_SEARCH_MAX_WAIT_SECONDS = float(os.getenv("RANGE_SEARCH_MAX_WAIT_SECONDS", "60"))
+# Carregamento em duas fases: o botão "Carregar" busca só a lista (títulos) e o conteúdo vem depois,
+# sob demanda ou em segundo plano. DOE_LAZY_CONTENT=0 volta a baixar tudo antes de exibir a lista.
+DOE_LAZY_CONTENT = os.getenv("DOE_LAZY_CONTENT", "1") == "1"
+
+# --- Monitoramento contínuo (comando "monitorar" da linha de comando) ---
+# Intervalo entre consultas da lista do dia: volta ao mínimo quando chega publicação nova e dobra
+# (até o máximo) a cada consulta sem novidades ou com erro. A barra lateral do app lê os alertas
+# gravados pelo monitor a cada DOE_ALERTS_REFRESH_SECONDS.
+DOE_MONITOR_MIN_INTERVAL_SECONDS = float(os.getenv("DOE_MONITOR_MIN_INTERVAL_SECONDS", "60"))
+DOE_MONITOR_MAX_INTERVAL_SECONDS = float(os.getenv("DOE_MONITOR_MAX_INTERVAL_SECONDS", "900"))
+DOE_ALERTS_REFRESH_SECONDS = float(os.getenv("DOE_ALERTS_REFRESH_SECONDS", "30"))
+DOE_ALERTS_SHOWN = int(os.getenv("DOE_ALERTS_SHOWN", "20")) # Alertas mais recentes exibidos na barra lateral
+
+# --- Timeouts (conexão, leitura) e política de novas tentativas do cliente HTTP do DOE ---
+DOE_TIMEOUT_SUMMARY = (10, 40) # URL_SUMMARY_LIST_PUBLICATIONS: lista do dia, resposta maior
+DOE_TIMEOUT_CONTENT = (10, 25) # URL_PUBLICATION_CONTENT_BASE: conteúdo de uma publicação
+DOE_TIMEOUT_DEFAULT = (10, 30)
+DOE_MAX_RETRIES = int(os.getenv("DOE_MAX_RETRIES", "4"))
+DOE_BACKOFF_BASE_SECONDS = 0.5
+DOE_BACKOFF_MAX_SECONDS = 30.0
+DOE_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# --- Métricas de desempenho do processo ---
+# Durações das etapas (lista do dia, conteúdo, limpeza do HTML, cache, busca, Gemini) e contadores
+# (acertos de cache, novas tentativas). Resumidas no painel "Desempenho" da barra lateral e, com
+# DOE_METRICS_PORT, servidas em http://DOE_METRICS_HOST:DOE_METRICS_PORT/metrics no formato do Prometheus.
+DOE_METRICS_PORT = int(os.getenv("DOE_METRICS_PORT", "0")) # 0 desativa o endpoint
+DOE_METRICS_HOST = os.getenv("DOE_METRICS_HOST", "127.0.0.1")
+DOE_METRICS_MAX_SAMPLES = int(os.getenv("DOE_METRICS_MAX_SAMPLES", "2000")) # Últimas durações por etapa, para os percentis
+
+class MetricsRegistry:
+    # Seguro entre threads. Cada etapa acumula chamadas e segundos desde o início do processo e guarda
+    # as últimas `max_samples` durações, de onde saem p50 e p95.
+    def __init__(self, max_samples=DOE_METRICS_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {} # etapa -> deque com as últimas durações (s)
+        self._totals = {} # etapa -> [chamadas, segundos]
+        self._counters = Counter()
+
+    @contextmanager
+    def span(self, stage):
+        started_at = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(f"{stage}_errors")
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started_at)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.max_samples)
+                self._totals[stage] = [0, 0.0]
+            self._samples[stage].append(seconds)
+            self._totals[stage][0] += 1
+            self._totals[stage][1] += seconds
+
+    def increment(self, counter, amount=1):
+        with self._lock: self._counters[counter] += amount
+
+    @staticmethod
+    def _percentile(sorted_values, fraction):
+        # "Nearest rank": o menor valor com pelo menos `fraction` das amostras abaixo ou iguais a ele
+        return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+    def snapshot(self):
+        # ([{stage, count, total_s, p50_s, p95_s, max_s}, ...] em ordem alfabética, {contador: valor})
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            totals = {stage: tuple(total) for stage, total in self._totals.items()}
+            counters = dict(self._counters)
+        stages = [{"stage": stage, "count": totals[stage][0], "total_s": totals[stage][1],
+                   "p50_s": self._percentile(values, 0.5), "p95_s": self._percentile(values, 0.95), "max_s": values[-1]}
+                  for stage, values in sorted(samples.items())]
+        return stages, counters
+
+    def render_prometheus(self):
+        stages, counters = self.snapshot()
+        lines = ["# HELP doe_stage_duration_seconds Duração das etapas do app (quantis sobre as últimas amostras).",
+                 "# TYPE doe_stage_duration_seconds summary"]
+        for row in stages:
+            label = f'stage="{row["stage"]}"'
+            lines.append(f'doe_stage_duration_seconds{{{label},quantile="0.5"}} {row["p50_s"]:.6f}')
+            lines.append(f'doe_stage_duration_seconds{{{label},quantile="0.95"}} {row["p95_s"]:.6f}')
+            lines.append(f"doe_stage_duration_seconds_sum{{{label}}} {row['total_s']:.6f}")
+            lines.append(f"doe_stage_duration_seconds_count{{{label}}} {row['count']}")
+        lines += ["# HELP doe_events_total Contadores de eventos do app (acertos de cache, novas tentativas...).",
+                  "# TYPE doe_events_total counter"]
+        lines += [f'doe_events_total{{event="{name}"}} {value}' for name, value in sorted(counters.items())]
+        return "\n".join(lines) + "\n"
+
+    def format_log_lines(self):
+        # Uma linha por etapa e uma com os contadores, para o log dos comandos de linha de comando
+        stages, counters = self.snapshot()
+        lines = [f"  {row['stage']}: {row['count']} chamada(s), p50 {1000 * row['p50_s']:.1f} ms, "
+                 f"p95 {1000 * row['p95_s']:.1f} ms, total {row['total_s']:.2f} s" for row in stages]
+        if counters: lines.append("  " + ", ".join(f"{name}={value}" for name, value in sorted(counters.items())))
+        return "\n".join(lines)
+
+@st.cache_resource
+def get_metrics():
+    return MetricsRegistry()
+
+@st.cache_resource
+def start_metrics_server(host, port):
+    # Um endpoint por processo. Com vários processos na mesma porta, só o primeiro consegue abri-la.
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_metrics().render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args): pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"AVISO: Endpoint de métricas não iniciado em {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"INFO: Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
+
 # --- Funções Auxiliares ---
-def get_doe_headers():
-    return {
-        "Accept": "application/json, text/plain, */*",
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-        "Origin": "https://www.doe.sp.gov.br",
-        "Referer": "https://www.doe.sp.gov.br/"
-    }
-
-def clean_text_content(html_content):
+DOE_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+    "Origin": "https://www.doe.sp.gov.br",
+    "Referer": "https://www.doe.sp.gov.br/"
+}
+
+class DOEClient:
+    # Cliente HTTP único para a API do DOE: sessão com pool de conexões (keep-alive, sem novo
+    # handshake TLS por publicação), cabeçalhos pré-montados, timeouts por endpoint e novas
+    # tentativas com backoff exponencial + jitter para 429/5xx, respeitando o Retry-After.
+    def __init__(self, max_retries=DOE_MAX_RETRIES, pool_maxsize=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers.update(DOE_HEADERS)
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize or max(10, DOE_FETCH_MAX_WORKERS * 2), max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "errors": 0, "bytes": 0, "latency_total_s": 0.0}
+
+    def _timeout_for(self, url):
+        if url.startswith(URL_SUMMARY_LIST_PUBLICATIONS): return DOE_TIMEOUT_SUMMARY
+        if url.startswith(URL_PUBLICATION_CONTENT_BASE): return DOE_TIMEOUT_CONTENT
+        return DOE_TIMEOUT_DEFAULT
+
+    def _retry_delay(self, attempt, response):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try: return min(DOE_BACKOFF_MAX_SECONDS, max(0.0, float(retry_after)))
+            except ValueError:
+                try: # Retry-After também pode vir como data HTTP
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return min(DOE_BACKOFF_MAX_SECONDS, max(0.0, retry_at.timestamp() - time.time()))
+                except (TypeError, ValueError): pass
+        # "Full jitter": espera aleatória entre 0 e o teto exponencial da tentativa
+        return random.uniform(0, min(DOE_BACKOFF_MAX_SECONDS, DOE_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+    def _record(self, started_at, response=None, retried=False):
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["latency_total_s"] += time.monotonic() - started_at
+            if response is None: self._stats["errors"] += 1
+            else: self._stats["bytes"] += len(response.content or b"")
+            if retried: self._stats["retries"] += 1
+        metrics = get_metrics()
+        metrics.increment("doe_requests")
+        if response is None: metrics.increment("doe_network_errors")
+        elif response.status_code == 429: metrics.increment("doe_rate_limited")
+        if retried: metrics.increment("doe_retries")
+
+    def get(self, url, params=None, timeout=None):
+        # Mesma interface de requests.get: devolve a resposta (o chamador faz raise_for_status)
+        # ou propaga a exceção de rede após esgotar as tentativas.
+        import requests
+        for attempt in range(self.max_retries + 1):
+            started_at = time.monotonic()
+            response = None
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self._timeout_for(url))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                will_retry = attempt < self.max_retries
+                self._record(started_at, retried=will_retry)
+                if not will_retry: raise
+            else:
+                will_retry = response.status_code in DOE_RETRY_STATUS_CODES and attempt < self.max_retries
+                self._record(started_at, response, retried=will_retry)
+                if not will_retry: return response
+            time.sleep(self._retry_delay(attempt, response))
+
+    def _connections_opened(self):
+        # Conexões TCP/TLS efetivamente abertas pelo pool (o que o keep-alive economiza)
+        pools = self._adapter.poolmanager.pools
+        return sum(getattr(pools[key], "num_connections", 0) for key in pools.keys())
+
+    def get_stats(self):
+        with self._stats_lock: stats = dict(self._stats)
+        stats["connections_opened"] = self._connections_opened()
+        stats["avg_latency_ms"] = round(1000 * stats["latency_total_s"] / stats["requests"], 1) if stats["requests"] else 0.0
+        return stats
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"{stats['requests']} requisições, {stats['connections_opened']} conexões abertas, "
+                f"{stats['retries']} novas tentativas, {stats['errors']} falhas de rede, "
+                f"{stats['bytes'] / 1024:.0f} KiB, latência média {stats['avg_latency_ms']} ms")
+
+@st.cache_resource
+def get_doe_client():
+    # Uma instância por processo: o pool de conexões é reaproveitado entre reruns e sessões.
+    return DOEClient()
+
+NUMERIC_CHARREF_PATTERN = re.compile(r"[xX]([0-9a-fA-F]+)(.*)|([0-9]+)(.*)", re.S)
+
+@lru_cache(maxsize=1)
+def get_streaming_text_extractor_class():
+    # As listas de tags vêm do bs4, então a classe só é criada (e o bs4 importado) na primeira limpeza de HTML
+    from bs4.builder import HTMLTreeBuilder
+
+    class StreamingTextExtractor(HTMLParser):
+        # Produz o mesmo texto que BeautifulSoup(html, 'html.parser').get_text(separator='\n', strip=True),
+        # mas sem montar a árvore: usa o mesmo tokenizador (html.parser) e reproduz só o que afeta o texto.
+        # - dados consecutivos (inclusive entidades) formam uma única string até a próxima tag/comentário;
+        # - strings dentro de script/style/template/rt/rp, comentários, doctype e instruções ficam de fora
+        #   (CDATA entra sempre);
+        # - tags vazias (br, img...) e tags de fechamento seguem as regras de pilha do BeautifulSoup.
+        # As entidades (&amp;, &#150;...) são convertidas aqui, com as mesmas regras do bs4 (as do HTML5), e
+        # não pelos métodos internos do parser do bs4, que mudam entre versões.
+        VOID_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+        SKIPPED_TEXT_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+
+        def __init__(self):
+            HTMLParser.__init__(self, convert_charrefs=False)
+            self.strings = []
+            self._pending_data = []
+            self._open_tags = []
+            self._skipped_depth = 0 # Tags abertas em SKIPPED_TEXT_TAGS
+            self.already_closed_empty_element = []
+
+        def _flush(self):
+            if not self._pending_data: return
+            text = "".join(self._pending_data).strip()
+            self._pending_data = []
+            if text and not self._skipped_depth: self.strings.append(text)
+
+        def handle_data(self, data):
+            self._pending_data.append(data)
+
+        def handle_entityref(self, name):
+            # Entidade desconhecida fica como texto ("&foo"), como no bs4
+            self._pending_data.append(html_entities.html5.get(f"{name};", f"&{name}"))
+
+        def handle_charref(self, name):
+            match = NUMERIC_CHARREF_PATTERN.match(name)
+            if not match: # Sem dígitos: nada é convertido
+                self._pending_data.append(name)
+                return
+            hex_digits, hex_rest, digits, rest = match.groups()
+            code = int(hex_digits, 16) if hex_digits is not None else int(digits)
+            if code == 0 or code > 0x10FFFF or 0xD800 <= code <= 0xDFFF: character = "\ufffd"
+            elif 0x80 <= code <= 0x9F: # Códigos da windows-1252 usados como se fossem Unicode (ex.: &#150; é "–")
+                try: character = bytes([code]).decode("cp1252")
+                except UnicodeDecodeError: character = chr(code)
+            else: character = chr(code)
+            self._pending_data.append(character + (hex_rest if hex_digits is not None else rest))
+
+        def handle_starttag(self, tag, attrs, handle_empty_element=True):
+            self._flush()
+            self._open_tags.append(tag)
+            if tag in self.SKIPPED_TEXT_TAGS: self._skipped_depth += 1
+            if handle_empty_element and tag in self.VOID_TAGS:
+                self.handle_endtag(tag, check_already_closed=False)
+                self.already_closed_empty_element.append(tag)
+
+        def handle_startendtag(self, tag, attrs):
+            self.handle_starttag(tag, attrs, handle_empty_element=False)
+            self.handle_endtag(tag, check_already_closed=False)
+
+        def handle_endtag(self, tag, check_already_closed=True):
+            if check_already_closed and tag in self.already_closed_empty_element:
+                self.already_closed_empty_element.remove(tag)
+                return
+            self._flush()
+            if tag not in self._open_tags: return # Fechamento sem abertura: ignorado, como no bs4
+            while True:
+                closed_tag = self._open_tags.pop()
+                if closed_tag in self.SKIPPED_TEXT_TAGS: self._skipped_depth -= 1
+                if closed_tag == tag: break
+
+        def _skip_markup(self, data):
+            self._flush()
+        handle_comment = handle_decl = handle_pi = _skip_markup
+
+        def unknown_decl(self, data):
+            self._flush()
+            cdata_text = data[len("CDATA["):].strip() if data.upper().startswith("CDATA[") else ""
+            if cdata_text: self.strings.append(cdata_text) # CDATA entra no get_text, mesmo dentro de script/template
+
+        def close(self):
+            HTMLParser.close(self)
+            self._flush()
+
+    return StreamingTextExtractor
+
+def extract_text_bs4(html_content):
+    # Referência: o extrator original
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html_content, 'html.parser').get_text(separator='\n', strip=True)
+
+def extract_text_streaming(html_content):
+    try:
+        extractor = get_streaming_text_extractor_class()()
+        extractor.feed(html_content)
+        extractor.close()
+        return "\n".join(extractor.strings)
+    except Exception: # Marcação que o html.parser rejeita: usa o extrator de referência
+        return extract_text_bs4(html_content)
+
+# Extratores de texto disponíveis para clean_text_content. Um novo extrator (ex.: lxml, se instalado)
+# só deve ser usado depois de conferido com benchmarks/bench_html_extraction.py (que sai com erro se o texto divergir).
+HTML_TEXT_EXTRACTORS = {"html.parser": extract_text_bs4, "streaming": extract_text_streaming}
+HTML_TEXT_EXTRACTOR = os.getenv("DOE_HTML_EXTRACTOR", "streaming")
+
+def clean_text_content(html_content, extractor=None):
     if not html_content: return None
-    soup = BeautifulSoup(html_content, 'html.parser')
-    text = soup.get_text(separator='\n', strip=True)
+    text = HTML_TEXT_EXTRACTORS[extractor or HTML_TEXT_EXTRACTOR](html_content)
     # Remove múltiplas linhas em branco, deixando no máximo uma
     text = re.sub(r'\n\s*\n', '\n\n', text) 
     return text.strip()
 
-def get_publication_content_and_html(slug):
+def clean_html_batch(raw_htmls, max_processes=None):
+    # Limpa vários HTMLs em um pool de processos (a limpeza é CPU e, em threads, disputa o GIL).
+    # Usado pelo backfill; com max_processes <= 1 (ou poucos documentos) roda no próprio processo.
+    if not max_processes or max_processes <= 1 or len(raw_htmls) < 2:
+        with get_metrics().span("html_cleaning_batch"): return [clean_text_content(raw_html) for raw_html in raw_htmls]
+    with get_metrics().span("html_cleaning_batch"):
+        return list(get_html_cleaning_pool(max_processes).map(clean_text_content, raw_htmls, chunksize=8))
+
+@st.cache_resource
+def get_html_cleaning_pool(max_processes):
+    return ProcessPoolExecutor(max_workers=max_processes)
+
+class SingleFlight:
+    # Garante no máximo uma execução em andamento por chave dentro do processo: quem chama com a
+    # mesma chave enquanto a primeira chamada ainda roda espera e recebe o mesmo resultado (ou exceção).
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader: call = self._calls[key] = Future()
+        if not is_leader: return call.result()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock: self._calls.pop(key, None)
+
+@st.cache_resource
+def get_fetch_single_flight():
+    return SingleFlight()
+
+@contextmanager
+def interprocess_lock(name):
+    # Lock exclusivo (bloqueante) num arquivo em PATH_LOCK_DIR, para coordenar processos diferentes
+    os.makedirs(PATH_LOCK_DIR, exist_ok=True)
+    with open(os.path.join(PATH_LOCK_DIR, f"{name}.lock"), "a+b") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try: msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1); break
+                except OSError: pass # LK_LOCK desiste após ~10 s; continua esperando
+        try:
+            yield
+        finally:
+            if fcntl: fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else: lock_file.seek(0); msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def write_file_atomically(path, text):
+    # Grava num arquivo temporário da mesma pasta e o renomeia por cima do destino: quem lê
+    # o arquivo vê a versão antiga ou a nova, nunca um arquivo pela metade.
+    folder = os.path.dirname(path) or "."
+    file_descriptor, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as temp_file:
+            temp_file.write(text)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path): os.remove(temp_path)
+        raise
+
+def get_publication_content_and_html(slug, clean=True):
+    # Buscas simultâneas do mesmo slug (ex.: duas sessões abrindo a mesma publicação) viram uma só.
+    # Com clean=False o texto não é extraído (devolve (None, html_bruto, erro)), para limpar em lote depois.
     if not slug: return (None, None, "Slug não fornecido.")
+    return get_fetch_single_flight().do(f"slug:{slug}:{clean}", _fetch_publication_content_and_html, slug, clean)
+
+def _fetch_publication_content_and_html(slug, clean=True):
+    import requests
     url = f"{URL_PUBLICATION_CONTENT_BASE}/{slug}"
     try:
-        response = requests.get(url, headers=get_doe_headers(), timeout=25)
-        response.raise_for_status()
-        data = response.json()
+        with get_metrics().span("content_fetch"):
+            response = get_doe_client().get(url)
+            response.raise_for_status()
+            data = response.json()
         raw_html = data.get("content")
         if not raw_html: return (None, None, "Conteúdo HTML (raw) não encontrado na API.")
-        cleaned_text = clean_text_content(raw_html)
+        if not clean: return (None, raw_html, None)
+        cleaned_text = reuse_cleaned_text(raw_html)
+        if cleaned_text is None:
+            with get_metrics().span("html_cleaning"): cleaned_text = clean_text_content(raw_html)
         if not cleaned_text: return ("Falha ao limpar o texto do HTML.", raw_html, None)
         return cleaned_text, raw_html, None
     except requests.exceptions.HTTPError as e: return (None, None, f"Erro HTTP {e.response.status_code}")
@@ -102,56 +555,1118 @@ def get_publication_content_and_html(slug):
     except json.JSONDecodeError: return (None, None, "Erro ao processar JSON.")
     except Exception as e: return (None, None, f"Erro inesperado: {e}")
 
-def fetch_mp_publications_and_prepare_content(date_str_yyyy_mm_dd):
-    all_mp_data = []
+def reuse_cleaned_text(raw_html):
+    # O HTML bruto fica gravado uma vez por conteúdo (html_blobs); se o mesmo HTML já foi limpo
+    # (republicação), o texto gravado é reaproveitado em vez de limpar de novo
+    cleaned_text = get_publication_store().get_full_content_for_html(raw_html)
+    get_metrics().increment("html_cleaning_reused" if cleaned_text is not None else "html_cleaning_needed")
+    return cleaned_text
+
+class TokenBucket:
+    # Limitador de taxa "token bucket", seguro entre threads: permite rajadas de até
+    # `capacity` requisições e, depois disso, no máximo `rate` requisições por segundo. Com um
+    # `stop_event`, acquire levanta InterruptedError assim que o evento é sinalizado (inclusive
+    # para quem está esperando), então cada thread para na sua próxima requisição.
+    def __init__(self, rate, capacity=None, stop_event=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.stop_event = stop_event
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _check_stop(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise InterruptedError("Interrompido antes da próxima requisição")
+
+    def acquire(self, tokens=1):
+        self._check_stop()
+        if self.rate <= 0: return # Limite desativado
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_seconds = (tokens - self._tokens) / self.rate
+            if self.stop_event is None: time.sleep(wait_seconds)
+            else: self.stop_event.wait(wait_seconds)
+            self._check_stop()
+
+@st.cache_resource
+def get_doe_rate_limiter():
+    # Um único limitador por processo, compartilhado por todas as sessões do Streamlit,
+    # para que vários usuários carregando datas ao mesmo tempo não somem suas taxas.
+    return TokenBucket(DOE_FETCH_RATE_PER_SECOND, DOE_FETCH_BURST)
+
+def fetch_publication_contents_concurrently(slugs, max_workers=None, rate_limiter=None, clean=True):
+    # Busca o conteúdo de várias publicações em paralelo (no máximo `max_workers` em voo),
+    # respeitando o limitador de taxa. O resultado mantém a ordem de `slugs` e cada item é a
+    # tupla (texto_limpo, html_bruto, mensagem_de_erro) de get_publication_content_and_html.
+    if not slugs: return []
+    max_workers = max(1, max_workers or DOE_FETCH_MAX_WORKERS)
+    if rate_limiter is None: rate_limiter = get_doe_rate_limiter()
+
+    def fetch_one(slug):
+        rate_limiter.acquire()
+        return get_publication_content_and_html(slug, clean)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(slugs))) as executor:
+        return list(executor.map(fetch_one, slugs))
+
+def fetch_mp_publication_summaries(date_str_yyyy_mm_dd, raise_errors=False):
+    # Só a lista do dia (uma requisição): as publicações do MP com fullContent/rawHtmlContent ainda vazios.
+    # Com raise_errors=True, uma falha na lista do dia é propagada em vez de virar uma lista vazia
+    # (o backfill precisa distinguir "dia sem publicações do MP" de "API indisponível").
     params = {"Date": date_str_yyyy_mm_dd, "JournalId": JOURNAL_ID_EXECUTIVO_I, 
               "SectionId": SECTION_ID_ATOS_NORMATIVOS, "name": "publications"}
     print(f"\nBuscando lista de publicações: Data {date_str_yyyy_mm_dd}")
     try:
-        response = requests.get(URL_SUMMARY_LIST_PUBLICATIONS, headers=get_doe_headers(), params=params, timeout=40)
-        response.raise_for_status()
-        summary_data = response.json()
+        with get_metrics().span("summary_fetch"):
+            response = get_doe_client().get(URL_SUMMARY_LIST_PUBLICATIONS, params=params)
+            response.raise_for_status()
+            summary_data = response.json()
         pubs_list = summary_data.get("publications", [])
         print(f"  API retornou {len(pubs_list)} publicações para a seção.")
-
-        for pub_summary in pubs_list:
-            if pub_summary.get("secondLevelSectionId") == ID_MINISTERIO_PUBLICO_SECOND_LEVEL:
-                print(f"  Processando MP: '{pub_summary.get('title')[:40]}...'")
-                cleaned_text, raw_html, error_msg = get_publication_content_and_html(pub_summary["slug"])
-                
-                all_mp_data.append({
-                    "id": pub_summary.get("id"), "title": pub_summary.get("title"),
-                    "slug": pub_summary.get("slug"), "publicationDate": pub_summary.get("date"),
-                    "publicationTypeId": pub_summary.get("publicationTypeId"),
-                    "fullContent": cleaned_text if not error_msg else f"Erro: {error_msg}",
-                    "rawHtmlContent": raw_html if not error_msg else None
-                })
-                time.sleep(0.2) # Delay para não sobrecarregar API de conteúdo
-        print(f"  {len(all_mp_data)} publicações do MP processadas.")
     except Exception as e:
         print(f"  Erro em fetch_mp_publications: {type(e).__name__} - {e}")
+        if raise_errors: raise
+        return []
+    return [{"id": pub_summary.get("id"), "title": pub_summary.get("title"),
+             "slug": pub_summary.get("slug"), "publicationDate": pub_summary.get("date"),
+             "publicationTypeId": pub_summary.get("publicationTypeId"),
+             "fullContent": None, "rawHtmlContent": None}
+            for pub_summary in pubs_list if pub_summary.get("secondLevelSectionId") == ID_MINISTERIO_PUBLICO_SECOND_LEVEL]
+
+def fetch_mp_publications_and_prepare_content(date_str_yyyy_mm_dd, max_workers=None, rate_limiter=None, raise_errors=False,
+                                               clean_processes=None):
+    # Lista do dia e conteúdo de todas as publicações (usado pelo backfill e com DOE_LAZY_CONTENT=0).
+    # Com clean_processes > 1, as threads só baixam o HTML e o texto é extraído num pool de processos.
+    all_mp_data = fetch_mp_publication_summaries(date_str_yyyy_mm_dd, raise_errors=raise_errors)
+    for pub_data in all_mp_data:
+        print(f"  Processando MP: '{pub_data.get('title')[:40]}...'")
+    # Busca os conteúdos em paralelo; a ordem das publicações é preservada
+    clean_in_batch = bool(clean_processes and clean_processes > 1)
+    contents = fetch_publication_contents_concurrently(
+        [pub.get("slug") for pub in all_mp_data], max_workers=max_workers, rate_limiter=rate_limiter, clean=not clean_in_batch)
+    if clean_in_batch:
+        reused_texts = [reuse_cleaned_text(raw_html) if not error_msg else None for _, raw_html, error_msg in contents]
+        fetched_htmls = [raw_html for (_, raw_html, error_msg), reused in zip(contents, reused_texts) if not error_msg and reused is None]
+        cleaned_texts = iter(clean_html_batch(fetched_htmls, clean_processes))
+        contents = [((reused if reused is not None else next(cleaned_texts)) or "Falha ao limpar o texto do HTML.", raw_html, None)
+                    if not error_msg else (None, None, error_msg)
+                    for (_, raw_html, error_msg), reused in zip(contents, reused_texts)]
+    for pub_data, (cleaned_text, raw_html, error_msg) in zip(all_mp_data, contents):
+        pub_data["fullContent"] = cleaned_text if not error_msg else f"Erro: {error_msg}"
+        pub_data["rawHtmlContent"] = raw_html if not error_msg else None
+    print(f"  {len(all_mp_data)} publicações do MP processadas.")
+    print(f"  Cliente DOE: {get_doe_client().format_stats()}")
     return all_mp_data
 
+def fetch_day_once(day, is_fresh=lambda day_status: day_status is not None, save_empty_day=True, summary_only=False, **fetch_kwargs):
+    # Busca e grava no cache as publicações de um dia, com no máximo uma busca por data em andamento:
+    # no processo (SingleFlight) e entre processos (lock de arquivo). Quem chega durante a busca espera
+    # por ela; depois do lock, `is_fresh(get_day_status(dia))` indica se outro processo já gravou o dia,
+    # e nesse caso nada é buscado e a função devolve None. Senão, devolve a lista gravada.
+    # Falhas na lista do dia são propagadas (nunca gravadas como "dia sem publicações"). Com
+    # summary_only=True, grava só a lista (publicações sem conteúdo, a completar depois).
+    def fetch_and_save():
+        with interprocess_lock(f"day_{day}"):
+            store = get_publication_store()
+            if is_fresh(store.get_day_status(day)): return None
+            if summary_only: publications = fetch_mp_publication_summaries(day, raise_errors=True)
+            else: publications = fetch_mp_publications_and_prepare_content(day, raise_errors=True, **fetch_kwargs)
+            if publications or save_empty_day: store.save_day(day, publications)
+            return publications
+    return get_fetch_single_flight().do(f"day:{day}", fetch_and_save)
+
+def refresh_day(day, max_workers=None):
+    # Atualiza um dia já em cache (ex.: suplementos publicados ao longo do dia) com uma requisição da
+    # lista do dia mais o conteúdo só das publicações novas ou alteradas. Um dia fora do cache é
+    # gravado inteiro (todas as publicações contam como novas). Devolve
+    # {"new": [...], "changed": [...], "removed": [...]} com os ids de cada grupo.
+    def fetch_and_merge():
+        with interprocess_lock(f"day_{day}"): # Não intercala com uma busca completa do mesmo dia
+            summaries = fetch_mp_publication_summaries(day, raise_errors=True)
+            new_ids, changed_ids, removed_ids = get_publication_store().merge_day_summary(day, summaries)
+        ids_to_fetch = set(new_ids) | set(changed_ids)
+        ensure_publications_content([pub for pub in get_day_dataset_cache().get(day) if pub["id"] in ids_to_fetch], max_workers=max_workers)
+        return {"new": new_ids, "changed": changed_ids, "removed": removed_ids}
+    return get_fetch_single_flight().do(f"refresh:{day}", fetch_and_merge)
+
 def save_to_json(data, filename_full_path):
     try:
         pasta_json = os.path.dirname(filename_full_path)
         if pasta_json and not os.path.exists(pasta_json): os.makedirs(pasta_json)
-        with open(filename_full_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        with get_metrics().span("json_write"):
+            write_file_atomically(filename_full_path, json.dumps(data, ensure_ascii=False, separators=(",", ":")))
         print(f"Dados JSON salvos/atualizados em: {filename_full_path}")
     except Exception as e: print(f"Erro ao salvar JSON: {e}")
 
 def load_publications_from_json(filename_full_path):
     try:
-        with open(filename_full_path, 'r', encoding='utf-8') as f: data = json.load(f)
+        with get_metrics().span("json_read"), open(filename_full_path, 'r', encoding='utf-8') as f: data = json.load(f)
         print(f"Dados carregados do JSON: {filename_full_path}")
         return data
     except FileNotFoundError: return []
     except json.JSONDecodeError: print(f"Erro ao decodificar JSON: {filename_full_path}"); return []
 
+# --- Índice invertido para a busca local ---
+SEARCH_INDEX_VERSION = "3" # Mudar quando a tokenização (ou as impressões digitais) mudar, para forçar a reconstrução do índice
+TOKEN_PATTERN = re.compile(r"\w+")
+
+@lru_cache(maxsize=200000)
+def normalize_search_token(token):
+    # Minúsculas e sem acentos: "JUSTIÇA", "Justiça" e "justica" viram o mesmo termo
+    decomposed = unicodedata.normalize("NFKD", token)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def tokenize_for_index(text):
+    # Lista de (termo normalizado, posição do caractere no texto original)
+    return [(normalize_search_token(m.group()), m.start()) for m in TOKEN_PATTERN.finditer(text or "")]
+
+def has_usable_content(full_content):
+    # Mesmo critério usado pelas ações do app para considerar o fullContent válido
+    return bool(full_content) and "Erro" not in full_content and "Conteúdo não" not in full_content
+
+# --- Impressões digitais do conteúdo: duplicatas exatas (sha256 do texto) e quase duplicatas (MinHash + LSH) ---
+# Republicações, retificações e listas de designação que mudam um nome geram textos quase iguais.
+# A assinatura MinHash usa "one permutation hashing": cada shingle (sequência de palavras do índice) é
+# "hasheado" uma vez e cai numa das MINHASH_NUM_BINS faixas, que guardam o menor valor visto; a fração
+# de faixas iguais entre duas assinaturas estima a similaridade de Jaccard entre os textos. No LSH, a
+# assinatura é cortada em LSH_BANDS bandas: textos com alguma banda igual viram candidatos, e só eles
+# têm a similaridade conferida.
+MINHASH_SHINGLE_SIZE = 5
+MINHASH_NUM_BINS = 64
+LSH_BANDS = 16 # 16 bandas de 4 valores: pares com Jaccard acima de ~0,5 quase sempre viram candidatos
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("DOE_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def stable_hash64(text):
+    # hash() do Python muda a cada processo; as assinaturas ficam gravadas no banco
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+@lru_cache(maxsize=200000)
+def term_digest(term):
+    return hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+
+def minhash_signature(terms, shingle_size=MINHASH_SHINGLE_SIZE, num_bins=MINHASH_NUM_BINS):
+    # Assinatura (lista de num_bins inteiros) dos termos normalizados de um texto, ou None se não houver termos
+    if not terms: return None
+    # O hash de cada shingle é o blake2b dos digests (em cache) dos seus termos: as assinaturas ficam
+    # gravadas no banco, então o formato não pode depender da versão do Python (como o hash() de tuplas)
+    term_digests = [term_digest(term) for term in terms]
+    size = min(shingle_size, len(term_digests))
+    shingles = {b"".join(term_digests[i:i + size]) for i in range(len(term_digests) - size + 1)}
+    empty = 1 << 64
+    minimums = [empty] * num_bins
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "little")
+        bin_index, bin_value = value % num_bins, value // num_bins
+        if bin_value < minimums[bin_index]: minimums[bin_index] = bin_value
+    # Textos curtos deixam faixas vazias: cada uma copia a próxima faixa preenchida (em círculo)
+    filled = [i for i, value in enumerate(minimums) if value != empty]
+    return [minimums[i] if minimums[i] != empty else minimums[next((j for j in filled if j > i), filled[0])]
+            for i in range(num_bins)]
+
+def signature_similarity(signature_a, signature_b):
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+def lsh_band_keys(signature, bands=LSH_BANDS):
+    # Uma chave (inteiro de 64 bits com sinal, o INTEGER do SQLite) por banda; o número da banda entra no hash
+    rows = len(signature) // bands
+    return [stable_hash64(f"{band}:" + ",".join(map(str, signature[band * rows:(band + 1) * rows]))) - (1 << 63)
+            for band in range(bands)]
+
+# --- Ranqueamento BM25 de perguntas em texto livre (sobre o mesmo índice invertido) ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+POSTING_ITEM_SIZE = array("I").itemsize # Bytes por ocorrência no BLOB de posições: nº de ocorrências = tamanho / isto
+# Postings (documento, nº de ocorrências) dos termos já consultados, em memória (8 bytes cada)
+BM25_CACHE_MAX_POSTINGS = int(os.getenv("BM25_CACHE_MAX_POSTINGS", "5000000"))
+PORTUGUESE_STOPWORDS = frozenset(normalize_search_token(word) for word in """
+    a à ao aos as às até com como contra da das de dela dele deles desde do dos e é ela elas ele eles em entre era essa
+    essas esse esses esta está estas este estes eu foi foram há houve isso isto já la lhe lhes mais mas me mesmo meu minha
+    muito na nas nem no nos nós o os ou onde para pela pelas pelo pelos por qual quais quando quanto quantos que quem se
+    sem ser seu seus sido sobre sua suas são também te tem têm teve um uma umas uns você""".split())
+
+@lru_cache(maxsize=200000)
+def light_stem_pt(term):
+    # Radical "leve" de um termo já normalizado: só o plural (ações/acao, promotores/promotor,
+    # nacionais/nacional, processos/processo), que é o que mais separa a pergunta do texto
+    if len(term) <= 3 or term.isdigit(): return term
+    for suffix, replacement in (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"),
+                                ("res", "r"), ("zes", "z"), ("ns", "m")):
+        if term.endswith(suffix) and len(term) - len(suffix) >= 2: return term[:-len(suffix)] + replacement
+    if term.endswith("s") and not term.endswith(("ss", "us", "is")): return term[:-1]
+    return term
+
+def inflection_variants(stem):
+    # Formas de singular e plural que light_stem_pt reduz a `stem` (as que não existem no índice são ignoradas)
+    variants = {stem, f"{stem}s", f"{stem}es"}
+    if stem.endswith("ao"): variants.update((f"{stem[:-2]}oes", f"{stem[:-2]}aes", f"{stem[:-2]}aos"))
+    if stem.endswith("l"): variants.add(f"{stem[:-1]}is")
+    if stem.endswith("m"): variants.add(f"{stem[:-1]}ns")
+    return variants
+
+def question_term_groups(question):
+    # Termos da pergunta sem as stopwords, cada um com suas variações de singular/plural:
+    # [[termo, variação, ...], ...]; cada grupo conta como um único termo no BM25
+    groups = {}
+    for term, _ in tokenize_for_index(question):
+        if term in PORTUGUESE_STOPWORDS or (len(term) < 2 and not term.isdigit()): continue
+        stem = light_stem_pt(term)
+        groups.setdefault(stem, {term}).update(inflection_variants(stem))
+    return [sorted(variants) for variants in groups.values()]
+
+def bm25_idf(document_count, document_frequency):
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+def bm25_term_score(idf, term_frequency, length, average_length, k1=BM25_K1, b=BM25_B):
+    return idf * term_frequency * (k1 + 1) / (term_frequency + k1 * (1 - b + b * length / max(average_length, 1e-9)))
+
+class PublicationIndex:
+    # Índice invertido persistente (nas mesmas tabelas SQLite do cache), atualizado
+    # incrementalmente sempre que o fullContent de uma publicação é gravado. Cada posting
+    # guarda, para um termo e uma publicação, as posições dos tokens (para consultas por frase)
+    # e os offsets de caractere no texto original.
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self._lock = lock
+        self._term_ids = {}
+        self._cache_generation = None
+        self._reset_bm25_cache()
+        with self._lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS index_terms (term_id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL);
+                CREATE TABLE IF NOT EXISTS index_docs (
+                    doc_id INTEGER PRIMARY KEY,
+                    pub_id TEXT UNIQUE NOT NULL,
+                    day TEXT NOT NULL,
+                    token_count INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_index_docs_day ON index_docs(day);
+                CREATE TABLE IF NOT EXISTS index_postings (
+                    term_id INTEGER NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    positions BLOB NOT NULL,
+                    offsets BLOB NOT NULL,
+                    PRIMARY KEY (term_id, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_index_postings_doc ON index_postings(doc_id);
+                CREATE TABLE IF NOT EXISTS content_fingerprints (
+                    doc_id INTEGER PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    minhash BLOB
+                );
+                CREATE INDEX IF NOT EXISTS idx_content_fingerprints_hash ON content_fingerprints(content_hash);
+                CREATE TABLE IF NOT EXISTS lsh_bands (
+                    band_key INTEGER NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    PRIMARY KEY (band_key, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_lsh_bands_doc ON lsh_bands(doc_id);
+            """)
+
+    def _get_term_ids(self, terms, create):
+        missing = [term for term in terms if term not in self._term_ids]
+        if missing and create:
+            self.conn.executemany("INSERT OR IGNORE INTO index_terms (term) VALUES (?)", [(term,) for term in missing])
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = self.conn.execute(f"SELECT term, term_id FROM index_terms WHERE term IN ({','.join('?' * len(chunk))})", chunk)
+            self._term_ids.update((row[0], row[1]) for row in rows)
+        return {term: self._term_ids[term] for term in terms if term in self._term_ids}
+
+    def _reset_bm25_cache(self):
+        self._bm25_postings = OrderedDict() # term_id -> (doc_ids, ocorrências), do menos para o mais recente
+        self._bm25_cached_postings = 0
+        self._bm25_documents = None # doc_id -> (dia, token_count)
+
+    def discard_caches(self):
+        # Ids de termos e postings do BM25 em memória. Chamado também quando a transação de quem grava é
+        # desfeita: os caches podem ter recebido termos e documentos que não chegaram ao banco.
+        self._term_ids = {}
+        self._reset_bm25_cache()
+        self._cache_generation = None
+
+    def get_generation(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'index_generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump_generation(self):
+        # Geração do índice (na tabela meta), incrementada só pelas gravações no índice, dentro da transação
+        # de quem grava; outras escritas no banco (ex.: o status do monitor) não descartam os caches em memória.
+        # Se a geração não é a que este processo viu por último, outro processo gravou no índice antes.
+        generation = self.get_generation()
+        if generation != self._cache_generation: self.discard_caches()
+        self.conn.execute("""INSERT INTO meta (key, value) VALUES ('index_generation', 1)
+                             ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1""")
+        self._cache_generation = generation + 1
+
+    def _sync_caches(self):
+        # As gravações deste processo atualizam os caches na hora (index_publication/remove_publication); se
+        # outro processo gravou no índice (a geração mudou), eles são descartados: depois de um rebuild ou
+        # clear em outro processo, os mesmos termos podem ter outros term_id
+        generation = self.get_generation()
+        if generation != self._cache_generation:
+            self.discard_caches()
+            self._cache_generation = generation
+
+    def _sync_bm25_cache(self):
+        self._sync_caches()
+        if self._bm25_documents is None:
+            self._bm25_documents = {row[0]: (row[1], row[2]) for row in self.conn.execute("SELECT doc_id, day, token_count FROM index_docs")}
+
+    def _bm25_term_postings(self, term_id):
+        entry = self._bm25_postings.get(term_id)
+        if entry is not None:
+            self._bm25_postings.move_to_end(term_id)
+            return entry
+        doc_ids, frequencies = array("I"), array("I")
+        for row in self.conn.execute("SELECT doc_id, length(positions) / ? FROM index_postings WHERE term_id = ?", (POSTING_ITEM_SIZE, term_id)):
+            doc_ids.append(row[0])
+            frequencies.append(row[1])
+        self._bm25_postings[term_id] = entry = (doc_ids, frequencies)
+        self._bm25_cached_postings += len(doc_ids)
+        while self._bm25_cached_postings > BM25_CACHE_MAX_POSTINGS and len(self._bm25_postings) > 1:
+            _, (evicted_doc_ids, _) = self._bm25_postings.popitem(last=False)
+            self._bm25_cached_postings -= len(evicted_doc_ids)
+        return entry
+
+    def remove_publication(self, pub_id):
+        # Deve ser chamado dentro da transação de quem grava a publicação
+        row = self.conn.execute("SELECT doc_id FROM index_docs WHERE pub_id = ?", (pub_id,)).fetchone()
+        if not row: return
+        doc_id = row[0]
+        self._bump_generation()
+        if self._bm25_documents is not None:
+            self._bm25_documents.pop(doc_id, None)
+            for (term_id,) in self.conn.execute("SELECT term_id FROM index_postings WHERE doc_id = ?", (doc_id,)).fetchall():
+                entry = self._bm25_postings.get(term_id)
+                if entry is None: continue
+                kept = [(kept_doc_id, frequency) for kept_doc_id, frequency in zip(*entry) if kept_doc_id != doc_id]
+                self._bm25_postings[term_id] = (array("I", (d for d, _ in kept)), array("I", (f for _, f in kept)))
+                self._bm25_cached_postings -= len(entry[0]) - len(kept)
+        self.conn.execute("DELETE FROM index_postings WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM content_fingerprints WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM lsh_bands WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM index_docs WHERE doc_id = ?", (doc_id,))
+
+    def remove_day(self, day):
+        self._bump_generation()
+        self._reset_bm25_cache()
+        for table in ("index_postings", "content_fingerprints", "lsh_bands"):
+            self.conn.execute(f"DELETE FROM {table} WHERE doc_id IN (SELECT doc_id FROM index_docs WHERE day = ?)", (day,))
+        self.conn.execute("DELETE FROM index_docs WHERE day = ?", (day,))
+
+    def index_publication(self, pub_id, day, full_content):
+        # Deve ser chamado dentro da transação de quem grava a publicação
+        self.remove_publication(pub_id)
+        if not has_usable_content(full_content): return
+        self._bump_generation()
+        tokens = tokenize_for_index(full_content)
+        doc_id = self.conn.execute("INSERT INTO index_docs (pub_id, day, token_count) VALUES (?, ?, ?)",
+                                   (pub_id, day, len(tokens))).lastrowid
+        postings = {}
+        for position, (term, offset) in enumerate(tokens):
+            positions, offsets = postings.setdefault(term, (array("I"), array("I")))
+            positions.append(position)
+            offsets.append(offset)
+        term_ids = self._get_term_ids(list(postings), create=True)
+        self.conn.executemany("INSERT INTO index_postings (term_id, doc_id, positions, offsets) VALUES (?, ?, ?, ?)",
+                              [(term_ids[term], doc_id, positions.tobytes(), offsets.tobytes())
+                               for term, (positions, offsets) in postings.items()])
+        # Impressões digitais calculadas sobre os mesmos tokens (o texto não é percorrido de novo)
+        signature = minhash_signature([term for term, _ in tokens])
+        self.conn.execute("INSERT INTO content_fingerprints (doc_id, content_hash, minhash) VALUES (?, ?, ?)",
+                          (doc_id, content_hash(full_content), array("Q", signature).tobytes() if signature else None))
+        if signature:
+            self.conn.executemany("INSERT OR IGNORE INTO lsh_bands (band_key, doc_id) VALUES (?, ?)",
+                                  [(band_key, doc_id) for band_key in lsh_band_keys(signature)])
+        if self._bm25_documents is not None:
+            self._bm25_documents[doc_id] = (day, len(tokens))
+            for term, (positions, _) in postings.items():
+                entry = self._bm25_postings.get(term_ids[term])
+                if entry is None: continue
+                entry[0].append(doc_id)
+                entry[1].append(len(positions))
+                self._bm25_cached_postings += 1
+
+    def _doc_ids_for_term(self, term_id, within_docs=None):
+        # Lê só a chave primária (term_id, doc_id): não toca nos BLOBs de posições
+        if within_docs is None:
+            return {row[0] for row in self.conn.execute("SELECT doc_id FROM index_postings WHERE term_id = ?", (term_id,))}
+        doc_ids, found = list(within_docs), set()
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            found.update(row[0] for row in self.conn.execute(
+                f"SELECT doc_id FROM index_postings WHERE term_id = ? AND doc_id IN ({','.join('?' * len(chunk))})", [term_id] + chunk))
+        return found
+
+    def _load_postings(self, term_id, doc_ids):
+        result = {}
+        doc_ids = list(doc_ids)
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            rows = self.conn.execute(f"SELECT doc_id, positions, offsets FROM index_postings WHERE term_id = ? AND doc_id IN ({','.join('?' * len(chunk))})",
+                                     [term_id] + chunk)
+            for doc_id, positions_blob, offsets_blob in rows:
+                positions, offsets = array("I"), array("I")
+                positions.frombytes(positions_blob)
+                offsets.frombytes(offsets_blob)
+                result[doc_id] = (positions, offsets)
+        return result
+
+    def search_phrase(self, query, start_day=None, end_day=None, limit=None):
+        # Devolve {pub_id: [offsets onde a frase começa]} para as publicações (do intervalo de datas,
+        # se informado) que contêm todos os termos da consulta em sequência. Com `limit`, para nas
+        # primeiras `limit` publicações na ordem do índice, carregando as posições só dos lotes verificados.
+        terms = [term for term, _ in tokenize_for_index(query)]
+        if not terms: return {}
+        with self._lock:
+            self._sync_caches()
+            term_ids = self._get_term_ids(list(dict.fromkeys(terms)), create=False)
+            if len(term_ids) < len(set(terms)): return {} # Algum termo nunca apareceu no acervo
+            # Interseção dos documentos começando pelo termo mais raro; as posições só são
+            # carregadas para os documentos que contêm todos os termos.
+            day_docs = None
+            if start_day or end_day:
+                day_docs = {row[0] for row in self.conn.execute("SELECT doc_id FROM index_docs WHERE day BETWEEN ? AND ?",
+                                                                (start_day or "0000-00-00", end_day or "9999-99-99"))}
+                if not day_docs: return {}
+            # Em intervalos curtos, a leitura de cada termo já fica restrita aos documentos do intervalo
+            restrict_to = day_docs if day_docs is not None and len(day_docs) <= 5000 else None
+            doc_sets = sorted((self._doc_ids_for_term(term_id, restrict_to) for term_id in term_ids.values()), key=len)
+            candidate_docs = doc_sets[0].intersection(*doc_sets[1:])
+            if day_docs is not None: candidate_docs &= day_docs
+            if not candidate_docs: return {}
+            if limit is None: batches = [candidate_docs]
+            else:
+                candidate_docs = sorted(candidate_docs)
+                batches = [candidate_docs[start:start + max(1, limit)] for start in range(0, len(candidate_docs), max(1, limit))]
+            matches = {}
+            for batch in batches:
+                postings_by_term = {term: self._load_postings(term_id, batch) for term, term_id in term_ids.items()}
+                for doc_id in batch:
+                    first_positions, first_offsets = postings_by_term[terms[0]][doc_id]
+                    if len(terms) == 1:
+                        matches[doc_id] = list(first_offsets)
+                    else:
+                        following = [set(postings_by_term[term][doc_id][0]) for term in terms[1:]]
+                        hits = [offset for position, offset in zip(first_positions, first_offsets)
+                                if all(position + k + 1 in positions for k, positions in enumerate(following))]
+                        if hits: matches[doc_id] = hits
+                    if limit is not None and len(matches) >= limit: break
+                if limit is not None and len(matches) >= limit: break
+            if not matches: return {}
+            doc_ids = list(matches)
+            result = {}
+            for start in range(0, len(doc_ids), 500):
+                chunk = doc_ids[start:start + 500]
+                rows = self.conn.execute(f"SELECT doc_id, pub_id FROM index_docs WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk)
+                result.update((pub_id, matches[doc_id]) for doc_id, pub_id in rows)
+            return result
+
+    def rank_bm25(self, term_groups, start_day=None, end_day=None, top_k=10, k1=BM25_K1, b=BM25_B):
+        # Devolve [(pub_id, pontuação)] das `top_k` publicações do intervalo com maior BM25 para os grupos
+        # de termos de question_term_groups. O índice já guarda tudo o que o BM25 precisa: o tamanho de cada
+        # documento (token_count) e, nas postings, as posições de cada termo, cuja quantidade é o tamanho
+        # do BLOB (lido do cabeçalho da linha, sem carregar as posições). Termos comuns aparecem em quase
+        # todas as publicações, então as postings já lidas ficam em memória (ver _bm25_term_postings).
+        first_day, last_day = start_day or "0000-00-00", end_day or "9999-99-99"
+        scores = {}
+        with self._lock:
+            self._sync_bm25_cache()
+            # Normalização de tamanho de cada documento do intervalo: k1 * (1 - b + b * tamanho / tamanho médio)
+            lengths = {doc_id: length for doc_id, (day, length) in self._bm25_documents.items() if first_day <= day <= last_day}
+            if not lengths: return []
+            average_length = max(sum(lengths.values()) / len(lengths), 1e-9)
+            norms = {doc_id: k1 * (1 - b + b * length / average_length) for doc_id, length in lengths.items()}
+            for variants in term_groups:
+                frequencies = {} # doc_id -> ocorrências de qualquer variação
+                for term_id in self._get_term_ids(list(variants), create=False).values():
+                    for doc_id, frequency in zip(*self._bm25_term_postings(term_id)):
+                        if doc_id in norms: frequencies[doc_id] = frequencies.get(doc_id, 0) + frequency
+                if not frequencies: continue
+                idf = bm25_idf(len(norms), len(frequencies))
+                for doc_id, frequency in frequencies.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norms[doc_id])
+            top_documents = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            if not top_documents: return []
+            pub_ids = dict(self.conn.execute(f"SELECT doc_id, pub_id FROM index_docs WHERE doc_id IN ({','.join('?' * len(top_documents))})",
+                                             [doc_id for doc_id, _ in top_documents]).fetchall())
+        return [(pub_ids[doc_id], score) for doc_id, score in top_documents]
+
+    def find_duplicates(self, pub_ids, threshold=NEAR_DUPLICATE_THRESHOLD):
+        # Pares (pub_id, outro pub_id, similaridade) de publicações idênticas (similaridade 1.0, mesmo
+        # sha256 do texto) ou quase idênticas (Jaccard estimado >= threshold) a alguma de `pub_ids`, em
+        # qualquer data. Só as candidatas do LSH (alguma banda igual) têm a assinatura comparada.
+        def placeholders(values): return ",".join("?" * len(values))
+        with self._lock:
+            own = {}
+            pub_ids = list(pub_ids)
+            for start in range(0, len(pub_ids), 500):
+                chunk = pub_ids[start:start + 500]
+                own.update((row[0], (row[1], row[2], row[3])) for row in self.conn.execute(
+                    f"""SELECT f.doc_id, d.pub_id, f.content_hash, f.minhash FROM content_fingerprints f
+                        JOIN index_docs d ON d.doc_id = f.doc_id WHERE d.pub_id IN ({placeholders(chunk)})""", chunk))
+            if not own: return []
+            candidates = {} # doc_id da publicação -> doc_ids candidatos
+            hashes = list({content_hash_value for _, content_hash_value, _ in own.values()})
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                by_hash = {}
+                for doc_id, content_hash_value in self.conn.execute(
+                        f"SELECT doc_id, content_hash FROM content_fingerprints WHERE content_hash IN ({placeholders(chunk)})", chunk):
+                    by_hash.setdefault(content_hash_value, set()).add(doc_id)
+                for doc_id, (_, content_hash_value, _) in own.items():
+                    candidates.setdefault(doc_id, set()).update(by_hash.get(content_hash_value, ()))
+            band_owners = {}
+            for doc_id, (_, _, minhash_blob) in own.items():
+                if minhash_blob:
+                    for band_key in lsh_band_keys(list(array("Q", minhash_blob))): band_owners.setdefault(band_key, []).append(doc_id)
+            band_keys = list(band_owners)
+            for start in range(0, len(band_keys), 500):
+                chunk = band_keys[start:start + 500]
+                for band_key, doc_id in self.conn.execute(f"SELECT band_key, doc_id FROM lsh_bands WHERE band_key IN ({placeholders(chunk)})", chunk):
+                    for owner in band_owners[band_key]: candidates.setdefault(owner, set()).add(doc_id)
+            other_ids = list({doc_id for docs in candidates.values() for doc_id in docs} - set(own))
+            others = {}
+            for start in range(0, len(other_ids), 500):
+                chunk = other_ids[start:start + 500]
+                others.update((row[0], (row[1], row[2], row[3])) for row in self.conn.execute(
+                    f"""SELECT f.doc_id, d.pub_id, f.content_hash, f.minhash FROM content_fingerprints f
+                        JOIN index_docs d ON d.doc_id = f.doc_id WHERE f.doc_id IN ({placeholders(chunk)})""", chunk))
+        fingerprints = {**others, **own}
+        pairs = {}
+        for doc_id, candidate_ids in candidates.items():
+            pub_id, content_hash_value, minhash_blob = fingerprints[doc_id]
+            for candidate_id in candidate_ids - {doc_id}:
+                other_pub_id, other_hash, other_blob = fingerprints[candidate_id]
+                key = tuple(sorted((pub_id, other_pub_id)))
+                if key in pairs: continue
+                if other_hash == content_hash_value: similarity = 1.0
+                elif minhash_blob and other_blob: similarity = signature_similarity(array("Q", minhash_blob), array("Q", other_blob))
+                else: continue
+                if similarity >= threshold: pairs[key] = similarity
+        return [(pub_a, pub_b, similarity) for (pub_a, pub_b), similarity in pairs.items()]
+
+    def clear(self):
+        self.conn.execute("DELETE FROM content_fingerprints")
+        self.conn.execute("DELETE FROM lsh_bands")
+        self.conn.execute("DELETE FROM index_postings")
+        self.conn.execute("DELETE FROM index_docs")
+        self.conn.execute("DELETE FROM index_terms")
+        self._bump_generation()
+        self.discard_caches()
+        self._cache_generation = self.get_generation()
+
+# --- Armazenamento das publicações em SQLite ---
+# Campos dos registros de publicação (como usados no app) -> colunas da tabela
+PUBLICATION_FIELDS_TO_COLUMNS = {
+    "id": "id", "title": "title", "slug": "slug", "publicationDate": "publication_date",
+    "publicationTypeId": "publication_type_id", "fullContent": "full_content", "rawHtmlContent": "raw_html"
+}
+# Colunas lidas no caminho quente (lista do dia, buscas): tudo menos o HTML bruto
+HOT_PUBLICATION_COLUMNS = ", ".join(f"p.{column}" for column in PUBLICATION_FIELDS_TO_COLUMNS.values() if column != "raw_html")
+# O HTML bruto fica comprimido na tabela html_blobs, endereçado pelo sha256 (HTML idêntico é gravado uma vez)
+HTML_COMPRESSION_CODEC = "zstd" if zstandard else "zlib"
+
+def compress_html(raw_html):
+    data = raw_html.encode("utf-8")
+    if HTML_COMPRESSION_CODEC == "zstd": return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def decompress_html(codec, data):
+    if codec == "zstd":
+        if not zstandard: raise RuntimeError("HTML gravado com zstd, mas o pacote 'zstandard' não está instalado.")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+class PublicationStore:
+    # Cache das publicações indexado pelo `id` da publicação. Cada publicação é uma linha, então
+    # atualizar o fullContent de uma delas é um único UPSERT, e não a regravação do dia inteiro.
+    # A coluna `day` guarda a data consultada (AAAA-MM-DD) e `position` a ordem da lista da API.
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir): os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL") # Leitores não bloqueiam a escrita
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS publications (
+                    id TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    position INTEGER NOT NULL DEFAULT 0,
+                    slug TEXT,
+                    title TEXT,
+                    publication_date TEXT,
+                    publication_type_id TEXT,
+                    full_content TEXT,
+                    raw_html TEXT,
+                    updated_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_publications_day ON publications(day, position);
+                CREATE INDEX IF NOT EXISTS idx_publications_slug ON publications(slug);
+                CREATE TABLE IF NOT EXISTS days (
+                    day TEXT PRIMARY KEY,
+                    publication_count INTEGER NOT NULL,
+                    fetched_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS html_blobs (
+                    hash TEXT PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS watch_list_alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    publication_id TEXT NOT NULL,
+                    title TEXT,
+                    label TEXT NOT NULL,
+                    terms TEXT,
+                    match_count INTEGER NOT NULL,
+                    snippet TEXT,
+                    UNIQUE (publication_id, label)
+                );
+            """)
+            # Colunas acrescentadas depois da criação da tabela. Bancos anteriores guardam o HTML na coluna
+            # raw_html; o novo formato usa html_hash -> html_blobs (a coluna antiga continua sendo lida até o
+            # comando compactar-cache migrar as linhas). removed_at marca publicações que saíram da lista do dia.
+            existing_columns = [column["name"] for column in self.conn.execute("PRAGMA table_info(publications)")]
+            for column, column_type in (("html_hash", "TEXT"), ("removed_at", "REAL")):
+                if column not in existing_columns: self.conn.execute(f"ALTER TABLE publications ADD COLUMN {column} {column_type}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_publications_html_hash ON publications(html_hash)")
+            # version muda a cada gravação no dia (invalida o DayDatasetCache de todos os processos)
+            if "version" not in [column["name"] for column in self.conn.execute("PRAGMA table_info(days)")]:
+                self.conn.execute("ALTER TABLE days ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.index = PublicationIndex(self.conn, self._lock)
+
+    @staticmethod
+    def _row_to_publication(row):
+        row_columns = row.keys()
+        publication = {field: row[column] for field, column in PUBLICATION_FIELDS_TO_COLUMNS.items() if column in row_columns}
+        if "html_data" in row_columns and row["html_data"] is not None:
+            publication["rawHtmlContent"] = decompress_html(row["html_codec"], row["html_data"])
+        return publication
+
+    def _select_publications(self, where_sql, params, include_raw_html=False, order_sql=""):
+        if include_raw_html:
+            columns = f"{HOT_PUBLICATION_COLUMNS}, p.raw_html, b.codec AS html_codec, b.data AS html_data"
+            from_sql = "publications p LEFT JOIN html_blobs b ON b.hash = p.html_hash"
+        else:
+            columns, from_sql = HOT_PUBLICATION_COLUMNS, "publications p"
+        with self._lock:
+            return self.conn.execute(f"SELECT {columns} FROM {from_sql} WHERE {where_sql} {order_sql}", params).fetchall()
+
+    def _store_html(self, raw_html):
+        # Grava o HTML comprimido (se ainda não existir) e devolve o hash que o referencia
+        if not raw_html: return None
+        html_hash = hashlib.sha256(raw_html.encode("utf-8")).hexdigest()
+        if not self.conn.execute("SELECT 1 FROM html_blobs WHERE hash = ?", (html_hash,)).fetchone():
+            codec, data = compress_html(raw_html)
+            self.conn.execute("INSERT OR IGNORE INTO html_blobs (hash, codec, data, size) VALUES (?, ?, ?, ?)",
+                              (html_hash, codec, data, len(raw_html)))
+        return html_hash
+
+    def _delete_orphan_html(self, html_hashes=None):
+        # Apaga os HTMLs que nenhuma publicação referencia: só os de `html_hashes` (os que acabaram de perder
+        # uma referência, na transação de quem gravou) ou, sem eles, todos
+        if html_hashes is None:
+            return self.conn.execute("""DELETE FROM html_blobs WHERE NOT EXISTS
+                                            (SELECT 1 FROM publications WHERE publications.html_hash = html_blobs.hash)""").rowcount
+        return self.conn.executemany("DELETE FROM html_blobs WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM publications WHERE html_hash = ?)",
+                                     [(html_hash, html_hash) for html_hash in set(html_hashes) if html_hash]).rowcount
+
+    def get_day_version(self, day):
+        # Versão gravada no banco, e não na memória do processo: gravações de outros processos (backfill,
+        # monitor, outro servidor) também mudam a versão. None se o dia não está no cache.
+        with self._lock:
+            row = self.conn.execute("SELECT version FROM days WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else None
+
+    @contextmanager
+    def _index_transaction(self):
+        # Transação de quem também grava no índice: se for desfeita, os caches em memória do índice
+        # (ids de termos, postings do BM25) podem ter o que não chegou ao banco e são descartados
+        with self._lock:
+            try:
+                with self.conn: yield
+            except BaseException:
+                self.index.discard_caches()
+                raise
+
+    def get_index_generation(self):
+        # Muda a cada gravação no índice, de qualquer dia e de qualquer processo (ver PublicationIndex._bump_generation)
+        with self._lock:
+            return self.index.get_generation()
+
+    def _next_day_version(self):
+        # Contador único do banco (na tabela meta), dentro da transação de quem grava: uma versão nunca se
+        # repete, nem para um dia apagado e gravado de novo
+        self.conn.execute("""INSERT INTO meta (key, value) VALUES ('day_version_counter', 1)
+                             ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1""")
+        return int(self.conn.execute("SELECT value FROM meta WHERE key = 'day_version_counter'").fetchone()[0])
+
+    def _save_day_row(self, day, publication_count, fetched_at):
+        self.conn.execute("""INSERT INTO days (day, publication_count, fetched_at, version) VALUES (?, ?, ?, ?)
+                             ON CONFLICT(day) DO UPDATE SET publication_count = excluded.publication_count,
+                                 fetched_at = excluded.fetched_at, version = excluded.version""",
+                          (day, publication_count, fetched_at, self._next_day_version()))
+
+    def _upsert_rows(self, day, publications, start_position=0):
+        now = time.time()
+        # Sem HTML novo (ex.: só a lista do dia), o HTML já gravado para a publicação é mantido
+        self.conn.executemany("""
+            INSERT INTO publications (id, day, position, slug, title, publication_date, publication_type_id,
+                                      full_content, raw_html, html_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                day=excluded.day, position=excluded.position, slug=excluded.slug, title=excluded.title,
+                publication_date=excluded.publication_date, publication_type_id=excluded.publication_type_id,
+                full_content=excluded.full_content, updated_at=excluded.updated_at, removed_at=NULL,
+                raw_html=CASE WHEN excluded.html_hash IS NULL THEN publications.raw_html END,
+                html_hash=COALESCE(excluded.html_hash, publications.html_hash)
+        """, [(pub.get("id") or pub.get("slug"), day, start_position + i, pub.get("slug"), pub.get("title"),
+               pub.get("publicationDate"), pub.get("publicationTypeId"), pub.get("fullContent"),
+               self._store_html(pub.get("rawHtmlContent")), now) for i, pub in enumerate(publications)])
+        for pub in publications:
+            self.index.index_publication(pub.get("id") or pub.get("slug"), day, pub.get("fullContent"))
+
+    def save_day(self, day, publications):
+        # Grava (ou substitui) a lista completa de publicações de um dia numa única transação.
+        ids = [pub.get("id") or pub.get("slug") for pub in publications]
+        with get_metrics().span("cache_write_day"), self._index_transaction():
+            placeholders = ",".join("?" * len(ids))
+            # HTMLs que as publicações do dia referenciam agora: os que ficarem sem referência são apagados no fim
+            previous_hashes = [row[0] for row in self.conn.execute(
+                f"SELECT html_hash FROM publications WHERE html_hash IS NOT NULL AND (day = ? OR id IN ({placeholders}))", [day] + ids)]
+            self._upsert_rows(day, publications)
+            stale_rows = self.conn.execute(f"SELECT id FROM publications WHERE day = ? AND id NOT IN ({placeholders})", [day] + ids).fetchall()
+            for row in stale_rows: self.index.remove_publication(row["id"])
+            self.conn.execute(f"DELETE FROM publications WHERE day = ? AND id NOT IN ({placeholders})", [day] + ids)
+            self._delete_orphan_html(previous_hashes)
+            self._save_day_row(day, len(publications), time.time())
+        print(f"Dados salvos/atualizados no cache SQLite: {day} ({len(publications)} publicações)")
+
+    def merge_day_summary(self, day, summaries):
+        # Atualização incremental de um dia a partir da lista atual da API (publicações sem conteúdo):
+        # - novas: entram sem conteúdo, para serem buscadas em seguida;
+        # - alteradas (mesmo id, outro slug ou título): perdem o conteúdo, que será buscado de novo;
+        # - fora da lista: marcadas como removidas (continuam no banco, mas saem da lista e da busca);
+        # - as demais: só a posição é atualizada (e voltam, se tinham sido removidas).
+        # Devolve (ids novos, ids alterados, ids removidos).
+        now = time.time()
+        new_ids, changed_ids = [], []
+        with get_metrics().span("cache_merge_day"), self._index_transaction():
+            existing_rows = {row["id"]: row for row in self.conn.execute(
+                "SELECT id, slug, title, removed_at FROM publications WHERE day = ?", (day,))}
+            for position, pub in enumerate(summaries):
+                publication_id = pub.get("id") or pub.get("slug")
+                row = existing_rows.get(publication_id)
+                if row is None:
+                    new_ids.append(publication_id)
+                    self._upsert_rows(day, [pub], start_position=position)
+                elif row["slug"] != pub.get("slug") or row["title"] != pub.get("title"):
+                    changed_ids.append(publication_id)
+                    self.conn.execute("""UPDATE publications SET position = ?, slug = ?, title = ?, publication_date = ?,
+                                             publication_type_id = ?, full_content = NULL, raw_html = NULL, html_hash = NULL,
+                                             removed_at = NULL, updated_at = ? WHERE id = ?""",
+                                      (position, pub.get("slug"), pub.get("title"), pub.get("publicationDate"),
+                                       pub.get("publicationTypeId"), now, publication_id))
+                    self.index.remove_publication(publication_id)
+                else:
+                    self.conn.execute("UPDATE publications SET position = ?, removed_at = NULL WHERE id = ?", (position, publication_id))
+                    if row["removed_at"] is not None: # Voltou à lista: volta para a busca
+                        full_content = self.conn.execute("SELECT full_content FROM publications WHERE id = ?", (publication_id,)).fetchone()[0]
+                        self.index.index_publication(publication_id, day, full_content)
+            current_ids = {pub.get("id") or pub.get("slug") for pub in summaries}
+            removed_ids = [publication_id for publication_id, row in existing_rows.items()
+                           if publication_id not in current_ids and row["removed_at"] is None]
+            for publication_id in removed_ids:
+                self.conn.execute("UPDATE publications SET removed_at = ? WHERE id = ?", (now, publication_id))
+                self.index.remove_publication(publication_id)
+            if changed_ids: self._delete_orphan_html()
+            self._save_day_row(day, len(summaries), now)
+        print(f"Atualização incremental de {day}: {len(new_ids)} novas, {len(changed_ids)} alteradas, {len(removed_ids)} removidas")
+        return new_ids, changed_ids, removed_ids
+
+    def get_day_status(self, day):
+        # None se o dia nunca foi gravado; senão (nº de publicações, todas com conteúdo válido?)
+        with self._lock:
+            if not self.conn.execute("SELECT 1 FROM days WHERE day = ?", (day,)).fetchone(): return None
+            total, incomplete = self.conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(CASE WHEN full_content IS NULL OR full_content = ''
+                    OR instr(full_content, 'Erro') > 0 OR instr(full_content, 'Conteúdo não') > 0 THEN 1 ELSE 0 END), 0)
+                FROM publications WHERE day = ? AND removed_at IS NULL""", (day,)).fetchone()
+        return total, incomplete == 0
+
+    def load_day(self, day, include_raw_html=False):
+        with get_metrics().span("cache_read_day"):
+            rows = self._select_publications("p.day = ? AND p.removed_at IS NULL", (day,), include_raw_html, order_sql="ORDER BY p.position")
+        if rows: print(f"Dados carregados do cache SQLite: {day}")
+        return [self._row_to_publication(row) for row in rows]
+
+    def has_day(self, day):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM days WHERE day = ?", (day,)).fetchone() is not None
+
+    def update_publication(self, publication_id, **fields):
+        # Atualiza apenas os campos informados (ex.: fullContent=...) de uma única publicação.
+        with get_metrics().span("cache_write_publication"), self._index_transaction():
+            values = {PUBLICATION_FIELDS_TO_COLUMNS[field]: value for field, value in fields.items() if field != "rawHtmlContent"}
+            replaced_hashes = []
+            if "rawHtmlContent" in fields:
+                values.update(raw_html=None, html_hash=self._store_html(fields["rawHtmlContent"]))
+                # O HTML anterior (e o novo, se a publicação não existir) pode ficar sem referência
+                previous = self.conn.execute("SELECT html_hash FROM publications WHERE id = ?", (publication_id,)).fetchone()
+                replaced_hashes = [previous[0] if previous else None, values["html_hash"]]
+            assignments = ", ".join(f"{column} = ?" for column in values)
+            self.conn.execute(f"UPDATE publications SET {assignments}, updated_at = ? WHERE id = ?",
+                              list(values.values()) + [time.time(), publication_id])
+            row = self.conn.execute("SELECT day FROM publications WHERE id = ?", (publication_id,)).fetchone()
+            if row:
+                if "fullContent" in fields: self.index.index_publication(publication_id, row["day"], fields["fullContent"])
+                if set(fields) - {"rawHtmlContent"}: # O HTML bruto não fica em memória
+                    self.conn.execute("UPDATE days SET version = ? WHERE day = ?", (self._next_day_version(), row["day"]))
+            if replaced_hashes: self._delete_orphan_html(replaced_hashes)
+
+    def delete_day(self, day):
+        with self._index_transaction():
+            deleted = self.conn.execute("DELETE FROM publications WHERE day = ?", (day,)).rowcount
+            self.index.remove_day(day)
+            self.conn.execute("DELETE FROM days WHERE day = ?", (day,))
+            self._delete_orphan_html()
+        return deleted
+
+    def list_days(self, start_day=None, end_day=None):
+        with self._lock:
+            rows = self.conn.execute("SELECT day FROM days WHERE day BETWEEN ? AND ? ORDER BY day",
+                                     (start_day or "0000-00-00", end_day or "9999-99-99")).fetchall()
+        return [row["day"] for row in rows]
+
+    def iter_publications(self, start_day=None, end_day=None):
+        # Percorre as publicações de um intervalo de datas sem abrir um arquivo por dia
+        # e sem carregar o intervalo inteiro na memória.
+        for day in self.list_days(start_day, end_day):
+            for pub in self.load_day(day):
+                yield day, pub
+
+    def get_publication(self, publication_id, include_raw_html=True):
+        rows = self._select_publications("p.id = ?", (publication_id,), include_raw_html)
+        return self._row_to_publication(rows[0]) if rows else None
+
+    def get_raw_html(self, publication_id):
+        publication = self.get_publication(publication_id)
+        return publication.get("rawHtmlContent") if publication else None
+
+    def compact_raw_html(self, batch_size=200):
+        # Migra o HTML da coluna antiga raw_html para html_blobs (comprimido e sem duplicatas),
+        # em lotes curtos para não segurar o banco. Devolve o número de publicações migradas.
+        migrated_count = 0
+        while True:
+            with self._lock, self.conn:
+                rows = self.conn.execute("SELECT id, raw_html FROM publications WHERE raw_html IS NOT NULL LIMIT ?", (batch_size,)).fetchall()
+                for row in rows:
+                    self.conn.execute("UPDATE publications SET html_hash = ?, raw_html = NULL WHERE id = ?",
+                                      (self._store_html(row["raw_html"]) if row["raw_html"] else None, row["id"]))
+            migrated_count += len(rows)
+            if len(rows) < batch_size: break
+        with self._lock, self.conn: self._delete_orphan_html()
+        with self._lock:
+            self.conn.execute("VACUUM") # Devolve ao disco o espaço liberado
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return migrated_count
+
+    def get_database_size(self):
+        # Bytes em disco do banco e do WAL, depois de levar o WAL para o banco
+        with self._lock: self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return sum(os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal") if os.path.exists(path))
+
+    def get_html_blob_stats(self):
+        # (HTMLs distintos gravados, tamanho total sem compressão)
+        with self._lock:
+            return tuple(self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM html_blobs").fetchone())
+
+    def load_day_full_rows(self, day):
+        # Linhas inteiras, com o HTML bruto da coluna antiga: a leitura de um dia no formato anterior
+        with self._lock:
+            return self.conn.execute("SELECT * FROM publications WHERE day = ? ORDER BY position", (day,)).fetchall()
+
+    def get_publications_summary(self, publication_ids):
+        # Só os metadados (sem o conteúdo), do dia mais recente para o mais antigo
+        rows, publication_ids = [], list(publication_ids)
+        with self._lock:
+            for start in range(0, len(publication_ids), 500):
+                chunk = publication_ids[start:start + 500]
+                rows.extend(self.conn.execute(f"SELECT id, day, position, title FROM publications WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return sorted((dict(row) for row in rows), key=lambda row: (row["day"], -row["position"]), reverse=True)
+
+    def list_publications_by_type(self, publication_type_id, start_day=None, end_day=None):
+        # Publicações de um tipo (ex.: resoluções) no intervalo, sem o HTML bruto, com o campo "day",
+        # em ordem de dia e de posição na lista da API
+        with self._lock:
+            rows = self.conn.execute(f"""SELECT p.day, {HOT_PUBLICATION_COLUMNS} FROM publications p
+                                         WHERE p.publication_type_id = ? AND p.day BETWEEN ? AND ? AND p.removed_at IS NULL
+                                         ORDER BY p.day, p.position""",
+                                     (publication_type_id, start_day or "0000-00-00", end_day or "9999-99-99")).fetchall()
+        return [dict(self._row_to_publication(row), day=row["day"]) for row in rows]
+
+    def get_ids_without_raw_html(self, publication_ids):
+        missing_ids, publication_ids = set(), list(publication_ids)
+        with self._lock:
+            for start in range(0, len(publication_ids), 500):
+                chunk = publication_ids[start:start + 500]
+                missing_ids.update(row["id"] for row in self.conn.execute(
+                    f"""SELECT id FROM publications WHERE id IN ({','.join('?' * len(chunk))})
+                        AND html_hash IS NULL AND (raw_html IS NULL OR raw_html = '')""", chunk))
+        return missing_ids
+
+    def add_watch_list_alerts(self, alerts):
+        # Caixa de saída do monitor: um alerta por (publicação, lista). Uma publicação alterada que
+        # aciona de novo a mesma lista substitui o alerta anterior e ganha um id novo (volta a ser "novo").
+        now = time.time()
+        with self._lock, self.conn:
+            for alert in alerts:
+                self.conn.execute("""INSERT OR REPLACE INTO watch_list_alerts
+                                         (created_at, day, publication_id, title, label, terms, match_count, snippet)
+                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                                  (now, alert["day"], alert["publication_id"], alert["title"], alert["label"],
+                                   alert["terms"], alert["match_count"], alert["snippet"]))
+        return len(alerts)
+
+    def list_watch_list_alerts(self, limit=DOE_ALERTS_SHOWN):
+        # Os mais recentes primeiro; os ids só crescem, então "id > último visto" identifica os novos
+        with self._lock:
+            return [dict(row) for row in self.conn.execute("SELECT * FROM watch_list_alerts ORDER BY id DESC LIMIT ?", (limit,))]
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def rebuild_index(self):
+        # Reindexa todo o cache (necessário apenas quando SEARCH_INDEX_VERSION muda ou
+        # para bancos criados antes da existência do índice)
+        with self._index_transaction():
+            self.index.clear()
+            rows = self.conn.execute("SELECT id, day, full_content FROM publications").fetchall()
+            for row in rows: self.index.index_publication(row["id"], row["day"], row["full_content"])
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('search_index_version', ?)", (SEARCH_INDEX_VERSION,))
+        print(f"INFO: Índice de busca reconstruído: {len(rows)} publicações.")
+
+    def search(self, query, start_day=None, end_day=None, limit=None):
+        with get_metrics().span("search"): return self.index.search_phrase(query, start_day, end_day, limit)
+
+    def find_duplicates(self, publication_ids, threshold=NEAR_DUPLICATE_THRESHOLD):
+        with get_metrics().span("duplicate_lookup"): return self.index.find_duplicates(publication_ids, threshold)
+
+    def get_full_content_for_html(self, raw_html):
+        # Texto já extraído de um HTML idêntico (republicação), para não limpar o mesmo HTML de novo
+        with self._lock:
+            for (full_content,) in self.conn.execute("SELECT full_content FROM publications WHERE html_hash = ? AND full_content IS NOT NULL LIMIT 5",
+                                                     (hashlib.sha256(raw_html.encode("utf-8")).hexdigest(),)):
+                if has_usable_content(full_content): return full_content
+        return None
+
+    def rank_publications(self, question, start_day=None, end_day=None, top_k=10):
+        # Publicações mais relevantes para uma pergunta em texto livre (BM25), da mais para a menos relevante
+        with get_metrics().span("bm25_rank"): return self.index.rank_bm25(question_term_groups(question), start_day, end_day, top_k)
+
+    def import_json_cache(self, json_dir):
+        # Migração: importa os arquivos DOE_MP_AAAAMMDD.json existentes. Os arquivos não são apagados.
+        imported_days, imported_pubs = 0, 0
+        if not json_dir or not os.path.isdir(json_dir): return imported_days, imported_pubs
+        for filename in sorted(os.listdir(json_dir)):
+            match = re.fullmatch(r"DOE_MP_(\d{4})(\d{2})(\d{2})\.json", filename)
+            if not match: continue
+            day = "-".join(match.groups())
+            publications = load_publications_from_json(os.path.join(json_dir, filename))
+            if not publications: continue
+            self.save_day(day, publications)
+            imported_days += 1
+            imported_pubs += len(publications)
+        print(f"INFO: Migração do cache JSON concluída: {imported_days} dias, {imported_pubs} publicações.")
+        return imported_days, imported_pubs
+
+@st.cache_resource
+def get_publication_store():
+    # Uma conexão por processo, compartilhada entre sessões. Na primeira abertura do banco,
+    # importa (uma única vez) os caches JSON por dia gerados pelas versões anteriores.
+    store = PublicationStore(PATH_DB_FILE)
+    if not store.get_meta("json_cache_migrated"):
+        store.import_json_cache(PATH_JSON_FILES)
+        store.set_meta("json_cache_migrated", datetime.now().isoformat(timespec="seconds"))
+    if store.get_meta("search_index_version") != SEARCH_INDEX_VERSION:
+        store.rebuild_index()
+    return store
+
+DAY_DATASET_CACHE_MAX_DAYS = int(os.getenv("DAY_DATASET_CACHE_MAX_DAYS", "32"))
+
+class DayDatasetCache:
+    # Publicações de cada dia compartilhadas por todas as sessões do processo, sem o rawHtmlContent
+    # (lido do banco só quando necessário). Cada entrada guarda a versão do dia gravada no banco:
+    # qualquer gravação no dia (save_day, merge_day_summary, update_publication, delete_day), feita
+    # por este ou por outro processo, invalida a entrada e a próxima leitura recarrega do banco.
+    # Os registros são compartilhados e não devem ser alterados: mudanças passam pelo PublicationStore.
+    def __init__(self, store, max_days=DAY_DATASET_CACHE_MAX_DAYS):
+        self.store = store
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # dia -> (versão, publicações), do menos para o mais recente
+        self.hits, self.misses = 0, 0
+
+    def get(self, day):
+        version = self.store.get_day_version(day)
+        with self._lock:
+            entry = self._entries.get(day)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(day)
+                self.hits += 1
+                get_metrics().increment("day_cache_hits")
+                return entry[1]
+            self.misses += 1
+        get_metrics().increment("day_cache_misses")
+        publications = self.store.load_day(day, include_raw_html=False)
+        with self._lock:
+            # Não guarda dias vazios (podem ser gravados por outro processo) nem leituras concorrentes a uma gravação
+            if publications and self.store.get_day_version(day) == version:
+                self._entries[day] = (version, publications)
+                self._entries.move_to_end(day)
+                while len(self._entries) > self.max_days: self._entries.popitem(last=False)
+        return publications
+
+    def invalidate(self, day=None):
+        with self._lock:
+            if day is None: self._entries.clear()
+            else: self._entries.pop(day, None)
+
+    def format_stats(self):
+        with self._lock:
+            return f"Cache de dias do processo: {len(self._entries)} dia(s) em memória, {self.hits} acerto(s), {self.misses} leitura(s) do banco"
+
+@st.cache_resource
+def get_day_dataset_cache():
+    return DayDatasetCache(get_publication_store())
+
 
 def sanitize_filename_for_html(title, publication_id):
-    # ... (código da função como antes) ...
     numero_resolucao_formatado = None
     match = re.search(r"RESOLUÇÃO\s*(?:Nº|N\.|PGJ)?\s*([\d\.\s]+/\d{4})", title, re.IGNORECASE)
     if match:
@@ -165,10 +1680,59 @@ def sanitize_filename_for_html(title, publication_id):
         filename = f"{safe_title_part}_{publication_id[:8]}.html"
     return filename
 
+# --- Exportação das resoluções do MP ---
+# ZIPs preparados para download ficam numa pasta temporária do servidor e são apagados depois de algumas horas
+RESOLUTIONS_EXPORT_DIR = os.path.join(tempfile.gettempdir(), "doe_mp_exportacoes")
+RESOLUTIONS_EXPORT_MAX_AGE_SECONDS = int(os.getenv("RESOLUTIONS_EXPORT_MAX_AGE_SECONDS", str(6 * 3600)))
+# As listas dos dias fora do cache são buscadas durante a exportação, com a página esperando: acima
+# deste número de dias a exportação não começa (o backfill pela linha de comando preenche o cache antes)
+RESOLUTIONS_EXPORT_MAX_UNCACHED_DAYS = int(os.getenv("RESOLUTIONS_EXPORT_MAX_UNCACHED_DAYS", "31"))
+
+def resolution_file_names(resolutions):
+    # Nomes de sanitize_filename_for_html, sem repetição: publicações com o mesmo número de resolução
+    # (ex.: uma retificação) recebem o início do id no nome
+    used_names, file_names = set(), []
+    for pub_data in resolutions:
+        file_name = sanitize_filename_for_html(pub_data["title"], pub_data["id"])
+        if file_name in used_names: file_name = f"{file_name[:-len('.html')]}_{pub_data['id'][:8]}.html"
+        used_names.add(file_name)
+        file_names.append(file_name)
+    return file_names
+
+def ensure_raw_html(publications, max_workers=None, on_progress=None):
+    # Busca em paralelo (com o limitador de taxa do processo) o HTML bruto das publicações que ainda não
+    # o têm no cache e grava cada um assim que chega, sem acumular os HTMLs em memória. O fullContent
+    # também é gravado quando faltava. `on_progress(concluídas, total)` roda na thread de quem chamou.
+    # Devolve {id: (título, mensagem de erro)} das publicações cujo HTML não foi obtido.
+    store = get_publication_store()
+    missing_ids = store.get_ids_without_raw_html(pub_data["id"] for pub_data in publications)
+    missing_publications = [pub_data for pub_data in publications if pub_data["id"] in missing_ids]
+    failures = {}
+    if not missing_publications: return failures
+    print(f"  Buscando o HTML de {len(missing_publications)} publicação(ões) fora do cache...")
+    rate_limiter = get_doe_rate_limiter()
+
+    def fetch_one(pub_data):
+        rate_limiter.acquire()
+        return pub_data, get_publication_content_and_html(pub_data["slug"])
+
+    with ThreadPoolExecutor(max_workers=min(max(1, max_workers or DOE_FETCH_MAX_WORKERS), len(missing_publications))) as executor:
+        futures = [executor.submit(fetch_one, pub_data) for pub_data in missing_publications]
+        for completed_count, future in enumerate(as_completed(futures), start=1):
+            pub_data, (cleaned_text, raw_html, error_msg) = future.result()
+            if error_msg or not raw_html:
+                failures[pub_data["id"]] = (pub_data["title"], error_msg or "HTML vazio")
+            else:
+                fields = {"rawHtmlContent": raw_html}
+                if not has_usable_content(pub_data.get("fullContent")): fields["fullContent"] = cleaned_text or "Conteúdo não extraído."
+                store.update_publication(pub_data["id"], **fields)
+            if on_progress: on_progress(completed_count, len(missing_publications))
+    return failures
+
 def save_resolutions_as_html_files(publications_mp_list, html_base_path):
-    # ... (código da função como na sua última versão funcional,
-    #      que busca rawHtmlContent se não estiver em pub_data e salva) ...
-    if not publications_mp_list: # ... (código como antes)
+    # Grava no disco do servidor as resoluções do MP da lista. O HTML que falta no cache é buscado
+    # antes, em paralelo; depois cada arquivo é lido do cache e gravado, um de cada vez.
+    if not publications_mp_list:
         print("Nenhuma publicação do MP fornecida para salvar como HTML.")
         return "Nenhuma publicação fornecida."
     if not os.path.exists(html_base_path):
@@ -178,101 +1742,692 @@ def save_resolutions_as_html_files(publications_mp_list, html_base_path):
         except OSError as e:
             print(f"Erro ao criar pasta {html_base_path}: {e}. HTMLs serão salvos na pasta atual.")
             html_base_path = "."
+    resolutions = [pub_data for pub_data in publications_mp_list if pub_data.get("publicationTypeId") == ID_TIPO_RESOLUCAO]
+    failures = ensure_raw_html(resolutions)
+    for title, error_msg_html in failures.values():
+        st.warning(f"  HTML não obtido para '{title}': {error_msg_html}")
+    store = get_publication_store()
     resolutions_saved_count = 0
-    for pub_data in publications_mp_list:
-        if pub_data.get("publicationTypeId") == ID_TIPO_RESOLUCAO:
-            print(f"\nEncontrada Resolução para salvar como HTML: '{pub_data['title']}'")
-            raw_html_to_save = pub_data.get("rawHtmlContent")
-            if not raw_html_to_save or "Erro" in (raw_html_to_save or ""):
-                print("    HTML bruto não encontrado no cache ou com erro, buscando da API...")
-                _, raw_html_to_save, error_msg_html = get_publication_content_and_html(pub_data["slug"])
-                if error_msg_html or not raw_html_to_save:
-                    st.warning(f"  HTML não obtido para '{pub_data['title']}': {error_msg_html}") # Use st.warning
-                    continue
-                pub_data["rawHtmlContent"] = raw_html_to_save # Atualiza para cache futuro
-
-            html_filename = sanitize_filename_for_html(pub_data['title'], pub_data['id'])
-            full_html_path = os.path.join(html_base_path, html_filename)
-            try:
-                with open(full_html_path, "w", encoding="utf-8") as f_html:
-                    f_html.write(raw_html_to_save)
-                print(f"  Resolução salva como HTML: {full_html_path}")
-                resolutions_saved_count += 1
-            except Exception as e:
-                st.error(f"  Erro CRÍTICO ao salvar HTML para '{pub_data['title']}': {type(e).__name__} - {e}") # Use st.error
-            time.sleep(0.2) # Pequeno delay
+    for pub_data, html_filename in zip(resolutions, resolution_file_names(resolutions)):
+        if pub_data["id"] in failures: continue
+        raw_html_to_save = store.get_raw_html(pub_data["id"])
+        if not raw_html_to_save: continue
+        full_html_path = os.path.join(html_base_path, html_filename)
+        try:
+            write_file_atomically(full_html_path, raw_html_to_save)
+            print(f"  Resolução salva como HTML: {full_html_path}")
+            resolutions_saved_count += 1
+        except Exception as e:
+            st.error(f"  Erro CRÍTICO ao salvar HTML para '{pub_data['title']}': {type(e).__name__} - {e}")
     if resolutions_saved_count == 0:
         return "Nenhuma 'Resolução' do MP encontrada ou salva como HTML."
     else:
         return f"{resolutions_saved_count} resolução(ões) do MP salvas como HTML em '{html_base_path}'."
 
+def write_resolutions_zip(resolutions, zip_file):
+    # Escreve no arquivo aberto `zip_file` uma pasta AAAA-MM-DD por dia com o HTML das resoluções,
+    # lendo do cache um HTML por vez. Devolve o número de arquivos gravados.
+    store = get_publication_store()
+    written_count = 0
+    with zipfile.ZipFile(zip_file, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for day, day_resolutions in groupby(resolutions, key=lambda pub_data: pub_data["day"]):
+            day_resolutions = list(day_resolutions)
+            for pub_data, file_name in zip(day_resolutions, resolution_file_names(day_resolutions)):
+                raw_html = store.get_raw_html(pub_data["id"])
+                if not raw_html: continue
+                archive.writestr(f"{day}/{file_name}", raw_html)
+                written_count += 1
+    return written_count
+
+def remove_old_exports(max_age_seconds=RESOLUTIONS_EXPORT_MAX_AGE_SECONDS):
+    if not os.path.isdir(RESOLUTIONS_EXPORT_DIR): return
+    for file_name in os.listdir(RESOLUTIONS_EXPORT_DIR):
+        file_path = os.path.join(RESOLUTIONS_EXPORT_DIR, file_name)
+        try:
+            if time.time() - os.path.getmtime(file_path) > max_age_seconds: os.remove(file_path)
+        except OSError: pass # Removido por outro processo
+
+def uncached_days(days):
+    store = get_publication_store()
+    return [day for day in days if store.get_day_status(day) is None]
+
+def export_resolutions_zip(start_day, end_day, on_progress=None):
+    # Exporta para um ZIP em RESOLUTIONS_EXPORT_DIR as resoluções do MP do período. Dos dias fora do
+    # cache só a lista é buscada (em paralelo) e, das publicações, só o HTML das resoluções que faltam.
+    # `on_progress(etapa, concluídas, total)` roda na thread de quem chamou. Devolve um dicionário com
+    # o caminho do ZIP, o nome sugerido para o download, o total exportado e as falhas.
+    store = get_publication_store()
+    missing_days = uncached_days(days_in_range(start_day, end_day))
+    failed_days = {}
+    if missing_days:
+        with ThreadPoolExecutor(max_workers=min(DOE_FETCH_MAX_WORKERS, len(missing_days))) as executor:
+            futures = {executor.submit(fetch_day_once, day, summary_only=True): day for day in missing_days}
+            for completed_count, future in enumerate(as_completed(futures), start=1):
+                try: future.result()
+                except Exception as e: failed_days[futures[future]] = f"{type(e).__name__} - {e}"
+                if on_progress: on_progress("Listas dos dias fora do cache", completed_count, len(missing_days))
+    resolutions = store.list_publications_by_type(ID_TIPO_RESOLUCAO, start_day, end_day)
+    failures = ensure_raw_html(resolutions, on_progress=(lambda done, total: on_progress("HTML das resoluções", done, total))
+                               if on_progress else None)
+    remove_old_exports()
+    os.makedirs(RESOLUTIONS_EXPORT_DIR, exist_ok=True)
+    zip_fd, zip_path = tempfile.mkstemp(prefix="resolucoes_", suffix=".zip", dir=RESOLUTIONS_EXPORT_DIR)
+    with get_metrics().span("resolution_zip_write"), os.fdopen(zip_fd, "wb") as zip_file:
+        exported_count = write_resolutions_zip(resolutions, zip_file)
+    period_name = start_day if start_day == end_day else f"{start_day}_a_{end_day}"
+    print(f"  {exported_count} resolução(ões) de {start_day} a {end_day} exportadas em {zip_path}")
+    return {"path": zip_path, "file_name": f"Resolucoes_MP_{period_name}.zip", "start_day": start_day, "end_day": end_day,
+            "count": exported_count, "failures": failures, "failed_days": failed_days}
+
 
 # --- Funções do Gemini ---
-def analyze_text_with_gemini_open_question(publication_text, user_open_question):
-    if not st.session_state.get('gemini_ready', False) or not genai: # Checa a flag da sessão
-        st.warning("API do Gemini não está configurada. Análise não pode ser realizada.")
-        return "API Gemini não está configurada."
-    print("\n--- Enviando para análise do Gemini (pergunta aberta) ---")
-    try:
-        model = genai.GenerativeModel('gemini-1.5-flash-latest') 
-        prompt_to_gemini = f"""Analise o seguinte texto de uma publicação do Diário Oficial:
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-latest'
+# Mudar a versão sempre que o texto de um prompt mudar: respostas antigas deixam de ser reaproveitadas
+GEMINI_PROMPT_TEMPLATE_VERSION = "2"
+OPEN_QUESTION_PROMPT_TEMPLATE = """Analise o seguinte texto de uma publicação do Diário Oficial:
 TEXTO DA PUBLICAÇÃO:
 '''
 {publication_text}
 '''
 PERGUNTA DO USUÁRIO: {user_open_question}
 RESPOSTA:"""
-        response = model.generate_content(prompt_to_gemini)
-        if response.parts: return response.text.strip()
+# Publicações longas: divididas em trechos, só os mais relevantes para a pergunta vão ao Gemini
+# (em paralelo) e as respostas parciais são consolidadas numa chamada final.
+CHUNK_PROMPT_TEMPLATE = """Analise o seguinte trecho (parte {part_number} de {part_total}) de uma publicação do Diário Oficial:
+TRECHO DA PUBLICAÇÃO:
+'''
+{chunk_text}
+'''
+PERGUNTA DO USUÁRIO: {user_open_question}
+Responda usando apenas as informações deste trecho. Se o trecho não contiver nada relevante para a pergunta, responda apenas: SEM INFORMAÇÃO
+RESPOSTA:"""
+MERGE_PROMPT_TEMPLATE = """As respostas parciais abaixo foram obtidas analisando trechos diferentes da mesma publicação do Diário Oficial.
+{partial_answers}
+PERGUNTA DO USUÁRIO: {user_open_question}
+Consolide as respostas parciais numa única resposta completa e sem repetições.
+RESPOSTA:"""
+CHUNK_NO_INFORMATION_ANSWER = "sem informação"
+GEMINI_CHUNKING_THRESHOLD_CHARS = int(os.getenv("GEMINI_CHUNKING_THRESHOLD_CHARS", "30000")) # Abaixo disso: chamada única
+GEMINI_CHUNK_TARGET_CHARS = int(os.getenv("GEMINI_CHUNK_TARGET_CHARS", "8000"))
+GEMINI_CHUNK_TOP_K = int(os.getenv("GEMINI_CHUNK_TOP_K", "4"))
+GEMINI_MAX_CONCURRENT_CALLS = int(os.getenv("GEMINI_MAX_CONCURRENT_CALLS", "4"))
+GEMINI_BATCH_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_BATCH_REQUESTS_PER_MINUTE", "60")) # Padrão da análise em lote
+GEMINI_STREAMING_ENABLED = os.getenv("GEMINI_STREAMING", "1") == "1" # Resposta exibida conforme é gerada
+# Latências do modelo simulado (GEMINI_FAKE_MODEL=1)
+GEMINI_FAKE_FIRST_TOKEN_SECONDS = float(os.getenv("GEMINI_FAKE_FIRST_TOKEN_SECONDS", "0.5"))
+GEMINI_FAKE_TOKEN_DELAY_SECONDS = float(os.getenv("GEMINI_FAKE_TOKEN_DELAY_SECONDS", "0.02"))
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(30 * 24 * 3600))) # 30 dias
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "5000"))
+
+class FakeGenerativeModel:
+    # Substituto local de genai.GenerativeModel com a mesma interface usada pelo app
+    # (generate_content com ou sem stream=True, .parts, .text, .prompt_feedback), com latências
+    # configuráveis. Marcadores no texto do prompt simulam falhas: "[[BLOQUEAR]]" devolve uma
+    # resposta bloqueada (com stream=True, como o google-generativeai, a exceção de prompt bloqueado
+    # só sai ao percorrer o stream) e "[[FALHAR]]" interrompe o stream no meio com uma exceção.
+    def __init__(self, model_name=GEMINI_MODEL_NAME, first_token_seconds=None, token_delay_seconds=None):
+        self.model_name = model_name
+        self.first_token_seconds = GEMINI_FAKE_FIRST_TOKEN_SECONDS if first_token_seconds is None else first_token_seconds
+        self.token_delay_seconds = GEMINI_FAKE_TOKEN_DELAY_SECONDS if token_delay_seconds is None else token_delay_seconds
+
+    @staticmethod
+    def _response(text, blocked=False):
+        feedback = SimpleNamespace(block_reason="SAFETY" if blocked else None,
+                                   block_reason_message="Bloqueio simulado pelo modelo falso" if blocked else None)
+        return SimpleNamespace(parts=[] if blocked else [text], text=text, prompt_feedback=feedback)
+
+    def _answer_tokens(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        answer = (f"Resposta simulada ({digest}): o prompt tem {len(prompt)} caracteres. "
+                  "Este texto é gerado localmente pelo modelo falso, sem chamar a API do Gemini.")
+        return [word + " " for word in answer.split(" ")]
+
+    def _stream(self, prompt):
+        time.sleep(self.first_token_seconds)
+        tokens = self._answer_tokens(prompt)
+        for i, token in enumerate(tokens):
+            if "[[FALHAR]]" in prompt and i == len(tokens) // 2:
+                raise RuntimeError("Falha simulada no meio do stream")
+            yield self._response(token)
+            time.sleep(self.token_delay_seconds)
+
+    @staticmethod
+    def _blocked_stream(blocked):
+        raise FakeBlockedPromptException(blocked)
+        yield # Gerador: a exceção só é levantada na iteração
+
+    def generate_content(self, prompt, stream=False):
+        if "[[BLOQUEAR]]" in prompt:
+            time.sleep(self.first_token_seconds)
+            blocked = self._response("", blocked=True)
+            return _FakeStreamResponse(self._blocked_stream(blocked), blocked.prompt_feedback) if stream else blocked
+        if stream: return _FakeStreamResponse(self._stream(prompt), None)
+        text = "".join(chunk.text for chunk in self._stream(prompt.replace("[[FALHAR]]", "")))
+        return self._response(text.strip())
+
+class FakeBlockedPromptException(Exception):
+    # Equivalente de genai.types.BlockedPromptException: args[0] é a resposta bloqueada
+    pass
+
+def is_blocked_prompt_exception(error):
+    # Só compara com a exceção do google.generativeai se ele já foi importado (não importa só para isso)
+    genai = sys.modules.get("google.generativeai")
+    blocked_types = (FakeBlockedPromptException,) + ((genai.types.BlockedPromptException,) if genai else ())
+    return isinstance(error, blocked_types)
+
+class _FakeStreamResponse:
+    # Iterável de pedaços da resposta, como o objeto devolvido por generate_content(stream=True)
+    def __init__(self, chunks, prompt_feedback):
+        self._chunks = chunks
+        self.prompt_feedback = prompt_feedback
+
+    def __iter__(self):
+        return self._chunks
+
+@st.cache_resource
+def get_gemini_model():
+    # Criado uma vez por processo (e não a cada clique), na primeira análise: só então o
+    # google.generativeai é importado e configurado. Se falhar, a próxima chamada tenta de novo.
+    if GEMINI_USE_FAKE_MODEL: return FakeGenerativeModel()
+    genai = import_genai()
+    genai.configure(api_key=get_gemini_api_key())
+    print("INFO: API Key do Google Gemini configurada e pronta para uso.")
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+def normalize_question(question):
+    return " ".join(unicodedata.normalize("NFC", question or "").split()).casefold()
+
+def build_gemini_cache_key(model_name, publication_text, user_open_question, prompt_kind="open_question"):
+    # Endereçamento por conteúdo: a mesma publicação (ou trecho) + a mesma pergunta (normalizada) no
+    # mesmo modelo, tipo e versão de prompt gera a mesma chave, não importa a sessão ou a data de origem.
+    payload = json.dumps([model_name, GEMINI_PROMPT_TEMPLATE_VERSION, prompt_kind, publication_text,
+                          normalize_question(user_open_question)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class GeminiResponseCache:
+    # Cache persistente (SQLite) das respostas do Gemini, com expiração (TTL) e limite de
+    # tamanho com descarte LRU (menos recentemente usadas primeiro). Só respostas bem-sucedidas
+    # são gravadas; BLOCK_/ERROR_ nunca ficam em cache.
+    def __init__(self, db_path, ttl_seconds=GEMINI_CACHE_TTL_SECONDS, max_entries=GEMINI_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir): os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._hits, self._misses = 0, 0
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS gemini_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_gemini_responses_last_access ON gemini_responses(last_access_at)")
+
+    def get(self, cache_key):
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT answer, created_at FROM gemini_responses WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                self.conn.execute("DELETE FROM gemini_responses WHERE cache_key = ?", (cache_key,))
+                row = None
+            if not row:
+                self._misses += 1
+                get_metrics().increment("gemini_cache_misses")
+                return None
+            self.conn.execute("UPDATE gemini_responses SET last_access_at = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                              (now, cache_key))
+            self._hits += 1
+            get_metrics().increment("gemini_cache_hits")
+            return row[0]
+
+    def put(self, cache_key, model_name, answer):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute("""INSERT OR REPLACE INTO gemini_responses (cache_key, model_name, answer, created_at, last_access_at)
+                                 VALUES (?, ?, ?, ?, ?)""", (cache_key, model_name, answer, now, now))
+            self.conn.execute("DELETE FROM gemini_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.conn.execute("""DELETE FROM gemini_responses WHERE cache_key IN (
+                                     SELECT cache_key FROM gemini_responses ORDER BY last_access_at DESC LIMIT -1 OFFSET ?)""",
+                              (self.max_entries,))
+
+    def get_stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM gemini_responses").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {"hits": self._hits, "misses": self._misses, "entries": entries,
+                    "hit_rate": (self._hits / lookups) if lookups else 0.0}
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"Cache de respostas do Gemini: {stats['hit_rate']:.0%} de acertos "
+                f"({stats['hits']} de {stats['hits'] + stats['misses']} consultas neste processo, {stats['entries']} respostas guardadas)")
+
+@st.cache_resource
+def get_gemini_response_cache():
+    return GeminiResponseCache(PATH_GEMINI_CACHE_DB_FILE)
+
+def generate_gemini_answer(prompt_to_gemini, cache_key, rate_limiter=None):
+    # Uma chamada ao Gemini passando pelo cache de respostas. Devolve a resposta ou as strings
+    # BLOCK_OPEN_QUESTION/ERROR_API_OPEN_QUESTION usadas pela interface. O `rate_limiter` (opcional)
+    # só é consultado quando a chamada realmente vai à API; acertos no cache não consomem a cota.
+    response_cache = get_gemini_response_cache()
+    cached_answer = response_cache.get(cache_key)
+    if cached_answer is not None: return cached_answer
+    if rate_limiter is not None: rate_limiter.acquire()
+    try:
+        with get_metrics().span("gemini_call"): response = get_gemini_model().generate_content(prompt_to_gemini)
+        # No google-generativeai, response.parts de um prompt bloqueado levanta ValueError: o bloqueio é verificado antes
+        if getattr(getattr(response, "prompt_feedback", None), "block_reason", None): return get_block_message(response)
+        if response.parts:
+            answer = response.text.strip()
+            response_cache.put(cache_key, GEMINI_MODEL_NAME, answer)
+            return answer
         else:
-            block_reason = "N/A"; block_message = "N/A"
-            if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
-                 block_reason = response.prompt_feedback.block_reason or "Não especificado"
-                 block_message = response.prompt_feedback.block_reason_message or "Sem mensagem adicional"
-            return f"BLOCK_OPEN_QUESTION: {block_reason} - {block_message}"
+            return get_block_message(response)
     except Exception as e: return f"ERROR_API_OPEN_QUESTION: {type(e).__name__} - {e}"
 
+def is_gemini_failure(result):
+    return result.startswith(("BLOCK_", "ERROR_"))
+
+def split_text_into_chunks(text, target_chars=GEMINI_CHUNK_TARGET_CHARS):
+    # Agrupa os parágrafos gerados por clean_text_content (separados por linha em branco) em trechos
+    # de até `target_chars`. Parágrafos maiores que isso são quebrados por linha e, em último caso, no meio.
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= target_chars: pieces.append(paragraph); continue
+        for line in paragraph.split("\n"):
+            pieces.extend(line[i:i + target_chars] for i in range(0, len(line), target_chars))
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 2 + len(piece) > target_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current: chunks.append(current)
+    return chunks
+
+def score_chunks_for_question(chunks, user_open_question):
+    # Pontuação lexical local (tf-idf entre os trechos) dos termos da pergunta em cada trecho
+    query_terms = {term for term, _ in tokenize_for_index(user_open_question) if len(term) > 2}
+    chunk_term_counts = [Counter(term for term, _ in tokenize_for_index(chunk)) for chunk in chunks]
+    document_frequency = {term: sum(1 for counts in chunk_term_counts if term in counts) for term in query_terms}
+    return [sum(math.log1p(counts[term]) * math.log(1 + len(chunks) / document_frequency[term])
+                for term in query_terms if counts.get(term))
+            for counts in chunk_term_counts]
+
+def select_relevant_chunks(chunks, user_open_question, top_k=GEMINI_CHUNK_TOP_K):
+    # Os `top_k` trechos com maior pontuação, na ordem em que aparecem no texto. Se nenhum trecho
+    # tiver termos da pergunta (ex.: "resuma"), usa os primeiros trechos.
+    scores = score_chunks_for_question(chunks, user_open_question)
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    if not any(scores): ranked = list(range(len(chunks)))
+    return [(i, chunks[i]) for i in sorted(ranked[:top_k])]
+
+def analyze_long_text_with_gemini(publication_text, user_open_question, rate_limiter=None, max_workers=GEMINI_MAX_CONCURRENT_CALLS):
+    # `max_workers`: trechos enviados ao mesmo tempo (1 quando a chamada já roda dentro de um lote paralelo)
+    chunks = split_text_into_chunks(publication_text)
+    selected_chunks = select_relevant_chunks(chunks, user_open_question)
+    print(f"\n--- Texto longo ({len(publication_text)} caracteres): enviando {len(selected_chunks)} de {len(chunks)} trechos ao Gemini ---")
+
+    def analyze_chunk(indexed_chunk):
+        chunk_index, chunk_text = indexed_chunk
+        prompt_to_gemini = CHUNK_PROMPT_TEMPLATE.format(part_number=chunk_index + 1, part_total=len(chunks),
+                                                        chunk_text=chunk_text, user_open_question=user_open_question)
+        # "Parte X de Y" está no prompt (e pode mudar a resposta), então também entra na chave
+        cache_key = build_gemini_cache_key(GEMINI_MODEL_NAME, chunk_text, user_open_question, f"chunk {chunk_index + 1}/{len(chunks)}")
+        return generate_gemini_answer(prompt_to_gemini, cache_key, rate_limiter)
+
+    if max_workers <= 1: partial_answers = [analyze_chunk(indexed_chunk) for indexed_chunk in selected_chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(selected_chunks)))) as executor:
+            partial_answers = list(executor.map(analyze_chunk, selected_chunks))
+
+    failures = [answer for answer in partial_answers if is_gemini_failure(answer)]
+    useful_answers = [(chunk_index, answer) for (chunk_index, _), answer in zip(selected_chunks, partial_answers)
+                      if not is_gemini_failure(answer) and normalize_question(answer).strip(" .") != CHUNK_NO_INFORMATION_ANSWER]
+    if not useful_answers:
+        return failures[0] if failures else "Os trechos mais relevantes da publicação não contêm informação para responder à pergunta."
+    if len(useful_answers) == 1: return useful_answers[0][1]
+
+    partial_answers_text = "\n".join(f"RESPOSTA PARCIAL (trecho {chunk_index + 1}): {answer}" for chunk_index, answer in useful_answers)
+    prompt_to_gemini = MERGE_PROMPT_TEMPLATE.format(partial_answers=partial_answers_text, user_open_question=user_open_question)
+    return generate_gemini_answer(prompt_to_gemini, build_gemini_cache_key(GEMINI_MODEL_NAME, partial_answers_text, user_open_question, "merge"),
+                                  rate_limiter)
+
+def get_block_message(response):
+    block_reason = "N/A"; block_message = "N/A"
+    if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
+         # No google-generativeai, block_reason é um enum e nem toda versão tem block_reason_message
+         block_reason = response.prompt_feedback.block_reason
+         block_reason = getattr(block_reason, "name", block_reason) or "Não especificado"
+         block_message = getattr(response.prompt_feedback, "block_reason_message", None) or "Sem mensagem adicional"
+    return f"BLOCK_OPEN_QUESTION: {block_reason} - {block_message}"
+
+def stream_text_with_gemini_open_question(publication_text, user_open_question):
+    # Versão em stream de analyze_text_with_gemini_open_question: um gerador que devolve os pedaços
+    # da resposta assim que chegam (para st.write_stream). Respostas em cache e a análise em trechos
+    # de textos longos saem de uma vez. Bloqueios e falhas produzem as mesmas strings BLOCK_/ERROR_
+    # da versão sem stream; se a falha vier no meio do stream, ela é anexada ao texto já recebido.
+    if not is_gemini_ready():
+        yield "API Gemini não está configurada."
+        return
+    if len(publication_text) > GEMINI_CHUNKING_THRESHOLD_CHARS:
+        yield analyze_long_text_with_gemini(publication_text, user_open_question)
+        return
+    response_cache = get_gemini_response_cache()
+    cache_key = build_gemini_cache_key(GEMINI_MODEL_NAME, publication_text, user_open_question)
+    cached_answer = response_cache.get(cache_key)
+    if cached_answer is not None:
+        yield cached_answer
+        return
+    print("\n--- Enviando para análise do Gemini (pergunta aberta, stream) ---")
+    prompt_to_gemini = OPEN_QUESTION_PROMPT_TEMPLATE.format(publication_text=publication_text,
+                                                            user_open_question=user_open_question)
+    received_parts = []
+    metrics, started_at = get_metrics(), time.perf_counter()
+    try:
+        response = get_gemini_model().generate_content(prompt_to_gemini, stream=True)
+        for chunk in response:
+            if not chunk.parts: continue # Pedaço sem texto (ex.: apenas metadados de segurança)
+            if not received_parts: metrics.observe("gemini_stream_first_token", time.perf_counter() - started_at)
+            received_parts.append(chunk.text)
+            yield chunk.text
+        if not received_parts:
+            yield get_block_message(response)
+            return
+    except Exception as e:
+        if is_blocked_prompt_exception(e) and not received_parts:
+            # Com stream=True, o google-generativeai avisa do prompt bloqueado com uma exceção na iteração
+            yield get_block_message(e.args[0] if e.args else None)
+            return
+        metrics.increment("gemini_stream_errors")
+        yield ("\n\n" if received_parts else "") + f"ERROR_API_OPEN_QUESTION: {type(e).__name__} - {e}"
+        return
+    finally:
+        metrics.observe("gemini_stream", time.perf_counter() - started_at)
+    response_cache.put(cache_key, GEMINI_MODEL_NAME, "".join(received_parts).strip())
+
+def answer_open_question(publication_text, user_open_question, rate_limiter=None, chunk_workers=GEMINI_MAX_CONCURRENT_CALLS):
+    # Núcleo da análise, sem chamadas ao Streamlit (pode rodar em threads)
+    if len(publication_text) > GEMINI_CHUNKING_THRESHOLD_CHARS:
+        return analyze_long_text_with_gemini(publication_text, user_open_question, rate_limiter, max_workers=chunk_workers)
+    print("\n--- Enviando para análise do Gemini (pergunta aberta) ---")
+    prompt_to_gemini = OPEN_QUESTION_PROMPT_TEMPLATE.format(publication_text=publication_text,
+                                                            user_open_question=user_open_question)
+    return generate_gemini_answer(prompt_to_gemini, build_gemini_cache_key(GEMINI_MODEL_NAME, publication_text, user_open_question),
+                                  rate_limiter)
+
+def analyze_text_with_gemini_open_question(publication_text, user_open_question):
+    if not is_gemini_ready():
+        st.warning("API do Gemini não está configurada. Análise não pode ser realizada.")
+        return "API Gemini não está configurada."
+    return answer_open_question(publication_text, user_open_question)
+
+# --- Pergunta sobre o acervo: busca local (BM25) dos trechos mais relevantes do período e uma única chamada ao Gemini ---
+GEMINI_RETRIEVAL_TOP_PUBLICATIONS = int(os.getenv("GEMINI_RETRIEVAL_TOP_PUBLICATIONS", "8"))
+GEMINI_RETRIEVAL_TOP_PASSAGES = int(os.getenv("GEMINI_RETRIEVAL_TOP_PASSAGES", "6"))
+GEMINI_RETRIEVAL_PASSAGE_CHARS = int(os.getenv("GEMINI_RETRIEVAL_PASSAGE_CHARS", "1500"))
+GEMINI_RETRIEVAL_MAX_PASSAGES_PER_PUBLICATION = 2
+RETRIEVAL_PROMPT_TEMPLATE = """Os trechos abaixo foram selecionados, por uma busca local, entre as publicações do Ministério Público no Diário Oficial de {start_day} a {end_day}:
+{passages_text}
+PERGUNTA DO USUÁRIO: {user_open_question}
+Responda usando apenas as informações destes trechos e indique entre colchetes os números dos trechos usados (ex.: [1], [3]). Se os trechos não contiverem a resposta, diga isso.
+RESPOSTA:"""
+
+def score_passages_bm25(passage_texts, term_groups):
+    # BM25 entre os próprios trechos (idf e tamanho médio calculados sobre eles)
+    term_counts = [Counter(term for term, _ in tokenize_for_index(text)) for text in passage_texts]
+    lengths = [sum(counts.values()) for counts in term_counts]
+    average_length = sum(lengths) / max(len(lengths), 1)
+    scores = [0.0] * len(passage_texts)
+    for variants in term_groups:
+        frequencies = [sum(counts.get(variant, 0) for variant in variants) for counts in term_counts]
+        document_frequency = sum(1 for frequency in frequencies if frequency)
+        if not document_frequency: continue
+        idf = bm25_idf(len(passage_texts), document_frequency)
+        for i, frequency in enumerate(frequencies):
+            if frequency: scores[i] += bm25_term_score(idf, frequency, lengths[i], average_length)
+    return scores
+
+def retrieve_passages(question, start_day, end_day, top_publications=GEMINI_RETRIEVAL_TOP_PUBLICATIONS,
+                      top_passages=GEMINI_RETRIEVAL_TOP_PASSAGES):
+    # Duas etapas, ambas locais: as publicações do período são ranqueadas pelo índice (BM25) e só as
+    # `top_publications` primeiras são divididas em trechos, ranqueados de novo. Devolve os `top_passages`
+    # melhores trechos (no máximo 2 por publicação), na ordem das publicações e do texto.
+    store = get_publication_store()
+    ranked = store.rank_publications(question, start_day, end_day, top_publications)
+    summaries = {summary["id"]: summary for summary in store.get_publications_summary([pub_id for pub_id, _ in ranked])}
+    passages = []
+    for rank, (pub_id, _) in enumerate(ranked):
+        pub = store.get_publication(pub_id, include_raw_html=False)
+        if not pub or not has_usable_content(pub["fullContent"]): continue
+        for chunk_index, chunk_text in enumerate(split_text_into_chunks(pub["fullContent"], GEMINI_RETRIEVAL_PASSAGE_CHARS)):
+            passages.append({"rank": rank, "chunk_index": chunk_index, "id": pub_id, "day": summaries[pub_id]["day"],
+                             "title": summaries[pub_id]["title"], "text": chunk_text})
+    with get_metrics().span("bm25_passages"):
+        scores = score_passages_bm25([passage["text"] for passage in passages], question_term_groups(question))
+    selected, per_publication = [], Counter()
+    for i in sorted(range(len(passages)), key=lambda i: -scores[i]):
+        if len(selected) >= top_passages or scores[i] <= 0: break
+        if per_publication[passages[i]["id"]] >= GEMINI_RETRIEVAL_MAX_PASSAGES_PER_PUBLICATION: continue
+        per_publication[passages[i]["id"]] += 1
+        selected.append(dict(passages[i], score=scores[i]))
+    return sorted(selected, key=lambda passage: (passage["rank"], passage["chunk_index"])), len(ranked)
+
+def answer_question_over_period(user_open_question, start_day, end_day, rate_limiter=None):
+    # Núcleo da ação "Perguntar sobre um período": sem chamadas ao Streamlit. Devolve
+    # {"answer", "passages" (numerados como no prompt), "ranked_count", "retrieval_ms"}.
+    started_at = time.perf_counter()
+    passages, ranked_count = retrieve_passages(user_open_question, start_day, end_day)
+    retrieval_ms = 1000 * (time.perf_counter() - started_at)
+    for number, passage in enumerate(passages, start=1): passage["number"] = number
+    result = {"passages": passages, "ranked_count": ranked_count, "retrieval_ms": retrieval_ms}
+    if not passages:
+        return dict(result, answer="Nenhuma publicação do período (no cache) contém os termos da pergunta.")
+    if not is_gemini_ready(): return dict(result, answer="API Gemini não está configurada.")
+    passages_text = "\n".join(f"[{passage['number']}] {passage['title']} ({passage['day']}):\n'''\n{passage['text']}\n'''"
+                              for passage in passages)
+    print(f"\n--- Pergunta sobre {start_day} a {end_day}: {len(passages)} trecho(s) de {ranked_count} publicação(ões) "
+          f"ranqueadas em {retrieval_ms:.1f} ms enviados ao Gemini ---")
+    prompt_to_gemini = RETRIEVAL_PROMPT_TEMPLATE.format(start_day=start_day, end_day=end_day, passages_text=passages_text,
+                                                        user_open_question=user_open_question)
+    answer = generate_gemini_answer(prompt_to_gemini, build_gemini_cache_key(GEMINI_MODEL_NAME, passages_text, user_open_question, "retrieval"),
+                                    rate_limiter)
+    return dict(result, answer=answer)
+
+def analyze_publications_batch(publications, user_open_question, max_concurrent=GEMINI_MAX_CONCURRENT_CALLS,
+                               requests_per_minute=GEMINI_BATCH_REQUESTS_PER_MINUTE, on_result=None):
+    # A mesma pergunta para várias publicações, com no máximo `max_concurrent` chamadas em andamento e
+    # `requests_per_minute` chamadas à API por minuto (0 desativa o limite). `on_result(concluídas, total)`
+    # roda na thread de quem chamou (pode atualizar a interface). Respostas na ordem de `publications`.
+    # Publicações com texto idêntico (republicações) são enviadas uma única vez. Publicações longas têm
+    # os trechos enviados um por vez pela própria thread do lote: o total de chamadas simultâneas
+    # nunca passa de `max_concurrent`.
+    rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_concurrent)
+    answers = [None] * len(publications)
+    indexes_by_text = {}
+    for i, pub in enumerate(publications): indexes_by_text.setdefault(pub["fullContent"], []).append(i)
+    completed_count = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrent, len(indexes_by_text)))) as executor:
+        futures = {executor.submit(answer_open_question, text, user_open_question, rate_limiter, 1): indexes
+                   for text, indexes in indexes_by_text.items()}
+        for future in as_completed(futures):
+            for i in futures[future]: answers[i] = future.result()
+            completed_count += len(futures[future])
+            if on_result: on_result(completed_count, len(publications))
+    return answers
+
 DEFAULT_SEARCH_TERMS_CONFIG = [
     {"label": "Eduardo Tostes (e variações)", "terms": ["Dr. Eduardo Tostes", "Eduardo Tostes"]},
     {"label": "Bruno Henrique Rigoni Barros", "terms": ["Bruno Henrique Rigoni Barros"]},
     {"label": "Promotoria de Justiça de Franca", "terms": ["Promotoria de Justiça de Franca", "PJ de Franca", "Comarca de Franca"]} # Adicione variações
 ]
-# Modificar search_publications_for_names_local_and_consolidate para aceitar uma lista de termos
-def search_publications_for_terms_local(publications_mp_list, search_terms_list, json_filename_to_update):
+
+# --- Listas de monitoramento: todos os termos compilados num único autômato (Aho–Corasick) ---
+class WatchListMatcher:
+    # Compila os termos de todas as listas uma única vez. O autômato trabalha sobre os tokens
+    # normalizados do índice (sem diferenciar maiúsculas/minúsculas e acentos), então scan()
+    # percorre o texto uma só vez, qualquer que seja o tamanho das listas, e um termo só casa
+    # com palavras inteiras ("PJ de Franca" não casa com "PJ de Francana").
+    def __init__(self, watch_lists):
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        for label, terms in watch_lists:
+            for term in terms:
+                term_tokens = [token for token, _ in tokenize_for_index(term)]
+                if term_tokens: self._add_term(term_tokens, (label, term, len(term_tokens)))
+        self._build_failure_links()
+
+    def _add_term(self, term_tokens, output):
+        state = 0
+        for token in term_tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(output)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]: fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def scan(self, text):
+        # Devolve {label: [{"term", "start", "end"}, ...]} com as posições no texto original
+        hits = {}
+        if not text: return hits
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        matches = list(TOKEN_PATTERN.finditer(text))
+        state = 0
+        for i, match in enumerate(matches):
+            token = normalize_search_token(match.group())
+            while state and token not in goto[state]: state = fail[state]
+            state = goto[state].get(token, 0)
+            for label, term, length in outputs[state]:
+                hits.setdefault(label, []).append({"term": term, "start": matches[i - length + 1].start(), "end": match.end()})
+        return hits
+
+def watch_lists_from_config(search_terms_config):
+    # Formato imutável (e portanto "hashable") usado como chave do cache do autômato
+    return tuple((cfg["label"], tuple(cfg["terms"])) for cfg in search_terms_config)
+
+@st.cache_resource
+def get_watch_list_matcher(watch_lists):
+    # Compilado uma vez por processo para cada conjunto de listas e reaproveitado entre sessões
+    return WatchListMatcher(watch_lists)
+
+def ensure_publications_content(publications_mp_list, max_workers=None):
+    # Busca (em paralelo) o fullContent das publicações que estão sem conteúdo ou com erro. Com o
+    # carregamento em duas fases, é aqui que o conteúdo chega quando uma ação precisa dele antes do
+    # pré-carregamento em segundo plano; buscas do mesmo slug em andamento são reaproveitadas.
+    # O conteúdo é gravado no cache (o que invalida o dia no DayDatasetCache) e a função devolve a
+    # lista na mesma ordem, com cópias das publicações completadas: os registros recebidos, que podem
+    # ser os compartilhados pelo processo, não são alterados.
+    store = get_publication_store()
+    missing_publications = [pub_data for pub_data in publications_mp_list if not has_usable_content(pub_data.get("fullContent"))]
+    if not missing_publications: return list(publications_mp_list)
+    for pub_data in missing_publications:
+        print(f"    Buscando/Atualizando conteúdo para '{pub_data['title'][:50]}...'")
+    contents = fetch_publication_contents_concurrently([pub_data["slug"] for pub_data in missing_publications], max_workers=max_workers)
+    completed = {}
+    for pub_data, (cleaned_text, raw_html, error_msg_content) in zip(missing_publications, contents):
+        if error_msg_content: full_content = f"Erro: {error_msg_content}"
+        else: full_content = cleaned_text if cleaned_text else "Conteúdo não extraído."
+        fields = {"fullContent": full_content}
+        if raw_html and not error_msg_content: fields["rawHtmlContent"] = raw_html
+        store.update_publication(pub_data["id"], **fields) # Também reindexa
+        completed[pub_data["id"]] = dict(pub_data, fullContent=full_content)
+    return [completed.get(pub_data["id"], pub_data) for pub_data in publications_mp_list]
+
+WATCH_LIST_SCAN_CACHE_MAX_ENTRIES = int(os.getenv("WATCH_LIST_SCAN_CACHE_MAX_ENTRIES", "20000"))
+
+@st.cache_resource
+def get_watch_list_scan_cache():
+    # Resultado da varredura por (listas, sha256 do texto): textos idênticos (republicações, em qualquer
+    # data) são varridos uma única vez por processo
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def scan_with_cache(matcher, watch_lists, text, scan_cache):
+    key = (watch_lists, content_hash(text))
+    with scan_cache["lock"]:
+        hits = scan_cache["entries"].get(key)
+        if hits is not None:
+            scan_cache["entries"].move_to_end(key)
+            get_metrics().increment("watch_list_scan_cache_hits")
+            return hits
+    hits = matcher.scan(text)
+    get_metrics().increment("watch_list_scan_cache_misses")
+    with scan_cache["lock"]:
+        scan_cache["entries"][key] = hits
+        while len(scan_cache["entries"]) > WATCH_LIST_SCAN_CACHE_MAX_ENTRIES: scan_cache["entries"].popitem(last=False)
+    return hits
+
+def search_publications_for_watch_lists(publications_mp_list, search_terms_config=None):
+    # Varre cada publicação uma única vez com o autômato de todas as listas de monitoramento.
+    # Devolve [(publicação, {label: [ocorrências]}), ...] só com as publicações que tiveram algum acerto.
+    watch_lists = watch_lists_from_config(search_terms_config or DEFAULT_SEARCH_TERMS_CONFIG)
+    matcher, scan_cache = get_watch_list_matcher(watch_lists), get_watch_list_scan_cache()
+    publications_mp_list = ensure_publications_content(publications_mp_list)
+    results = []
+    with get_metrics().span("watch_list_scan"):
+        for pub_data in publications_mp_list:
+            if not has_usable_content(pub_data.get("fullContent")): continue
+            hits = scan_with_cache(matcher, watch_lists, pub_data["fullContent"], scan_cache)
+            if hits: results.append((pub_data, hits))
+    return results
+
+def format_watch_list_results(watch_list_results):
+    if not watch_list_results:
+        return "Nenhuma publicação encontrada mencionando termos das listas de monitoramento (busca local)."
+    response_parts = ["--- Publicações que Acionaram as Listas de Monitoramento (Busca Local) ---"]
+    for pub_data, hits in watch_list_results:
+        response_parts.append(f"\nTÍTULO: {pub_data['title']}")
+        for label, occurrences in hits.items():
+            found_terms = ", ".join(f"'{occ['term']}' (pos. {occ['start']})" for occ in occurrences)
+            response_parts.append(f"  [{label}] {found_terms}")
+        response_parts.append("-" * 50)
+    return "\n".join(response_parts)
+
+def search_publications_for_terms_local(publications_mp_list, search_terms_list, day=None):
+    # A busca consulta o índice invertido do cache (sem diferenciar maiúsculas/minúsculas e acentos);
+    # `day` restringe a consulta ao dia carregado.
     print(f"\nIniciando pesquisa local por termos: {search_terms_list}...")
     found_publications_details = []
-    content_was_fetched_in_this_run = False # Para saber se precisa salvar o JSON
+    store = get_publication_store()
+    publications_mp_list = ensure_publications_content(publications_mp_list)
 
-    for i, pub_data in enumerate(publications_mp_list):
+    matched_ids = set()
+    for term_to_find in search_terms_list:
+        matched_ids.update(store.search(term_to_find, start_day=day, end_day=day))
+
+    for pub_data in publications_mp_list:
         current_full_content = pub_data.get("fullContent")
-        if not current_full_content or "Erro" in current_full_content or "Conteúdo não" in current_full_content:
-            # Lógica para buscar fullContent se necessário (como na versão anterior)
-            print(f"    Buscando/Atualizando conteúdo para '{pub_data['title'][:50]}...'")
-            cleaned_text, _, error_msg_content = get_publication_content_and_html(pub_data["slug"])
-            if error_msg_content: pub_data["fullContent"] = f"Erro: {error_msg_content}"
-            else: pub_data["fullContent"] = cleaned_text if cleaned_text else "Conteúdo não extraído."
-            current_full_content = pub_data["fullContent"]
-            content_was_fetched_in_this_run = True
-        
-        if "Erro" in current_full_content or "Conteúdo não" in current_full_content or not current_full_content:
-            continue
-
-        found_term_in_pub = False
-        for term_to_find in search_terms_list:
-            if term_to_find.lower() in current_full_content.lower():
-                found_term_in_pub = True
-                break 
-        
-        if found_term_in_pub:
+        if pub_data.get("id") in matched_ids and has_usable_content(current_full_content):
             print(f"  ENCONTRADO! '{pub_data['title']}' menciona um dos termos.")
             found_publications_details.append({
                 "title": pub_data['title'],
                 "fullContent": current_full_content 
             })
     
-    if content_was_fetched_in_this_run and publications_mp_list:
-        save_to_json(publications_mp_list, json_filename_to_update)
-
     if not found_publications_details:
         return f"Nenhuma publicação encontrada mencionando os termos: {', '.join(search_terms_list)} (busca local)."
 
@@ -285,31 +2440,329 @@ def search_publications_for_terms_local(publications_mp_list, search_terms_list,
         response_parts.append("-" * 50 + "\n")
     return "\n".join(response_parts)
 
+# --- Busca local em um período (vários dias do cache) ---
+def days_in_range(start_day, end_day):
+    first_day, last_day = date.fromisoformat(start_day), date.fromisoformat(end_day)
+    return [(first_day + timedelta(days=i)).isoformat() for i in range((last_day - first_day).days + 1)]
+
+@st.cache_resource
+def get_background_executor():
+    # Pool do processo para buscas em segundo plano, com concorrência limitada e compartilhado entre sessões
+    return ThreadPoolExecutor(max_workers=max(1, DOE_BACKGROUND_DAY_WORKERS), thread_name_prefix="doe-background")
+
+@st.cache_resource
+def get_background_tasks():
+    # Tarefas em segundo plano em andamento, por chave (ex.: ("dia", data)): evita agendar duas vezes a mesma
+    return {"lock": threading.Lock(), "futures": {}}
+
+def schedule_background_task(key, func, *args):
+    # Agenda func(*args) no pool de segundo plano, a menos que a mesma chave já esteja em andamento.
+    # Devolve o future (novo ou o já existente).
+    in_flight = get_background_tasks()
+    with in_flight["lock"]:
+        future = in_flight["futures"].get(key)
+        if future is None or future.done():
+            future = get_background_executor().submit(func, *args)
+            in_flight["futures"][key] = future
+            future.add_done_callback(lambda _f: in_flight["futures"].pop(key, None))
+    return future
+
+def prefetch_day_contents(day, batch_size=None):
+    # Pré-carregamento em segundo plano: completa o conteúdo do dia na ordem da lista (a ordem em que
+    # os títulos aparecem na tela), em lotes. Publicações pedidas por uma ação durante o
+    # pré-carregamento são buscadas na hora por ensure_publications_content e puladas aqui.
+    batch_size = batch_size or DOE_FETCH_MAX_WORKERS
+    fetched_count = 0
+    while True:
+        pending = [pub for pub in get_day_dataset_cache().get(day) if not has_usable_content(pub.get("fullContent"))]
+        pending = [pub for pub in pending if pub.get("fullContent") is None] # Erros ficam para a busca sob demanda
+        if not pending: break
+        ensure_publications_content(pending[:batch_size])
+        fetched_count += len(pending[:batch_size])
+    print(f"Pré-carregamento de {day} concluído: {fetched_count} conteúdos buscados.")
+    return fetched_count
+
+def schedule_day_content_prefetch(day):
+    return schedule_background_task(("conteúdo", day), prefetch_day_contents, day)
+
+def fetch_and_cache_day(day):
+    publications = fetch_day_once(day) # Dias sem publicações também ficam registrados
+    return len(publications) if publications is not None else get_publication_store().get_day_status(day)[0]
+
+def schedule_missing_days(days, max_days=None):
+    # Agenda em segundo plano a busca dos dias que ainda não estão no cache (no máximo `max_days`,
+    # os mais recentes primeiro). Devolve {future: dia} para quem quiser acompanhar a conclusão.
+    store = get_publication_store()
+    in_flight = get_background_tasks()
+    scheduled = {}
+    for day in sorted(days, reverse=True):
+        if max_days is not None and len(scheduled) >= max_days: break
+        with in_flight["lock"]: already_running = ("dia", day) in in_flight["futures"]
+        if not already_running and store.get_day_status(day) is not None: continue
+        scheduled[schedule_background_task(("dia", day), fetch_and_cache_day, day)] = day
+    return scheduled
+
+def make_snippet(text, offset, width=160):
+    start, end = max(0, offset - width), min(len(text), offset + width)
+    snippet = text[start:end].replace("\n", " ")
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(text) else "")
+
+def iter_range_search_results(search_terms_list, start_day, end_day, max_results, pending_day_futures=None,
+                              max_wait_seconds=None):
+    # Gerador: devolve os resultados à medida que são encontrados (dias mais recentes primeiro),
+    # carregando do cache o conteúdo de uma publicação por vez, e para assim que `max_results`
+    # é atingido. O índice é consultado um dia por vez, com o que ainda falta de `max_results` como
+    # limite, então a parada antecipada também poupa a leitura das postings dos dias e publicações
+    # que não serão mostrados. Depois dos dias já em cache, acompanha os dias buscados em segundo plano
+    # (`pending_day_futures`, de schedule_missing_days) conforme eles ficam prontos, por no máximo
+    # `max_wait_seconds`: os que não terminarem continuam em segundo plano e ficam para a próxima pesquisa.
+    store = get_publication_store()
+    yielded_ids = set()
+
+    def find_matches(day, limit=None):
+        matches, truncated = {}, False
+        for term in search_terms_list:
+            term_matches = store.search(term, day, day, limit)
+            truncated = truncated or (limit is not None and len(term_matches) >= limit)
+            for pub_id, offsets in term_matches.items():
+                matches.setdefault(pub_id, []).extend(offsets)
+        return matches, truncated
+
+    def results_from(matches):
+        for summary in store.get_publications_summary(matches):
+            if summary["id"] in yielded_ids: continue
+            pub = store.get_publication(summary["id"], include_raw_html=False)
+            if not pub or not has_usable_content(pub["fullContent"]): continue
+            yielded_ids.add(summary["id"])
+            yield {"day": summary["day"], "id": summary["id"], "title": summary["title"],
+                   "match_count": len(matches[summary["id"]]),
+                   "snippet": make_snippet(pub["fullContent"], min(matches[summary["id"]]))}
+
+    def day_results(day):
+        remaining = max_results - len(yielded_ids)
+        matches, truncated = find_matches(day, remaining)
+        day_yielded = 0
+        for result in results_from(matches):
+            day_yielded += 1
+            yield result
+        if truncated and day_yielded < remaining:
+            # Publicações puladas (já mostradas ou sem conteúdo) ocuparam parte do limite: o dia é refeito sem ele
+            yield from results_from(find_matches(day)[0])
+
+    for day in reversed(store.list_days(start_day, end_day)):
+        for result in day_results(day):
+            yield result
+            if len(yielded_ids) >= max_results: return
+    try:
+        for future in as_completed(pending_day_futures or {}, timeout=max_wait_seconds):
+            day = pending_day_futures[future]
+            try: future.result()
+            except Exception as e:
+                print(f"  Busca em segundo plano de {day} falhou: {type(e).__name__} - {e}")
+                continue
+            for result in day_results(day):
+                yield result
+                if len(yielded_ids) >= max_results: return
+    except FuturesTimeoutError:
+        print(f"  Pesquisa no período: espera de {max_wait_seconds:g} s pelos dias em segundo plano esgotada")
+
+def render_range_search_result(result):
+    st.markdown(f"**{result['day']}** · `{result['title']}` ({result['match_count']} ocorrência(s))")
+    st.caption(result["snippet"])
+
 # --- Lógica Principal da Aplicação Streamlit ---
-# @st.cache_data # Cache em load_or_fetch_data_for_date foi removido para refletir mudanças no fullContent imediatamente
-def load_or_fetch_data_for_date(target_date_str, json_file_path): # Passar o caminho do JSON
-    publications = load_publications_from_json(json_file_path)
+# Em vez de @st.cache_data (que copia o resultado para cada chamada), as publicações do dia ficam no
+# DayDatasetCache do processo, invalidado a cada mudança no fullContent. A sessão guarda só a data.
+def load_or_fetch_data_for_date(target_date_str):
+    publications = get_day_dataset_cache().get(target_date_str)
     if not publications:
         with st.spinner(f"Buscando dados do DOE para {target_date_str}... (Pode levar alguns minutos)"):
-            publications = fetch_mp_publications_and_prepare_content(target_date_str)
-            if publications:
-                save_to_json(publications, json_file_path) # Salva o JSON com fullContent e rawHtmlContent
+            try: # Se outra sessão já está buscando esta data, espera pela mesma busca
+                fetch_day_once(target_date_str, is_fresh=lambda day_status: bool(day_status and day_status[0]),
+                               save_empty_day=False, summary_only=DOE_LAZY_CONTENT)
+            except Exception: return [] # O erro já foi registrado no log pela busca
+            publications = get_day_dataset_cache().get(target_date_str)
+    if any(pub.get("fullContent") is None for pub in publications):
+        schedule_day_content_prefetch(target_date_str) # Também retoma pré-carregamentos interrompidos
     return publications
 
-# Inicializa o estado da sessão
-if 'publications_mp' not in st.session_state: st.session_state.publications_mp = []
-if 'selected_date' not in st.session_state: st.session_state.selected_date = date.today()
-if 'current_action' not in st.session_state: st.session_state.current_action = "Selecione..."
-if 'action_result_message' not in st.session_state: st.session_state.action_result_message = None
-# Para a Opção 1:
-if 'selected_pub_index_for_gemini_str' not in st.session_state: st.session_state.selected_pub_index_for_gemini_str = ""
-if 'user_question_gemini' not in st.session_state: st.session_state.user_question_gemini = ""
-# Para a Opção "Exibir Detalhes":
-if 'selected_pub_index_for_details_str' not in st.session_state: st.session_state.selected_pub_index_for_details_str = ""
+def get_session_publications():
+    # Publicações do dia carregado nesta sessão (referência aos registros compartilhados do processo)
+    loaded_day = st.session_state.get("loaded_day")
+    return get_day_dataset_cache().get(loaded_day) if loaded_day else []
+
+def init_session_state():
+    # Chamada no início de cada execução do app (e não na importação do módulo, que também é usado pela linha de comando)
+    if 'loaded_day' not in st.session_state: st.session_state.loaded_day = None
+    if 'selected_date' not in st.session_state: st.session_state.selected_date = date.today()
+    if 'current_action' not in st.session_state: st.session_state.current_action = "Selecione..."
+    if 'action_result_message' not in st.session_state: st.session_state.action_result_message = None
+    # Para a Opção 1:
+    if 'selected_pub_index_for_gemini_str' not in st.session_state: st.session_state.selected_pub_index_for_gemini_str = ""
+    if 'user_question_gemini' not in st.session_state: st.session_state.user_question_gemini = ""
+    # Para a Opção "Exibir Detalhes":
+    if 'selected_pub_index_for_details_str' not in st.session_state: st.session_state.selected_pub_index_for_details_str = ""
+
+
+# --- Lista de títulos e detalhes: o custo de cada rerun não cresce com o tamanho do dia ---
+TITLE_LIST_PAGE_SIZES = (25, 50, 100, 250)
+DETAILS_PREVIEW_CHARS = int(os.getenv("DOE_DETAILS_PREVIEW_CHARS", "3000")) # Prévia do conteúdo antes de "Mostrar tudo"
+
+def filter_publication_titles(publications, query):
+    # [(número na lista do dia, título)] das publicações cujo título contém `query`, sem diferenciar
+    # maiúsculas e acentos (a normalização de cada título fica em cache entre os reruns)
+    normalized_query = normalize_search_token(query.strip()) if query and query.strip() else ""
+    return [(i + 1, pub["title"]) for i, pub in enumerate(publications)
+            if not normalized_query or normalized_query in normalize_search_token(pub["title"] or "")]
+
+def render_title_list(publications):
+    # Filtro e paginação, com a página atual num único elemento (em vez de um st.markdown por título)
+    title_filter = st.text_input("Filtrar títulos:", key="title_filter", placeholder="Ex.: resolução, portaria, designa")
+    matches = filter_publication_titles(publications, title_filter)
+    filter_col, page_col = st.columns(2)
+    with filter_col:
+        page_size = st.selectbox("Títulos por página:", TITLE_LIST_PAGE_SIZES, key="title_page_size")
+    page_count = max(1, math.ceil(len(matches) / page_size))
+    if st.session_state.get("title_page", 1) > page_count: st.session_state.title_page = page_count # Filtro ou dia mudou
+    with page_col:
+        page = st.number_input(f"Página (de {page_count}):", min_value=1, max_value=page_count, step=1, key="title_page")
+    page_rows = matches[(page - 1) * page_size:page * page_size]
+    if not page_rows:
+        st.info("Nenhum título corresponde ao filtro.")
+        return
+    st.dataframe([{"Nº": number, "Título": title} for number, title in page_rows], use_container_width=True, hide_index=True)
+    first_shown = (page - 1) * page_size + 1
+    filtered_note = f" (filtrados de {len(publications)})" if len(matches) != len(publications) else ""
+    st.caption(f"Mostrando {first_shown}–{first_shown + len(page_rows) - 1} de {len(matches)} título(s){filtered_note}.")
+
+def find_duplicate_groups(publication_ids, threshold=NEAR_DUPLICATE_THRESHOLD):
+    # Agrupa as publicações idênticas ou quase idênticas a alguma de `publication_ids` (em qualquer data).
+    # Cada grupo é uma lista de {"id", "day", "title", "similarity"} em ordem de data; "similarity" é a
+    # similaridade com a primeira publicação do grupo (1.0 = texto idêntico; None se não foi comparada).
+    store = get_publication_store()
+    pairs = store.find_duplicates(publication_ids, threshold)
+    parent = {}
+    def find(pub_id):
+        while parent.setdefault(pub_id, pub_id) != pub_id:
+            parent[pub_id] = parent[parent[pub_id]]
+            pub_id = parent[pub_id]
+        return pub_id
+    for pub_a, pub_b, _ in pairs: parent[find(pub_a)] = find(pub_b)
+    similarities = {frozenset((pub_a, pub_b)): similarity for pub_a, pub_b, similarity in pairs}
+    summaries = {summary["id"]: summary for summary in store.get_publications_summary(list(parent))}
+    members_by_root = {}
+    for pub_id in parent:
+        if pub_id in summaries: members_by_root.setdefault(find(pub_id), []).append(summaries[pub_id])
+    groups = []
+    for members in members_by_root.values():
+        if len(members) < 2: continue
+        members.sort(key=lambda summary: (summary["day"], summary["position"]))
+        first_id = members[0]["id"]
+        groups.append([{"id": summary["id"], "day": summary["day"], "title": summary["title"],
+                        "similarity": 1.0 if summary["id"] == first_id else similarities.get(frozenset((first_id, summary["id"])))}
+                       for summary in members])
+    return sorted(groups, key=lambda group: (group[0]["day"], group[0]["title"] or ""))
+
+def get_day_duplicate_groups(day, publications):
+    # Calculado uma vez por versão do dia e guardado na sessão (a lista é redesenhada a cada rerun). Os grupos
+    # incluem publicações de outros dias, então a geração do índice também entra na chave.
+    store = get_publication_store()
+    cache_key = (day, store.get_day_version(day), store.get_index_generation())
+    if st.session_state.get("duplicate_groups_key") != cache_key:
+        st.session_state.duplicate_groups = find_duplicate_groups([pub["id"] for pub in publications])
+        st.session_state.duplicate_groups_key = cache_key
+    return st.session_state.duplicate_groups
+
+DUPLICATE_GROUP_MEMBERS_SHOWN = 20 # Listas de designação idênticas podem formar grupos com centenas de publicações
+
+def format_similarity(similarity):
+    if similarity is None: return "semelhante"
+    return "idêntica" if similarity >= 1.0 else f"{100 * similarity:.0f}% semelhante"
+
+def format_duplicate_members(members, mark_first=True):
+    lines = [f"- **{member['day']}** · {member['title']}" + ("" if mark_first and i == 0 else f" ({format_similarity(member['similarity'])})")
+             for i, member in enumerate(members[:DUPLICATE_GROUP_MEMBERS_SHOWN])]
+    if len(members) > DUPLICATE_GROUP_MEMBERS_SHOWN: lines.append(f"- ... e mais {len(members) - DUPLICATE_GROUP_MEMBERS_SHOWN}")
+    return "\n".join(lines)
+
+def render_duplicate_groups(day, publications):
+    groups = get_day_duplicate_groups(day, publications)
+    if not groups: return
+    with st.expander(f"Publicações repetidas ou quase idênticas ({len(groups)} grupo(s))"):
+        st.caption("Similaridade em relação à primeira publicação (a mais antiga) de cada grupo.")
+        for group in groups: st.markdown(format_duplicate_members(group))
+
+def build_publication_json(publication_id, fallback_publication):
+    # JSON completo da publicação, com o rawHtmlContent lido do banco
+    return json.dumps(get_publication_store().get_publication(publication_id) or fallback_publication, indent=4, ensure_ascii=False)
+
+def build_batch_results_csv(batch_results):
+    batch_csv_buffer = io.StringIO()
+    batch_csv_writer = csv.DictWriter(batch_csv_buffer, fieldnames=["Nº", "Título", "Resposta"])
+    batch_csv_writer.writeheader()
+    batch_csv_writer.writerows(batch_results)
+    return batch_csv_buffer.getvalue().encode("utf-8-sig")
+
+def render_publication_content(full_content, publication_id):
+    # Prévia de DETAILS_PREVIEW_CHARS caracteres; o texto completo só é enviado ao navegador quando pedido
+    show_full_content = len(full_content) <= DETAILS_PREVIEW_CHARS or st.toggle(
+        f"Mostrar conteúdo completo ({len(full_content):,} caracteres)".replace(",", "."), key=f"show_full_content_{publication_id}")
+    shown_content = full_content if show_full_content else full_content[:DETAILS_PREVIEW_CHARS].rstrip() + " [...]"
+    st.markdown(shown_content.replace('\n', '  \n'))
 
+def get_monitor_status():
+    # Status gravado pelo monitor (ou None, se ele nunca rodou). As publicações que ele grava mudam a
+    # versão do dia no banco, e o DayDatasetCache deste processo recarrega o dia sozinho.
+    return json.loads(get_publication_store().get_meta("monitor_status", "null"))
+
+@st.fragment(run_every=DOE_ALERTS_REFRESH_SECONDS)
+def render_watch_list_alerts():
+    # Alertas gravados pelo comando "monitorar". Só este trecho é reexecutado periodicamente (não o app
+    # inteiro), então um alerta aparece na barra lateral segundos depois de gravado.
+    monitor_status = get_monitor_status()
+    alerts = get_publication_store().list_watch_list_alerts()
+    if not monitor_status and not alerts: return # Monitor nunca usado com este banco
+    if 'last_seen_alert_id' not in st.session_state: st.session_state.last_seen_alert_id = 0
+    if 'last_notified_alert_id' not in st.session_state: st.session_state.last_notified_alert_id = max((a["id"] for a in alerts), default=0)
+    new_alerts = [alert for alert in alerts if alert["id"] > st.session_state.last_seen_alert_id]
+    for alert in reversed([alert for alert in alerts if alert["id"] > st.session_state.last_notified_alert_id]):
+        st.toast(f"🔔 [{alert['label']}] {alert['title']}")
+    st.session_state.last_notified_alert_id = max([st.session_state.last_notified_alert_id] + [a["id"] for a in alerts])
+
+    st.subheader(f"🔔 Alertas ({len(new_alerts)} novo(s))" if new_alerts else "🔔 Alertas")
+    if monitor_status:
+        st.caption(f"Monitor: última verificação de {monitor_status['day']} às "
+                   f"{datetime.fromtimestamp(monitor_status['last_poll_at']).strftime('%H:%M:%S')}.")
+    for alert in alerts:
+        marker = "🆕 " if alert["id"] > st.session_state.last_seen_alert_id else ""
+        st.markdown(f"{marker}**{alert['day']}** · [{alert['label']}] {alert['title']}")
+        st.caption(alert["snippet"])
+    if new_alerts:
+        st.button("Marcar alertas como vistos", key="mark_alerts_seen_btn",
+                  on_click=lambda: st.session_state.update(last_seen_alert_id=alerts[0]["id"]))
+
+def render_metrics_panel():
+    # Painel opcional da barra lateral: p50/p95 de cada etapa e contadores do processo do servidor
+    # (somam todas as sessões atendidas por ele desde que foi iniciado)
+    stages, counters = get_metrics().snapshot()
+    st.sidebar.subheader("Desempenho (este processo)")
+    if stages:
+        st.sidebar.dataframe([{"Etapa": row["stage"], "Chamadas": row["count"], "p50 (ms)": round(1000 * row["p50_s"], 1),
+                               "p95 (ms)": round(1000 * row["p95_s"], 1), "Total (s)": round(row["total_s"], 2)} for row in stages],
+                             use_container_width=True, hide_index=True)
+    else: st.sidebar.caption("Nenhuma etapa medida ainda.")
+    if counters:
+        st.sidebar.dataframe([{"Contador": name, "Valor": value} for name, value in sorted(counters.items())],
+                             use_container_width=True, hide_index=True)
+    st.sidebar.caption(get_doe_client().format_stats())
+    st.sidebar.caption(get_day_dataset_cache().format_stats())
+    st.sidebar.caption(get_gemini_response_cache().format_stats())
+    if DOE_METRICS_PORT: st.sidebar.caption(f"Formato Prometheus: http://{DOE_METRICS_HOST}:{DOE_METRICS_PORT}/metrics")
 
 def streamlit_app():
     st.set_page_config(page_title="Chatbot DOE - MP", layout="wide")
+    init_session_state()
+    if DOE_METRICS_PORT: start_metrics_server(DOE_METRICS_HOST, DOE_METRICS_PORT)
     st.title("🔎 Chatbot do Diário Oficial - MPSP ⚖️")
 
     # --- SELEÇÃO DE DATA ---
@@ -320,7 +2773,7 @@ def streamlit_app():
         # Se a data realmente mudou, limpa as publicações e a ação
         if st.session_state.date_picker_key != st.session_state.selected_date:
             st.session_state.selected_date = st.session_state.date_picker_key
-            st.session_state.publications_mp = [] 
+            st.session_state.loaded_day = None
             st.session_state.current_action = "Selecione..." 
             st.session_state.action_result_message = None
             # Não precisa de rerun aqui, a mudança do widget já causa um.
@@ -337,46 +2790,68 @@ def streamlit_app():
         on_change=date_input_on_change
     )
     target_date_str = st.session_state.selected_date.strftime("%Y-%m-%d")
-    json_filename_base = f"DOE_MP_{target_date_str.replace('-', '')}.json"
-    json_filename_full_path = os.path.join(PATH_JSON_FILES or ".", json_filename_base)
 
 
     if st.sidebar.button(f"Carregar Publicações de {target_date_str}", key="load_data_button"):
-        st.session_state.publications_mp = load_or_fetch_data_for_date(target_date_str, json_filename_full_path)
+        loaded_publications = load_or_fetch_data_for_date(target_date_str)
+        st.session_state.loaded_day = target_date_str if loaded_publications else None
         st.session_state.current_action = "Selecione..." 
         st.session_state.action_result_message = None 
-        if not st.session_state.publications_mp:
+        if not loaded_publications:
             st.sidebar.warning(f"Nenhuma publicação do MP para {target_date_str}.")
         # st.rerun() # Geralmente não é necessário aqui, a mudança no estado já causa re-render
 
+    if st.sidebar.button(f"Atualizar Publicações de {target_date_str}", key="refresh_data_button",
+                         help="Consulta a lista do dia e baixa só as publicações novas ou alteradas (ex.: suplementos)."):
+        try:
+            with st.spinner(f"Verificando novas publicações de {target_date_str}..."):
+                refresh_result = refresh_day(target_date_str)
+            st.session_state.loaded_day = target_date_str if get_day_dataset_cache().get(target_date_str) else None
+            st.sidebar.success(f"{len(refresh_result['new'])} nova(s), {len(refresh_result['changed'])} alterada(s) e "
+                               f"{len(refresh_result['removed'])} removida(s) desde a última consulta.")
+        except Exception as e: st.sidebar.error(f"Erro ao atualizar: {type(e).__name__} - {e}")
+
     if st.sidebar.button("Limpar Cache da Data Atual", key="clear_cache_button"): # Nome do botão mais claro
-        if os.path.exists(json_filename_full_path):
-            try:
-                os.remove(json_filename_full_path)
-                st.sidebar.success(f"Cache JSON para {target_date_str} removido.")
-            except Exception as e: st.sidebar.error(f"Erro ao remover cache: {e}")
-        else: st.sidebar.info(f"Nenhum cache JSON para {target_date_str}.")
-        st.session_state.publications_mp = [] # Limpa da sessão também
+        try:
+            if get_publication_store().delete_day(target_date_str):
+                st.sidebar.success(f"Cache para {target_date_str} removido.")
+            else: st.sidebar.info(f"Nenhum cache para {target_date_str}.")
+        except Exception as e: st.sidebar.error(f"Erro ao remover cache: {e}")
+        st.session_state.loaded_day = None # Limpa da sessão também
         st.session_state.current_action = "Selecione..."
         st.session_state.action_result_message = None
         st.rerun()
 
+    with st.sidebar: render_watch_list_alerts()
+
+    if st.sidebar.checkbox("Mostrar painel de desempenho", key="show_metrics_panel"):
+        render_metrics_panel()
+
     # --- EXIBIÇÃO DAS PUBLICAÇÕES E OPÇÕES ---
-    if st.session_state.publications_mp:
-        st.header(f"Publicações do MP para {target_date_str} ({len(st.session_state.publications_mp)} encontradas)")
+    publications_mp = get_session_publications()
+    if publications_mp:
+        st.header(f"Publicações do MP para {target_date_str} ({len(publications_mp)} encontradas)")
         col1, col2 = st.columns(spec=[0.4, 0.6])
         with col1:
             st.subheader("Lista de Títulos:")
-            for i, pub in enumerate(st.session_state.publications_mp):
-                st.markdown(f"`{i+1}. {pub['title']}`")
+            pending_content_count = sum(1 for pub in publications_mp if pub.get("fullContent") is None)
+            if pending_content_count:
+                st.caption(f"Conteúdo de {pending_content_count} publicação(ões) ainda sendo carregado em segundo plano; "
+                           "as ações buscam na hora o que precisarem.")
+            render_title_list(publications_mp)
+            render_duplicate_groups(target_date_str, publications_mp)
         with col2:
             st.subheader("Ações:")
             
             action_options = [
                 "Selecione...", 
                 "Analisar publicação específica (Gemini)", 
+                "Pergunta em lote (Gemini)",
                 "Pesquisar por nomes (Busca Local)",
+                "Pesquisar em período (Busca Local)",
+                "Perguntar sobre um período (Gemini)",
                 "Salvar Resoluções como HTML",
+                "Baixar Resoluções (ZIP)",
                 "Exibir Detalhes da Publicação"
             ]
             
@@ -398,6 +2873,10 @@ def streamlit_app():
                 st.session_state.user_question_gemini = ""
                 st.session_state.selected_pub_index_for_details_str = ""
                 st.session_state.last_name_search_result = None # <--- ADICIONAR ESTA LINHA
+                st.session_state.range_search_results = None
+                st.session_state.batch_results = None
+                st.session_state.resolutions_export = None
+                st.session_state.period_question_result = None
 
 
             st.selectbox(
@@ -424,8 +2903,8 @@ def streamlit_app():
 
             # Lógica para cada ação
             elif st.session_state.current_action == "Analisar publicação específica (Gemini)":
-                if st.session_state.get('gemini_ready', False) and genai: 
-                    pub_numbers_gemini = [str(i+1) for i in range(len(st.session_state.publications_mp))]
+                if is_gemini_ready(): 
+                    pub_numbers_gemini = [str(i+1) for i in range(len(publications_mp))]
                     
                     # Callback para quando o selectbox de publicação para Gemini muda
                     def on_gemini_pub_select_change():
@@ -453,7 +2932,7 @@ def streamlit_app():
 
                     if st.session_state.selected_pub_index_for_gemini_str: # Procede se uma publicação foi selecionada
                         pub_idx_gemini = int(st.session_state.selected_pub_index_for_gemini_str) - 1
-                        selected_pub_data_gemini = st.session_state.publications_mp[pub_idx_gemini]
+                        selected_pub_data_gemini = publications_mp[pub_idx_gemini]
                         
                         st.markdown(f"**Analisando:** `{selected_pub_data_gemini['title']}`")
                         
@@ -467,15 +2946,24 @@ def streamlit_app():
 
                         if st.button("Analisar com Gemini", key=f"gemini_btn_analyze_{pub_idx_gemini}"):
                             if st.session_state.user_question_gemini: # Usa a pergunta do estado
+                                if not has_usable_content(selected_pub_data_gemini.get("fullContent")):
+                                    with st.spinner("Carregando conteúdo..."):
+                                        selected_pub_data_gemini = ensure_publications_content([selected_pub_data_gemini])[0]
                                 content_to_analyze = selected_pub_data_gemini.get("fullContent")
-                                # ... (lógica para buscar fullContent se não existir, como antes) ...
                                 if not content_to_analyze or "Erro" in content_to_analyze or "Conteúdo não" in content_to_analyze:
                                     st.warning("Conteúdo completo desta publicação não está disponível.")
                                 else:
-                                    with st.spinner("Gemini está pensando..."):
-                                        result = analyze_text_with_gemini_open_question(content_to_analyze, st.session_state.user_question_gemini)
-                                    st.subheader("Resposta do Gemini:")
-                                    st.markdown(result)
+                                    if GEMINI_STREAMING_ENABLED:
+                                        # O texto aparece conforme é gerado (tempo até o primeiro token)
+                                        st.subheader("Resposta do Gemini:")
+                                        result = st.write_stream(stream_text_with_gemini_open_question(
+                                            content_to_analyze, st.session_state.user_question_gemini))
+                                    else:
+                                        with st.spinner("Gemini está pensando..."):
+                                            result = analyze_text_with_gemini_open_question(content_to_analyze, st.session_state.user_question_gemini)
+                                        st.subheader("Resposta do Gemini:")
+                                        st.markdown(result)
+                                    st.caption(get_gemini_response_cache().format_stats())
                                     st.session_state.action_result_message = f"Análise da pub {st.session_state.selected_pub_index_for_gemini_str} concluída."
                             else:
                                 st.warning("Por favor, digite sua pergunta para o Gemini.")
@@ -489,15 +2977,56 @@ def streamlit_app():
                     st.warning("API do Gemini não configurada ou inicialização falhou.")
 
 
+            elif st.session_state.current_action == "Pergunta em lote (Gemini)":
+                if is_gemini_ready():
+                    st.subheader("Pergunta em Lote")
+                    batch_question = st.text_area("Pergunta para todas as publicações do dia:", height=100, key="batch_question_gemini")
+                    batch_filter_input = st.text_input(
+                        "Enviar apenas publicações que mencionem (opcional, busca local; separe variações com ';'):", key="batch_filter_terms")
+                    batch_col1, batch_col2 = st.columns(2)
+                    batch_max_concurrent = batch_col1.number_input("Chamadas simultâneas:", min_value=1, max_value=16,
+                                                                   value=GEMINI_MAX_CONCURRENT_CALLS, key="batch_max_concurrent")
+                    batch_requests_per_minute = batch_col2.number_input("Máximo de requisições por minuto (0 = sem limite):", min_value=0,
+                                                                        max_value=1000, value=GEMINI_BATCH_REQUESTS_PER_MINUTE, key="batch_rpm")
+
+                    if st.button("Analisar Publicações com Gemini", key="batch_gemini_btn"):
+                        if not batch_question.strip():
+                            st.warning("Por favor, digite sua pergunta para o Gemini.")
+                        else:
+                            with st.spinner("Verificando conteúdo das publicações..."):
+                                publications_mp = ensure_publications_content(publications_mp)
+                            batch_candidates = [(i + 1, pub) for i, pub in enumerate(publications_mp)
+                                                if has_usable_content(pub.get("fullContent"))]
+                            batch_filter_terms = [term.strip() for term in batch_filter_input.split(";") if term.strip()]
+                            if batch_filter_terms: # Pré-filtro local: publicações sem os termos nem são enviadas
+                                batch_matched_ids = set()
+                                for term in batch_filter_terms:
+                                    batch_matched_ids.update(get_publication_store().search(term, target_date_str, target_date_str))
+                                batch_candidates = [(number, pub) for number, pub in batch_candidates if pub["id"] in batch_matched_ids]
+                            if not batch_candidates:
+                                st.info("Nenhuma publicação do dia com conteúdo atende ao filtro informado.")
+                            else:
+                                batch_progress = st.progress(0.0, text=f"Analisando {len(batch_candidates)} publicação(ões)...")
+                                batch_answers = analyze_publications_batch(
+                                    [pub for _, pub in batch_candidates], batch_question, max_concurrent=int(batch_max_concurrent),
+                                    requests_per_minute=int(batch_requests_per_minute),
+                                    on_result=lambda done, total: batch_progress.progress(done / total, text=f"{done} de {total} analisadas..."))
+                                st.session_state.batch_results = [
+                                    {"Nº": number, "Título": pub["title"], "Resposta": answer}
+                                    for (number, pub), answer in zip(batch_candidates, batch_answers)]
+                                st.session_state.action_result_message = (
+                                    f"Análise em lote concluída: {len(batch_candidates)} de {len(publications_mp)} publicações enviadas.")
+                                st.rerun()
+                else:
+                    st.warning("API do Gemini não configurada ou inicialização falhou.")
+
             elif st.session_state.current_action == "Pesquisar por nomes (Busca Local)": # Renomear para "Pesquisa Local Avançada"
                 st.subheader("Pesquisa Local Avançada")
 
-                search_options = {
-                    "Eduardo Tostes": ["Dr. Eduardo Tostes", "Eduardo Tostes"],
-                    "Bruno H. R. Barros": ["Bruno Henrique Rigoni Barros"],
-                    "Promotoria de Franca": ["Promotoria de Justiça de Franca", "PJ de Franca", "Comarca de Franca"],
-                    "Outro termo...": [] # Placeholder para entrada customizada
-                }
+                # As opções vêm das listas de monitoramento (DEFAULT_SEARCH_TERMS_CONFIG)
+                search_options = {cfg["label"]: cfg["terms"] for cfg in DEFAULT_SEARCH_TERMS_CONFIG}
+                search_options["Todas as listas de monitoramento"] = [] # Uma única varredura com todos os termos
+                search_options["Outro termo..."] = [] # Placeholder para entrada customizada
                 
                 # Usar um estado para a seleção do tipo de pesquisa
                 if 'search_type_local' not in st.session_state:
@@ -518,15 +3047,17 @@ def streamlit_app():
                     terms_to_search_this_time = search_options[st.session_state.search_type_local]
 
                 if st.button("Iniciar Pesquisa Local", key="start_local_search_btn"):
-                    if terms_to_search_this_time:
-                        json_filename_base_for_search = f"DOE_MP_{target_date_str.replace('-', '')}.json"
-                        json_filename_full_path_for_search = os.path.join(PATH_JSON_FILES or ".", json_filename_base_for_search)
-                        
+                    if st.session_state.search_type_local == "Todas as listas de monitoramento":
+                        with st.spinner("Verificando listas de monitoramento..."):
+                            watch_list_results = search_publications_for_watch_lists(publications_mp)
+                        st.session_state.last_name_search_result = format_watch_list_results(watch_list_results)
+                        st.session_state.action_result_message = "Busca local concluída."
+                    elif terms_to_search_this_time:
                         with st.spinner("Realizando busca local..."):
                             search_result_string = search_publications_for_terms_local(
-                                st.session_state.publications_mp, 
+                                publications_mp, 
                                 terms_to_search_this_time,
-                                json_filename_full_path_for_search
+                                day=target_date_str
                             )
                         # Armazena no estado para exibição após o rerun
                         st.session_state.last_name_search_result = search_result_string 
@@ -539,6 +3070,107 @@ def streamlit_app():
                     # st.session_state.current_action = "Selecione..."
                     st.rerun() # Para exibir o last_name_search_result e a action_result_message
 
+            elif st.session_state.current_action == "Pesquisar em período (Busca Local)":
+                st.subheader("Pesquisa Local em Período")
+                range_period = st.date_input(
+                    "Período da pesquisa:",
+                    value=(max(date(2020, 1, 1), st.session_state.selected_date - timedelta(days=180)), st.session_state.selected_date),
+                    min_value=date(2020, 1, 1),
+                    max_value=date.today(),
+                    key="range_search_period"
+                )
+                range_terms_input = st.text_input("Termo(s) para pesquisar (separe variações com ';'):", key="range_search_terms")
+                range_max_results = st.number_input("Máximo de resultados:", min_value=1, max_value=1000, value=50, step=10,
+                                                    key="range_search_max_results")
+                range_terms = [term.strip() for term in range_terms_input.split(";") if term.strip()]
+
+                if st.button("Iniciar Pesquisa no Período", key="start_range_search_btn"):
+                    if not isinstance(range_period, tuple) or len(range_period) != 2:
+                        st.warning("Selecione a data inicial e a data final do período.")
+                    elif not range_terms:
+                        st.warning("Por favor, forneça um termo de pesquisa.")
+                    else:
+                        range_start_day, range_end_day = range_period[0].isoformat(), range_period[1].isoformat()
+                        # Dias fora do cache são buscados em segundo plano (um número limitado por clique, os mais
+                        # recentes primeiro); seus resultados entram no fim, até o limite de espera
+                        range_days = days_in_range(range_start_day, range_end_day)
+                        range_uncached_count = len(uncached_days(range_days))
+                        pending_day_futures = schedule_missing_days(range_days, max_days=RANGE_SEARCH_MAX_SCHEDULED_DAYS)
+                        if pending_day_futures:
+                            st.info(f"{len(pending_day_futures)} dia(s) do período ainda não estão no cache e estão sendo buscados "
+                                    "em segundo plano. Os resultados deles aparecerão à medida que chegarem.")
+                        range_progress = st.empty()
+                        range_results = []
+                        for range_result in iter_range_search_results(range_terms, range_start_day, range_end_day,
+                                                                      int(range_max_results), pending_day_futures,
+                                                                      max_wait_seconds=RANGE_SEARCH_MAX_WAIT_SECONDS):
+                            range_results.append(range_result)
+                            render_range_search_result(range_result) # Exibe assim que encontrado
+                            range_progress.caption(f"{len(range_results)} resultado(s) até agora...")
+                        st.session_state.range_search_results = range_results
+                        range_message = f"Busca no período concluída: {len(range_results)} resultado(s)."
+                        range_still_running = sum(1 for future in pending_day_futures if not future.done())
+                        range_not_scheduled = max(0, range_uncached_count - len(pending_day_futures))
+                        if range_still_running or range_not_scheduled:
+                            range_message += (f" {range_still_running + range_not_scheduled} dia(s) do período ainda não estavam no cache"
+                                              " e ficaram fora desta pesquisa; repita a pesquisa para incluí-los"
+                                              " (ou preencha o cache antes com o backfill).")
+                        st.session_state.action_result_message = range_message
+                        st.rerun()
+
+            elif st.session_state.current_action == "Perguntar sobre um período (Gemini)":
+                st.subheader("Pergunta sobre um Período")
+                question_period = st.date_input(
+                    "Período:",
+                    value=(max(date(2020, 1, 1), st.session_state.selected_date - timedelta(days=30)), st.session_state.selected_date),
+                    min_value=date(2020, 1, 1),
+                    max_value=date.today(),
+                    key="period_question_period"
+                )
+                period_question = st.text_area("Sua pergunta:", height=100, key="period_question_text",
+                                               placeholder="Ex.: Quem foi designado para a Promotoria de Justiça de Franca?")
+                st.caption("As publicações do período já no cache são ranqueadas localmente e só os trechos mais relevantes "
+                           "são enviados ao Gemini, numa única chamada.")
+                if st.button("Perguntar", key="period_question_btn"):
+                    if not isinstance(question_period, tuple) or len(question_period) != 2:
+                        st.warning("Selecione a data inicial e a data final do período.")
+                    elif not period_question.strip():
+                        st.warning("Por favor, digite sua pergunta para o Gemini.")
+                    else:
+                        with st.spinner("Buscando os trechos mais relevantes e consultando o Gemini..."):
+                            st.session_state.period_question_result = answer_question_over_period(
+                                period_question, question_period[0].isoformat(), question_period[1].isoformat())
+                        st.session_state.action_result_message = "Pergunta sobre o período concluída."
+                        st.rerun()
+
+            elif st.session_state.current_action == "Baixar Resoluções (ZIP)":
+                st.subheader("Resoluções do MP em ZIP")
+                export_period = st.date_input(
+                    "Período das resoluções:",
+                    value=(st.session_state.selected_date, st.session_state.selected_date),
+                    min_value=date(2020, 1, 1),
+                    max_value=date.today(),
+                    key="resolutions_export_period"
+                )
+                st.caption("Dias fora do cache têm a lista buscada na hora; só o HTML das resoluções que faltam é baixado.")
+                if st.button("Preparar ZIP", key="prepare_resolutions_zip_btn"):
+                    export_uncached_count = (len(uncached_days(days_in_range(export_period[0].isoformat(), export_period[1].isoformat())))
+                                             if isinstance(export_period, tuple) and len(export_period) == 2 else 0)
+                    if not isinstance(export_period, tuple) or len(export_period) != 2:
+                        st.warning("Selecione a data inicial e a data final do período.")
+                    elif export_uncached_count > RESOLUTIONS_EXPORT_MAX_UNCACHED_DAYS:
+                        st.warning(f"{export_uncached_count} dia(s) do período ainda não estão no cache, e a exportação busca no máximo "
+                                   f"{RESOLUTIONS_EXPORT_MAX_UNCACHED_DAYS} de uma vez. Reduza o período ou preencha o cache antes com "
+                                   f"`python chatbot_doe_v10_github.py backfill --inicio {export_period[0].isoformat()} --fim {export_period[1].isoformat()}`.")
+                    else:
+                        export_progress = st.progress(0.0, text="Preparando a exportação...")
+                        export_result = export_resolutions_zip(
+                            export_period[0].isoformat(), export_period[1].isoformat(),
+                            on_progress=lambda phase, done, total: export_progress.progress(done / total, text=f"{phase}: {done} de {total}"))
+                        st.session_state.resolutions_export = export_result
+                        st.session_state.action_result_message = f"{export_result['count']} resolução(ões) do MP prontas para download."
+                        st.rerun()
+
             # Exibição do resultado da busca local (fora do elif, mas dentro da col2)
             if st.session_state.current_action == "Pesquisar por nomes (Busca Local)" and st.session_state.get('last_name_search_result'):
                 st.subheader("Resultado da Pesquisa Local:")
@@ -550,9 +3182,66 @@ def streamlit_app():
                     # Não precisa resetar current_action, usuário ainda está nesta opção
                     st.rerun()
 
+            elif st.session_state.current_action == "Pesquisar em período (Busca Local)" and st.session_state.get('range_search_results') is not None:
+                st.subheader("Resultado da Pesquisa no Período:")
+                if not st.session_state.range_search_results:
+                    st.info("Nenhuma publicação encontrada no período (busca local).")
+                for range_result in st.session_state.range_search_results:
+                    render_range_search_result(range_result)
+                if st.button("Limpar Resultado da Busca", key="clear_range_search_res_btn"):
+                    st.session_state.range_search_results = None
+                    st.session_state.action_result_message = None
+                    st.rerun()
+
+            elif st.session_state.current_action == "Perguntar sobre um período (Gemini)" and st.session_state.get('period_question_result') is not None:
+                period_result = st.session_state.period_question_result
+                st.subheader("Resposta:")
+                st.markdown(period_result["answer"])
+                st.caption(f"{len(period_result['passages'])} trecho(s) de {period_result['ranked_count']} publicação(ões) mais relevantes, "
+                           f"encontrados em {period_result['retrieval_ms']:.0f} ms.")
+                for passage in period_result["passages"]:
+                    with st.expander(f"[{passage['number']}] {passage['day']} · {passage['title']}"):
+                        st.text(passage["text"])
+                if st.button("Limpar Resultado", key="clear_period_question_btn"):
+                    st.session_state.period_question_result = None
+                    st.session_state.action_result_message = None
+                    st.rerun()
+
+            elif st.session_state.current_action == "Pergunta em lote (Gemini)" and st.session_state.get('batch_results') is not None:
+                st.subheader("Resultado da Pergunta em Lote:")
+                st.dataframe(st.session_state.batch_results, use_container_width=True, hide_index=True)
+                st.caption(get_gemini_response_cache().format_stats())
+                st.download_button("Baixar Resultado (CSV)", data=build_batch_results_csv(st.session_state.batch_results),
+                                   file_name=f"pergunta_em_lote_{target_date_str}.csv", mime="text/csv", key="download_batch_csv")
+                if st.button("Limpar Resultado", key="clear_batch_res_btn"):
+                    st.session_state.batch_results = None
+                    st.session_state.action_result_message = None
+                    st.rerun()
+
+            elif st.session_state.current_action == "Baixar Resoluções (ZIP)" and st.session_state.get('resolutions_export') is not None:
+                export_result = st.session_state.resolutions_export
+                st.subheader("Resultado da Exportação:")
+                if export_result["failed_days"]:
+                    st.warning(f"Não foi possível obter a lista de {len(export_result['failed_days'])} dia(s): "
+                               + ", ".join(sorted(export_result["failed_days"])))
+                if export_result["failures"]:
+                    st.warning(f"HTML não obtido para {len(export_result['failures'])} resolução(ões): "
+                               + "; ".join(title for title, _ in list(export_result["failures"].values())[:20]))
+                if not export_result["count"]:
+                    st.info("Nenhuma resolução do MP encontrada no período.")
+                elif os.path.exists(export_result["path"]):
+                    with open(export_result["path"], "rb") as zip_file:
+                        st.download_button(f"Baixar ZIP ({export_result['count']} resolução(ões))", data=zip_file,
+                                           file_name=export_result["file_name"], mime="application/zip", key="download_resolutions_zip")
+                else: st.info("O arquivo preparado expirou. Prepare o ZIP novamente.")
+                if st.button("Limpar Resultado", key="clear_resolutions_export_btn"):
+                    st.session_state.resolutions_export = None
+                    st.session_state.action_result_message = None
+                    st.rerun()
+
             elif st.session_state.current_action == "Salvar Resoluções como HTML":
                 with st.spinner("Salvando resoluções como HTML..."):
-                    status_msg = save_resolutions_as_html_files(st.session_state.publications_mp, PATH_HTML_RESOLUTIONS)
+                    status_msg = save_resolutions_as_html_files(publications_mp, PATH_HTML_RESOLUTIONS)
                 if "Nenhuma" in status_msg: st.info(status_msg)
                 else: st.success(status_msg)
                 st.session_state.action_result_message = status_msg
@@ -560,8 +3249,8 @@ def streamlit_app():
                 st.rerun()
 
             elif st.session_state.current_action == "Exibir Detalhes da Publicação":
-                if st.session_state.publications_mp:
-                    pub_numbers_details = [str(i+1) for i in range(len(st.session_state.publications_mp))]
+                if publications_mp:
+                    pub_numbers_details = [str(i+1) for i in range(len(publications_mp))]
                     
                     # Guardar o valor atual do seletor de detalhes para comparar
                     previous_detail_selection = st.session_state.get('selected_pub_index_for_details_str', "")
@@ -582,23 +3271,14 @@ def streamlit_app():
                     # Se uma publicação está selecionada (e não é a string vazia)
                     if st.session_state.selected_pub_index_for_details_str:
                         pub_index = int(st.session_state.selected_pub_index_for_details_str) - 1
-                        selected_pub_data = st.session_state.publications_mp[pub_index]
+                        selected_pub_data = publications_mp[pub_index]
                         
                         # Busca/Verifica fullContent (COPIE A LÓGICA DE BUSCA DE CONTEÚDO DA OPÇÃO 1 SE NECESSÁRIO AQUI)
                         current_fc = selected_pub_data.get("fullContent")
-                        if not current_fc or "Erro" in (current_fc or "") or "Conteúdo não" in (current_fc or ""):
+                        if not has_usable_content(current_fc):
                             with st.spinner("Carregando conteúdo..."):
-                                cleaned_text, _, error_msg_fc = get_publication_content_and_html(selected_pub_data["slug"])
-                                if error_msg_fc:
-                                    st.session_state.publications_mp[pub_index]["fullContent"] = f"Erro: {error_msg_fc}"
-                                else:
-                                    st.session_state.publications_mp[pub_index]["fullContent"] = cleaned_text if cleaned_text else "Conteúdo não extraído."
-                                
-                                # Salva o JSON principal se o conteúdo foi buscado/atualizado
-                                json_filename_base_for_update = f"DOE_MP_{target_date_str.replace('-', '')}.json"
-                                json_filename_full_path_for_update = os.path.join(PATH_JSON_FILES or ".", json_filename_base_for_update)
-                                save_to_json(st.session_state.publications_mp, json_filename_full_path_for_update)
-                                selected_pub_data = st.session_state.publications_mp[pub_index] # Pega os dados atualizados
+                                # Atualiza no cache apenas a publicação cujo conteúdo foi buscado
+                                selected_pub_data = ensure_publications_content([selected_pub_data])[0]
                                 current_fc = selected_pub_data.get("fullContent") # Atualiza current_fc
 
                         st.markdown(f"#### Detalhes da Publicação") # Título geral
@@ -611,28 +3291,276 @@ def streamlit_app():
                         if "Erro" in current_fc or "Conteúdo não" in current_fc or not current_fc.strip():
                             st.warning(current_fc if current_fc.strip() else "Conteúdo não disponível ou vazio.")
                         else:
-                            markdown_friendly_content = current_fc.replace('\n\n', '<br><br>').replace('\n', '  \n')
-                            with st.expander("Ver Conteúdo Completo da Publicação", expanded=True):
-                                st.markdown(markdown_friendly_content, unsafe_allow_html=True)
-                        
-                        json_string_to_download = json.dumps(selected_pub_data, indent=4, ensure_ascii=False)
-                        st.download_button(
-                            label="Baixar Dados JSON Completos desta Publicação",
-                            data=json_string_to_download,
-                            file_name=f"pub_detalhes_{selected_pub_data.get('id', 'desconhecido')}.json",
-                            mime="application/json",
-                            key=f"download_json_details_{selected_pub_data.get('id')}"
-                        )
+                            with st.container(border=True):
+                                render_publication_content(current_fc, selected_pub_data["id"])
+                            similar_publications = [member for group in get_day_duplicate_groups(target_date_str, publications_mp)
+                                                    if any(member["id"] == selected_pub_data["id"] for member in group)
+                                                    for member in group if member["id"] != selected_pub_data["id"]]
+                            if similar_publications:
+                                st.markdown("**Publicações idênticas ou quase idênticas** (similaridade em relação à mais antiga do grupo):\n"
+                                            + format_duplicate_members(similar_publications, mark_first=False))
+
+                        # O JSON completo (com o rawHtmlContent, que não fica no cache em memória) só é montado quando pedido
+                        prepared_json = st.session_state.get("prepared_publication_json")
+                        if prepared_json and prepared_json[0] == selected_pub_data["id"]:
+                            st.download_button(
+                                label="Baixar Dados JSON Completos desta Publicação",
+                                data=prepared_json[1],
+                                file_name=f"pub_detalhes_{selected_pub_data.get('id', 'desconhecido')}.json",
+                                mime="application/json",
+                                key=f"download_json_details_{selected_pub_data.get('id')}"
+                            )
+                        elif st.button("Preparar Download dos Dados JSON Completos", key=f"prepare_json_details_{selected_pub_data.get('id')}"):
+                            # Um JSON preparado por sessão: o de outra publicação é descartado
+                            st.session_state.prepared_publication_json = (selected_pub_data["id"], build_publication_json(selected_pub_data["id"], selected_pub_data))
+                            st.rerun()
                         # NÃO definimos action_result_message aqui para "Detalhes exibidos",
                         # pois isso causaria a mensagem persistente.
                         # A mensagem de resultado é mais para ações que "concluem" algo.
                 else:
                     st.info("Carregue as publicações primeiro.")
 
-    elif not st.session_state.publications_mp and st.session_state.selected_date:
+    elif not publications_mp and st.session_state.selected_date:
         st.info(f"Nenhuma publicação do MP carregada para {st.session_state.selected_date.strftime('%Y-%m-%d')}. Clique em 'Carregar Publicações'.")
 
+# --- Linha de comando: backfill de um intervalo de datas (sem o Streamlit) ---
+def load_backfill_checkpoint(checkpoint_path, start_day, end_day):
+    checkpoint = load_publications_from_json(checkpoint_path) or {}
+    if checkpoint.get("start") != start_day or checkpoint.get("end") != end_day:
+        checkpoint = {"start": start_day, "end": end_day, "done": [], "failed": {}} # Outro intervalo: recomeça
+    return checkpoint
+
+def backfill_date_range(start_day, end_day, day_workers=4, content_workers=4, rate_per_second=DOE_FETCH_RATE_PER_SECOND,
+                        checkpoint_path=PATH_BACKFILL_CHECKPOINT, force=False, clean_processes=0):
+    # Preenche o cache para todas as datas do intervalo, `day_workers` dias em paralelo, com um
+    # único limitador de taxa para todas as requisições. Dias já completos no cache (ou marcados no
+    # checkpoint) são pulados; o checkpoint é gravado a cada dia, então um Ctrl-C ou uma falha
+    # pode ser retomado simplesmente rodando o mesmo comando de novo.
+    store = get_publication_store()
+    checkpoint = load_backfill_checkpoint(checkpoint_path, start_day, end_day)
+    done_days = set(checkpoint["done"])
+    # Sinalizado no Ctrl-C: todas as requisições passam pelo limitador, então os dias em andamento
+    # param na próxima requisição em vez de continuar baixando até o fim
+    stop_event = threading.Event()
+    rate_limiter = TokenBucket(rate_per_second, DOE_FETCH_BURST, stop_event=stop_event)
+
+    all_days = days_in_range(start_day, end_day)
+    pending_days = []
+    for day in all_days:
+        if force: pending_days.append(day); continue
+        status = store.get_day_status(day)
+        if day in done_days or (status and status[1]): continue
+        pending_days.append(day)
+    print(f"Backfill {start_day} a {end_day}: {len(all_days)} dias, {len(all_days) - len(pending_days)} já no cache, "
+          f"{len(pending_days)} a processar ({day_workers} dias em paralelo, até {rate_per_second:g} req/s).")
+
+    def process_day(day):
+        rate_limiter.acquire() # A requisição da lista do dia também conta para o limite global
+        # Outro processo (ex.: o app) pode ter completado o dia enquanto o backfill esperava na fila
+        publications = fetch_day_once(day, is_fresh=lambda day_status: not force and bool(day_status and day_status[1]),
+                                      max_workers=content_workers, rate_limiter=rate_limiter, clean_processes=clean_processes)
+        if publications is None: return store.get_day_status(day)
+        return len(publications), all(has_usable_content(pub.get("fullContent")) for pub in publications)
+
+    started_at = time.monotonic()
+    days_finished, days_processed, publications_processed = 0, 0, 0
+    executor = ThreadPoolExecutor(max_workers=max(1, day_workers))
+    futures = {executor.submit(process_day, day): day for day in pending_days}
+    try:
+        not_done = set(futures)
+        while not_done:
+            finished, not_done = wait(not_done, timeout=1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                day = futures[future]
+                days_finished += 1
+                try:
+                    publication_count, complete = future.result()
+                    days_processed += 1
+                    publications_processed += publication_count
+                    if complete:
+                        checkpoint["done"].append(day)
+                        checkpoint["failed"].pop(day, None)
+                    else:
+                        checkpoint["failed"][day] = "Publicações com erro de conteúdo (serão buscadas novamente)"
+                    status_msg = f"{publication_count} publicações" + ("" if complete else " (incompleto)")
+                except Exception as e:
+                    checkpoint["failed"][day] = f"{type(e).__name__} - {e}"
+                    status_msg = f"ERRO {type(e).__name__} - {e}"
+                save_to_json(checkpoint, checkpoint_path) # Gravado a cada dia, na thread principal
+                elapsed_minutes = max(time.monotonic() - started_at, 1e-9) / 60
+                print(f"[{days_finished}/{len(pending_days)}] {day}: {status_msg} | "
+                      f"{days_processed / elapsed_minutes:.1f} dias/min, {publications_processed / elapsed_minutes:.1f} publicações/min")
+    except KeyboardInterrupt:
+        print("\nInterrompido: salvando o checkpoint. Rode o mesmo comando para continuar de onde parou.")
+        stop_event.set()
+        save_to_json(checkpoint, checkpoint_path)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+
+    elapsed_minutes = max(time.monotonic() - started_at, 1e-9) / 60
+    print(f"Backfill concluído em {elapsed_minutes:.1f} min: {days_processed} dias, {publications_processed} publicações "
+          f"({days_processed / elapsed_minutes:.1f} dias/min, {publications_processed / elapsed_minutes:.1f} publicações/min). "
+          f"{len(checkpoint['failed'])} dias com falha registrados em {checkpoint_path}.")
+    print(f"Cliente DOE: {get_doe_client().format_stats()}")
+    print(f"Métricas do processo:\n{get_metrics().format_log_lines()}")
+    return checkpoint
+
+def compact_cache(remove_json_files=False):
+    # Converte o cache para o formato compacto (HTML bruto comprimido, sem duplicatas, fora da tabela
+    # principal) e compara tamanho e tempo de leitura de um dia antes e depois.
+    store = get_publication_store()
+    days = store.list_days()
+
+    def average_day_load_ms(load):
+        started_at = time.perf_counter()
+        for day in days: load(day)
+        return 1000 * (time.perf_counter() - started_at) / max(len(days), 1)
+
+    size_before = store.get_database_size()
+    # Caminho quente do formato anterior: a linha inteira, com o HTML bruto, para cada publicação do dia
+    load_before_ms = average_day_load_ms(store.load_day_full_rows)
+    migrated_count = store.compact_raw_html()
+    size_after = store.get_database_size()
+    load_after_ms = average_day_load_ms(store.load_day)
+    blob_count, html_size = store.get_html_blob_stats()
+
+    print(f"Cache SQLite ({store.db_path}): {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB"
+          + (f" ({100 * (size_after - size_before) / size_before:+.0f}%)" if size_before else ""))
+    print(f"HTML bruto: {migrated_count} publicações migradas; {blob_count} HTMLs distintos ({html_size / 1e6:.1f} MB sem compressão, "
+          f"codec {HTML_COMPRESSION_CODEC}).")
+    print(f"Leitura de um dia (média de {len(days)} dias): {load_before_ms:.2f} ms -> {load_after_ms:.2f} ms")
+
+    # Arquivos DOE_MP_AAAAMMDD.json das versões anteriores (importados para o banco na primeira execução)
+    json_files = sorted(filename for filename in (os.listdir(PATH_JSON_FILES) if os.path.isdir(PATH_JSON_FILES) else [])
+                        if re.fullmatch(r"DOE_MP_\d{8}\.json", filename))
+    if json_files:
+        json_paths = [os.path.join(PATH_JSON_FILES, filename) for filename in json_files]
+        started_at = time.perf_counter()
+        for path in json_paths:
+            with open(path, encoding="utf-8") as json_file: json.load(json_file)
+        json_load_ms = 1000 * (time.perf_counter() - started_at) / len(json_paths)
+        print(f"Cache JSON antigo: {len(json_paths)} arquivos, {sum(map(os.path.getsize, json_paths)) / 1e6:.1f} MB; "
+              f"leitura de um dia: {json_load_ms:.2f} ms.")
+        if remove_json_files:
+            removed_count = 0
+            for filename, path in zip(json_files, json_paths):
+                day = "-".join(re.fullmatch(r"DOE_MP_(\d{4})(\d{2})(\d{2})\.json", filename).groups())
+                if store.has_day(day): # Só apaga arquivos cujo dia já está no banco
+                    os.remove(path)
+                    removed_count += 1
+            print(f"{removed_count} arquivos JSON já importados foram removidos.")
+        else:
+            print("Esses arquivos já foram importados para o banco; use --remover-json para apagá-los.")
+
+# --- Linha de comando: monitoramento contínuo do dia atual, com alertas das listas de monitoramento ---
+def watch_list_alerts_for(day, watch_list_results):
+    return [{"day": day, "publication_id": pub_data["id"], "title": pub_data["title"], "label": label,
+             "terms": ", ".join(sorted({occ["term"] for occ in occurrences})), "match_count": len(occurrences),
+             "snippet": make_snippet(pub_data["fullContent"], occurrences[0]["start"])}
+            for pub_data, hits in watch_list_results for label, occurrences in hits.items()]
+
+def poll_day_for_watch_lists(day, pending_ids=(), content_workers=None, search_terms_config=None):
+    # Uma consulta do monitor: atualiza o dia (só as publicações novas ou alteradas são baixadas) e
+    # passa as listas de monitoramento apenas nelas e nas que ficaram sem conteúdo na consulta anterior
+    # (`pending_ids`). Os acertos vão para a caixa de saída (tabela watch_list_alerts).
+    # Devolve (resultado de refresh_day, nº de alertas gravados, ids ainda sem conteúdo).
+    store = get_publication_store()
+    with get_metrics().span("monitor_poll"):
+        refresh_result = refresh_day(day, max_workers=content_workers)
+        ids_to_scan = set(refresh_result["new"]) | set(refresh_result["changed"]) | set(pending_ids)
+        # As pendentes têm o conteúdo buscado de novo aqui (a varredura abaixo já recebe as cópias completas)
+        publications = ensure_publications_content([pub for pub in get_day_dataset_cache().get(day) if pub["id"] in ids_to_scan],
+                                                   max_workers=content_workers)
+        watch_list_results = search_publications_for_watch_lists(publications, search_terms_config)
+        alert_count = store.add_watch_list_alerts(watch_list_alerts_for(day, watch_list_results))
+    still_pending = {pub["id"] for pub in publications if not has_usable_content(pub.get("fullContent"))}
+    get_metrics().increment("monitor_new_publications", len(refresh_result["new"]))
+    get_metrics().increment("watch_list_alerts", alert_count)
+    return refresh_result, alert_count, still_pending
+
+def run_monitor(min_interval=DOE_MONITOR_MIN_INTERVAL_SECONDS, max_interval=DOE_MONITOR_MAX_INTERVAL_SECONDS,
+                content_workers=DOE_FETCH_MAX_WORKERS, once=False):
+    # Consulta a lista do dia atual indefinidamente (até Ctrl-C), com intervalo adaptativo: volta a
+    # `min_interval` quando há publicações novas ou alteradas (ou quando o dia vira) e dobra, até
+    # `max_interval`, quando não há novidades ou a API falha. O status de cada consulta fica na tabela
+    # meta ("monitor_status"), lido pela barra lateral do app junto com os alertas. As publicações do dia
+    # ainda sem conteúdo também ficam no status, para que a próxima execução (ex.: --uma-vez no cron)
+    # volte a passá-las pelas listas de monitoramento.
+    store = get_publication_store()
+    previous_status = json.loads(store.get_meta("monitor_status", "null")) or {}
+    interval, current_day, pending_ids = min_interval, previous_status.get("day"), set(previous_status.get("pending_ids", []))
+    last_ingest_at = previous_status.get("last_ingest_at")
+    print(f"Monitor iniciado: intervalo entre {min_interval:g} s e {max_interval:g} s, até {content_workers} conteúdos em paralelo.")
+    while True:
+        day = date.today().isoformat()
+        if day != current_day: current_day, pending_ids, interval = day, set(), min_interval
+        try:
+            refresh_result, alert_count, still_pending = poll_day_for_watch_lists(day, pending_ids, content_workers)
+            filled_ids = pending_ids - still_pending - set(refresh_result["removed"]) # Conteúdo obtido nesta consulta
+            pending_ids = still_pending
+            changed = bool(refresh_result["new"] or refresh_result["changed"] or refresh_result["removed"])
+            if changed or filled_ids: last_ingest_at = time.time()
+            interval = min_interval if changed else min(interval * 2, max_interval)
+            status_msg = (f"{len(refresh_result['new'])} nova(s), {len(refresh_result['changed'])} alterada(s), "
+                          f"{len(refresh_result['removed'])} removida(s), {len(filled_ids)} completada(s); {alert_count} alerta(s)")
+        except Exception as e:
+            interval = min(interval * 2, max_interval)
+            status_msg = f"ERRO {type(e).__name__} - {e}"
+        store.set_meta("monitor_status", json.dumps({"day": day, "last_poll_at": time.time(), "last_ingest_at": last_ingest_at,
+                                                     "next_poll_in": interval, "message": status_msg,
+                                                     "pending_ids": sorted(pending_ids)}, ensure_ascii=False))
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {day}: {status_msg}" + ("" if once else f" | próxima verificação em {interval:g} s"))
+        if once: return
+        time.sleep(interval * random.uniform(0.9, 1.1)) # Monitores em várias máquinas não consultam em sincronia
+
+def build_cli_parser():
+    parser = argparse.ArgumentParser(description="Chatbot DOE - MP: comandos de linha de comando (fora do Streamlit).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("backfill", help="Preenche o cache para um intervalo de datas.")
+    backfill_parser.add_argument("--inicio", required=True, help="Primeira data (AAAA-MM-DD).")
+    backfill_parser.add_argument("--fim", default=date.today().isoformat(), help="Última data (AAAA-MM-DD). Padrão: hoje.")
+    backfill_parser.add_argument("--dias-paralelos", type=int, default=4, help="Dias processados em paralelo.")
+    backfill_parser.add_argument("--conteudos-paralelos", type=int, default=4, help="Publicações buscadas em paralelo por dia.")
+    backfill_parser.add_argument("--taxa", type=float, default=DOE_FETCH_RATE_PER_SECOND,
+                                 help="Limite global de requisições por segundo (0 desativa).")
+    backfill_parser.add_argument("--checkpoint", default=PATH_BACKFILL_CHECKPOINT, help="Arquivo de progresso.")
+    backfill_parser.add_argument("--forcar", action="store_true", help="Busca novamente mesmo os dias já completos.")
+    backfill_parser.add_argument("--processos-limpeza", type=int, default=0,
+                                 help="Processos para extrair o texto do HTML (0 ou 1: nas próprias threads de busca).")
+    backfill_parser.set_defaults(handler=lambda args: backfill_date_range(
+        args.inicio, args.fim, day_workers=args.dias_paralelos, content_workers=args.conteudos_paralelos,
+        rate_per_second=args.taxa, checkpoint_path=args.checkpoint, force=args.forcar, clean_processes=args.processos_limpeza))
+
+    monitor_parser = subparsers.add_parser("monitorar", help="Consulta o dia atual continuamente e grava alertas das listas de monitoramento.")
+    monitor_parser.add_argument("--intervalo-min", type=float, default=DOE_MONITOR_MIN_INTERVAL_SECONDS,
+                                help="Segundos entre consultas logo após uma novidade.")
+    monitor_parser.add_argument("--intervalo-max", type=float, default=DOE_MONITOR_MAX_INTERVAL_SECONDS,
+                                help="Limite do intervalo, que dobra a cada consulta sem novidades.")
+    monitor_parser.add_argument("--conteudos-paralelos", type=int, default=DOE_FETCH_MAX_WORKERS, help="Publicações buscadas em paralelo.")
+    monitor_parser.add_argument("--uma-vez", action="store_true", help="Faz uma única consulta e sai (ex.: para o cron).")
+    monitor_parser.set_defaults(handler=lambda args: run_monitor(
+        args.intervalo_min, args.intervalo_max, content_workers=args.conteudos_paralelos, once=args.uma_vez))
+
+    compact_parser = subparsers.add_parser("compactar-cache", help="Converte o cache para o formato compacto e mostra a economia.")
+    compact_parser.add_argument("--remover-json", action="store_true",
+                                help="Apaga os arquivos DOE_MP_AAAAMMDD.json antigos cujo dia já está no banco.")
+    compact_parser.set_defaults(handler=lambda args: compact_cache(remove_json_files=args.remover_json))
+    return parser
+
+def run_cli(argv=None):
+    args = build_cli_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
 if __name__ == '__main__':
+    from streamlit import runtime
+    if not runtime.exists(): # "python chatbot_doe_v10_github.py <comando>", e não "streamlit run"
+        sys.exit(run_cli())
 
     # Garante que as pastas existem ao iniciar a app
     for path_to_create in [PATH_JSON_FILES, PATH_HTML_RESOLUTIONS]:
@@ -643,7 +3571,7 @@ if __name__ == '__main__':
             except OSError as e: 
                 print(f"AVISO: Não foi possível criar a pasta '{path_to_create}': {e}")
     
-    if not st.session_state.get('gemini_ready', False): # Checa a flag da sessão
+    if not is_gemini_ready():
         # Este aviso pode ser mostrado na sidebar dentro da streamlit_app se preferir
         print("\nAVISO NO CONSOLE: API Key/Lib Gemini não configurada. Análise com Gemini desabilitada.")
        
@@ -0,0 +1,47 @@
+# Fixtures dos testes: um PublicationStore num banco temporário e dias de publicações gerados (sem rede)
+# pelos mesmos geradores determinísticos da API simulada dos benchmarks (benchmarks/mock_doe_api.py).
+#
+# Uso (na raiz do projeto):
+#     python -m pytest -q
+import os
+import sys
+
+import pytest
+
+PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PASTA_PROJETO)
+sys.path.insert(0, os.path.join(PASTA_PROJETO, "benchmarks"))
+
+import chatbot_doe_v10_github as app # noqa: E402
+import mock_doe_api as mock # noqa: E402
+
+PUBLICATIONS_PER_DAY = 40
+
+def mock_day_summaries(day, publications_per_day=PUBLICATIONS_PER_DAY):
+    # A lista do dia como fetch_mp_publication_summaries a devolve: só as publicações do MP, sem conteúdo
+    return [{"id": summary["id"], "title": summary["title"], "slug": summary["slug"], "publicationDate": summary["date"],
+             "publicationTypeId": summary["publicationTypeId"], "fullContent": None, "rawHtmlContent": None}
+            for summary in mock.gerar_resumo_do_dia(day, publications_per_day)["publications"]
+            if summary["secondLevelSectionId"] == app.ID_MINISTERIO_PUBLICO_SECOND_LEVEL]
+
+def with_content(publication):
+    # A publicação com o HTML da API simulada e o texto extraído dele, como depois da carga do conteúdo
+    raw_html = mock.gerar_conteudo(publication["slug"])["content"]
+    return dict(publication, rawHtmlContent=raw_html, fullContent=app.clean_text_content(raw_html))
+
+def mock_day_publications(day, publications_per_day=PUBLICATIONS_PER_DAY):
+    return [with_content(publication) for publication in mock_day_summaries(day, publications_per_day)]
+
+@pytest.fixture
+def summaries_for():
+    return mock_day_summaries
+
+@pytest.fixture
+def publications_for():
+    return mock_day_publications
+
+@pytest.fixture
+def store(tmp_path):
+    publication_store = app.PublicationStore(str(tmp_path / "DOE_MP_cache.sqlite3"))
+    yield publication_store
+    publication_store.conn.close()
@@ -0,0 +1,57 @@
+import json
+import threading
+import time
+
+import pytest
+
+import chatbot_doe_v10_github as app
+
+def test_stop_event_wakes_a_waiting_acquire():
+    stop_event = threading.Event()
+    rate_limiter = app.TokenBucket(0.01, capacity=1, stop_event=stop_event)
+    rate_limiter.acquire() # O próximo token só viria em 100 s
+    errors = []
+
+    def acquire():
+        try: rate_limiter.acquire()
+        except InterruptedError as e: errors.append(e)
+    waiter = threading.Thread(target=acquire)
+    waiter.start()
+    stop_event.set()
+    waiter.join(timeout=2)
+
+    assert not waiter.is_alive() and len(errors) == 1
+    with pytest.raises(InterruptedError): rate_limiter.acquire()
+
+def test_ctrl_c_stops_in_flight_days_and_saves_the_checkpoint(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "get_publication_store", lambda: store)
+    started, finished = [], []
+
+    def fake_fetch_day_once(day, is_fresh, max_workers, rate_limiter, clean_processes):
+        # O primeiro dia não tem publicações; os outros fariam mil requisições
+        started.append(day)
+        try:
+            for _ in range(0 if day == "2024-01-02" else 1000): rate_limiter.acquire()
+            finished.append((day, None))
+            return []
+        except Exception as e:
+            finished.append((day, type(e)))
+            raise
+    monkeypatch.setattr(app, "fetch_day_once", fake_fetch_day_once)
+
+    real_wait, wait_calls = app.wait, []
+    def wait_then_ctrl_c(futures, timeout=None, return_when=None):
+        wait_calls.append(1)
+        if len(wait_calls) == 3: raise KeyboardInterrupt
+        return real_wait(futures, timeout=0.2, return_when=return_when)
+    monkeypatch.setattr(app, "wait", wait_then_ctrl_c)
+
+    checkpoint_path = tmp_path / "backfill_checkpoint.json"
+    with pytest.raises(KeyboardInterrupt):
+        app.backfill_date_range("2024-01-02", "2024-01-09", day_workers=2, rate_per_second=20, checkpoint_path=str(checkpoint_path))
+
+    deadline = time.monotonic() + 2
+    while len(finished) < len(started) and time.monotonic() < deadline: time.sleep(0.01)
+    assert sorted(finished) == sorted([("2024-01-02", None)] + [(day, InterruptedError) for day in started if day != "2024-01-02"])
+    assert len(started) < 8 # Os dias ainda na fila foram cancelados
+    assert json.loads(checkpoint_path.read_text(encoding="utf-8"))["done"] == ["2024-01-02"]
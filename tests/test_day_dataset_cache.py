@@ -0,0 +1,76 @@
+import pytest
+
+import chatbot_doe_v10_github as app
+
+DAY = "2024-01-03"
+
+@pytest.fixture
+def other_store(store):
+    # Segunda conexão ao mesmo banco, como a de outro processo (backfill, monitor, outro servidor)
+    other = app.PublicationStore(store.db_path)
+    yield other
+    other.conn.close()
+
+def test_repeated_reads_share_the_cached_day(store, publications_for):
+    store.save_day(DAY, publications_for(DAY))
+    cache = app.DayDatasetCache(store)
+
+    first = cache.get(DAY)
+    assert cache.get(DAY) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert all("rawHtmlContent" not in pub for pub in first)
+
+def test_update_publication_invalidates_the_day(store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+    cache = app.DayDatasetCache(store)
+    cache.get(DAY)
+
+    store.update_publication(publications[0]["id"], fullContent="Texto corrigido")
+    assert cache.get(DAY)[0]["fullContent"] == "Texto corrigido"
+    assert cache.misses == 2
+
+    store.update_publication(publications[0]["id"], rawHtmlContent="<p>Texto corrigido</p>")
+    cache.get(DAY)
+    assert cache.misses == 2 # Só o HTML bruto mudou, e ele não fica no cache
+
+def test_writes_from_another_connection_invalidate_the_day(store, other_store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+    cache = app.DayDatasetCache(store)
+    cache.get(DAY)
+
+    other_store.update_publication(publications[1]["id"], fullContent="Alterado em outro processo")
+    assert cache.get(DAY)[1]["fullContent"] == "Alterado em outro processo"
+
+    other_store.save_day(DAY, publications[:3])
+    assert [pub["id"] for pub in cache.get(DAY)] == [pub["id"] for pub in publications[:3]]
+
+    other_store.delete_day(DAY)
+    assert cache.get(DAY) == []
+
+def test_day_version_never_repeats(store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+    versions = [store.get_day_version(DAY)]
+
+    store.update_publication(publications[0]["id"], fullContent="Texto corrigido")
+    versions.append(store.get_day_version(DAY))
+    store.delete_day(DAY)
+    assert store.get_day_version(DAY) is None
+    store.save_day(DAY, publications)
+    versions.append(store.get_day_version(DAY))
+
+    assert len(set(versions)) == 3 # Um dia apagado e gravado de novo não volta a uma versão antiga
+
+def test_least_recently_used_day_is_evicted(store, publications_for):
+    days = ["2024-01-02", "2024-01-03", "2024-01-04"]
+    for day in days: store.save_day(day, publications_for(day))
+    cache = app.DayDatasetCache(store, max_days=2)
+
+    cache.get(days[0]); cache.get(days[1]); cache.get(days[0]); cache.get(days[2])
+    misses = cache.misses
+    cache.get(days[0])
+    assert cache.misses == misses
+    cache.get(days[1])
+    assert cache.misses == misses + 1
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+import chatbot_doe_v10_github as app
+
+URL = f"{app.URL_PUBLICATION_CONTENT_BASE}/publicacao-de-teste"
+
+class StubSession:
+    # Sessão com as respostas (status, cabeçalhos) na ordem em que a API as devolveria
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        status_code, headers = self.responses[self.calls]
+        self.calls += 1
+        return SimpleNamespace(status_code=status_code, headers=headers, content=b"{}")
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # As esperas entre tentativas são registradas em vez de dormir
+    recorded = []
+    monkeypatch.setattr(app.time, "sleep", recorded.append)
+    return recorded
+
+def client_with(responses, max_retries=4):
+    client = app.DOEClient(max_retries=max_retries)
+    client.session = StubSession(responses)
+    return client
+
+def test_429_waits_for_retry_after(sleeps):
+    client = client_with([(429, {"Retry-After": "7"}), (200, {})])
+
+    assert client.get(URL).status_code == 200
+    assert client.session.calls == 2
+    assert sleeps == [7.0]
+    assert client.get_stats()["retries"] == 1
+
+def test_retry_after_is_capped(sleeps):
+    client = client_with([(503, {"Retry-After": "3600"}), (200, {})])
+
+    assert client.get(URL).status_code == 200
+    assert sleeps == [app.DOE_BACKOFF_MAX_SECONDS]
+
+def test_5xx_is_retried_up_to_the_limit(sleeps):
+    client = client_with([(500, {}), (502, {}), (503, {}), (504, {})], max_retries=3)
+
+    assert client.get(URL).status_code == 504 # Esgotadas as tentativas, a última resposta volta ao chamador
+    assert client.session.calls == 4
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= min(app.DOE_BACKOFF_MAX_SECONDS, app.DOE_BACKOFF_BASE_SECONDS * 2 ** attempt)
+               for attempt, delay in enumerate(sleeps)) # Backoff exponencial com jitter
+
+@pytest.mark.parametrize("status_code", [400, 403, 404])
+def test_other_4xx_is_not_retried(sleeps, status_code):
+    client = client_with([(status_code, {}), (200, {})])
+
+    assert client.get(URL).status_code == status_code
+    assert client.session.calls == 1
+    assert sleeps == []
@@ -0,0 +1,39 @@
+import chatbot_doe_v10_github as app
+
+FIRST_DAY, REPUBLICATION_DAY = "2024-01-02", "2024-01-03"
+
+def republications(original, near_original, unrelated):
+    # Uma republicação exata, uma versão com uma palavra em cada cem trocada (Jaccard dos shingles em
+    # torno de 0,9) e um texto sem relação, no dia seguinte
+    words = near_original["fullContent"].split(" ")
+    for i in range(50, len(words), 100): words[i] = "retificação"
+    return [dict(original, id="republicacao-exata", slug="republicacao-exata"),
+            dict(near_original, id="quase-identica", slug="quase-identica", fullContent=" ".join(words)),
+            dict(unrelated, id="sem-relacao", slug="sem-relacao",
+                 fullContent="Comunicado sobre o expediente de fim de ano nas unidades da capital e do interior.")]
+
+def test_exact_and_near_duplicates_are_grouped_and_unrelated_text_is_not(store, publications_for, monkeypatch):
+    monkeypatch.setattr(app, "get_publication_store", lambda: store)
+    publications = publications_for(FIRST_DAY)
+    original, near_original = publications[0], max(publications[1:], key=lambda pub: len(pub["fullContent"]))
+    store.save_day(FIRST_DAY, publications)
+    store.save_day(REPUBLICATION_DAY, republications(original, near_original, publications[2]))
+
+    groups = app.find_duplicate_groups(["republicacao-exata", "quase-identica", "sem-relacao"])
+
+    assert [[(member["id"], member["day"]) for member in group] for group in sorted(groups, key=lambda group: group[0]["id"])] == sorted(
+        [[(original["id"], FIRST_DAY), ("republicacao-exata", REPUBLICATION_DAY)],
+         [(near_original["id"], FIRST_DAY), ("quase-identica", REPUBLICATION_DAY)]])
+    similarities = {group[1]["id"]: group[1]["similarity"] for group in groups}
+    assert similarities["republicacao-exata"] == 1.0
+    assert app.NEAR_DUPLICATE_THRESHOLD <= similarities["quase-identica"] < 1.0
+
+def test_threshold_controls_near_duplicates(store, publications_for):
+    publications = publications_for(FIRST_DAY)
+    near_original = max(publications[1:], key=lambda pub: len(pub["fullContent"]))
+    store.save_day(FIRST_DAY, publications)
+    store.save_day(REPUBLICATION_DAY, republications(publications[0], near_original, publications[2]))
+
+    assert {(a, b) for a, b, _ in store.find_duplicates(["quase-identica"], threshold=1.0)} == set()
+    assert {frozenset((a, b)) for a, b, _ in store.find_duplicates(["quase-identica"])} == {frozenset(("quase-identica", near_original["id"]))}
+    assert store.find_duplicates(["sem-relacao"]) == []
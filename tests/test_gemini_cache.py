@@ -0,0 +1,58 @@
+import pytest
+
+import chatbot_doe_v10_github as app
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Relógio controlado pelo teste: clock[0] é o "agora" visto pelo cache
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(app.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+    def make(ttl_seconds=3600, max_entries=100):
+        caches.append(app.GeminiResponseCache(str(tmp_path / "cache" / "gemini_cache.sqlite3"), ttl_seconds, max_entries))
+        return caches[-1]
+    yield make
+    for cache in caches: cache.conn.close()
+
+def test_entries_expire_after_the_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.put("chave", "modelo", "resposta")
+
+    clock[0] += 60
+    assert cache.get("chave") == "resposta"
+    clock[0] += 1
+    assert cache.get("chave") is None
+    assert cache.get_stats()["entries"] == 0 # A entrada vencida é apagada na leitura
+
+def test_put_evicts_the_least_recently_used(make_cache, clock):
+    cache = make_cache(max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.put(key, "modelo", f"resposta {key}")
+        clock[0] += 1
+    assert cache.get("a") == "resposta a" # "a" passa a ser a mais recente; "b" é a menos usada
+    clock[0] += 1
+
+    cache.put("d", "modelo", "resposta d")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["resposta a", "resposta c", "resposta d"]
+    assert cache.get_stats()["entries"] == 3
+
+def test_hit_and_miss_counters(make_cache, clock):
+    cache = make_cache()
+    assert cache.get("chave") is None
+    cache.put("chave", "modelo", "resposta")
+    assert cache.get("chave") == "resposta"
+    assert cache.get("chave") == "resposta"
+
+    assert cache.get_stats() == {"hits": 2, "misses": 1, "entries": 1, "hit_rate": 2 / 3}
+
+def test_entries_survive_a_new_connection(make_cache, clock):
+    make_cache().put("chave", "modelo", "resposta")
+
+    reopened = make_cache()
+    assert reopened.get("chave") == "resposta"
+    assert reopened.get_stats()["hits"] == 1 # Os contadores são do processo; as respostas ficam no arquivo
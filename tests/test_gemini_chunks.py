@@ -0,0 +1,42 @@
+import re
+
+import chatbot_doe_v10_github as app
+
+PARAGRAPH = ("Fica designado o Promotor de Justiça para atuar na comarca. " * 120).strip()
+
+def chunk_calls(monkeypatch, text, question="Quem foi designado?"):
+    # Os prompts e as chaves de cache de cada trecho, sem chamar o Gemini
+    calls = []
+    monkeypatch.setattr(app, "generate_gemini_answer", lambda prompt, cache_key, rate_limiter=None: calls.append((prompt, cache_key)) or "resposta")
+    app.analyze_long_text_with_gemini(text, question, max_workers=1)
+    return [call for call in calls if "parte " in call[0]]
+
+def test_same_chunk_text_in_another_part_gets_another_cache_key(monkeypatch):
+    calls = chunk_calls(monkeypatch, "\n\n".join([PARAGRAPH] * 3))
+
+    assert [re.search(r"parte \d+ de \d+", prompt).group() for prompt, _ in calls] == ["parte 1 de 3", "parte 2 de 3", "parte 3 de 3"]
+    assert len({cache_key for _, cache_key in calls}) == 3
+
+def test_same_chunk_text_with_another_total_gets_another_cache_key(monkeypatch):
+    first_of_two = chunk_calls(monkeypatch, "\n\n".join([PARAGRAPH] * 2))[0]
+    first_of_three = chunk_calls(monkeypatch, "\n\n".join([PARAGRAPH] * 3))[0]
+
+    assert first_of_two[0] != first_of_three[0]
+    assert first_of_two[1] != first_of_three[1]
+    assert chunk_calls(monkeypatch, "\n\n".join([PARAGRAPH] * 2))[0] == first_of_two # A mesma parte repete a chave
+
+def test_chunks_cover_the_whole_text():
+    paragraphs = [f"Parágrafo {i}: " + "palavra " * (i * 37 % 110) for i in range(60)]
+    text = "\n\n".join(paragraph.strip() for paragraph in paragraphs)
+
+    chunks = app.split_text_into_chunks(text, target_chars=1000)
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert "\n\n".join(chunks) == text # Parágrafos menores que o limite nunca são cortados
+
+def test_oversized_paragraphs_are_split_without_losing_text():
+    text = "Início.\n\n" + "\n".join("linha " * 150 for _ in range(4)) + "\n\n" + "x" * 2500 + "\n\nFim."
+
+    chunks = app.split_text_into_chunks(text, target_chars=500)
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert re.sub(r"\s", "", "".join(chunks)) == re.sub(r"\s", "", text)
+    assert chunks[0].startswith("Início.") and chunks[-1].endswith("Fim.")
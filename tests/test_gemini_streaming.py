@@ -0,0 +1,67 @@
+import warnings
+
+import pytest
+
+import chatbot_doe_v10_github as app
+
+PUBLICATION = "Fica designada a Promotora de Justiça Júlia Tostes para atuar na comarca de Franca."
+
+@pytest.fixture
+def gemini(monkeypatch, tmp_path):
+    # GEMINI_FAKE_MODEL=1 sem as latências simuladas, com o cache de respostas num arquivo temporário
+    response_cache = app.GeminiResponseCache(str(tmp_path / "gemini_cache.sqlite3"))
+    monkeypatch.setattr(app, "GEMINI_USE_FAKE_MODEL", True)
+    monkeypatch.setattr(app, "get_gemini_model", lambda: app.FakeGenerativeModel(first_token_seconds=0, token_delay_seconds=0))
+    monkeypatch.setattr(app, "get_gemini_response_cache", lambda: response_cache)
+    yield monkeypatch
+    response_cache.conn.close()
+
+def stream(question):
+    return list(app.stream_text_with_gemini_open_question(PUBLICATION, question))
+
+def test_normal_prompt_streams_the_whole_answer(gemini):
+    parts = stream("Quem foi designada?")
+
+    prompt = app.OPEN_QUESTION_PROMPT_TEMPLATE.format(publication_text=PUBLICATION, user_open_question="Quem foi designada?")
+    assert len(parts) > 1
+    assert "".join(parts).strip() == app.FakeGenerativeModel().generate_content(prompt).text
+    assert stream("Quem foi designada?") == ["".join(parts).strip()] # A segunda vez sai do cache, de uma vez
+
+def test_blocked_prompt_ends_in_block_message(gemini):
+    parts = stream("[[BLOQUEAR]] Quem foi designada?")
+
+    assert parts == ["BLOCK_OPEN_QUESTION: SAFETY - Bloqueio simulado pelo modelo falso"]
+    assert stream("[[BLOQUEAR]] Quem foi designada?") == parts # Bloqueios não ficam em cache
+
+def test_failure_mid_stream_keeps_the_partial_text(gemini):
+    parts = stream("[[FALHAR]] Quem foi designada?")
+
+    assert len(parts) > 2
+    assert parts[-1].startswith("\n\nERROR_API_OPEN_QUESTION: RuntimeError")
+    assert "".join(parts[:-1]).startswith("Resposta simulada")
+    assert app.is_gemini_failure(stream("[[FALHAR]] Quem foi designada?")[-1].strip()) # Falhas não ficam em cache
+
+def real_blocked_response(stream):
+    # A resposta de um prompt bloqueado como o google-generativeai a monta a partir da API
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        genai = pytest.importorskip("google.generativeai")
+    blocked = genai.protos.GenerateContentResponse(prompt_feedback={"block_reason": "SAFETY"})
+    if stream: return genai.types.GenerateContentResponse.from_iterator(iter([blocked]))
+    return genai.types.GenerateContentResponse.from_response(blocked)
+
+class BlockingModel:
+    def generate_content(self, prompt, stream=False):
+        return real_blocked_response(stream)
+
+def test_blocked_prompt_from_the_real_sdk_stream(gemini):
+    real_blocked_response(stream=True)
+    gemini.setattr(app, "get_gemini_model", BlockingModel)
+
+    assert stream("Quem foi designada?") == ["BLOCK_OPEN_QUESTION: SAFETY - Sem mensagem adicional"]
+
+def test_blocked_prompt_from_the_real_sdk_without_stream(gemini):
+    real_blocked_response(stream=False)
+    gemini.setattr(app, "get_gemini_model", BlockingModel)
+
+    assert app.generate_gemini_answer("[prompt]", "chave") == "BLOCK_OPEN_QUESTION: SAFETY - Sem mensagem adicional"
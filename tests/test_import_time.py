@@ -0,0 +1,26 @@
+import json
+import os
+import subprocess
+import sys
+
+import check_import_time as check
+
+BUDGET_MS = 250.0 # O mesmo orçamento padrão de benchmarks/check_import_time.py
+
+def test_import_stays_within_the_budget():
+    # Cada medida roda num processo novo (início a frio); vale a menor de três
+    app_costs_ms = []
+    for _ in range(3):
+        total_us, streamlit_us, _ = check.resumir(check.medir_importacao())
+        app_costs_ms.append((total_us - streamlit_us) / 1000)
+
+    assert min(app_costs_ms) <= BUDGET_MS
+
+def test_deferred_libraries_are_not_imported():
+    code = (f"import sys, json, {check.MODULO_APP}; "
+            f"print(json.dumps([name for name in {check.IMPORTACOES_ADIADAS!r} if name in sys.modules]))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=check.PASTA_PROJETO, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=check.PASTA_PROJETO))
+
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
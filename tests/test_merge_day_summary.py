@@ -0,0 +1,42 @@
+DAY = "2024-01-03"
+
+def test_merge_detects_new_changed_and_removed_publications(store, summaries_for, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications[:-1])
+    summaries = summaries_for(DAY)
+    changed = summaries[0] = dict(summaries[0], title=summaries[0]["title"] + " (RETIFICAÇÃO)")
+    removed = summaries.pop(1)
+
+    new_ids, changed_ids, removed_ids = store.merge_day_summary(DAY, summaries)
+
+    assert new_ids == [publications[-1]["id"]]
+    assert changed_ids == [changed["id"]]
+    assert removed_ids == [removed["id"]]
+    loaded = store.load_day(DAY)
+    assert [pub["id"] for pub in loaded] == [summary["id"] for summary in summaries]
+    contents = {pub["id"]: pub["fullContent"] for pub in loaded}
+    assert contents[changed["id"]] is None and contents[publications[-1]["id"]] is None # Serão buscados de novo
+    assert contents[summaries[1]["id"]] == publications[2]["fullContent"] # As demais mantêm o conteúdo
+    assert store.get_day_status(DAY) == (len(summaries), False)
+
+def test_merge_without_changes_keeps_content(store, summaries_for, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+
+    assert store.merge_day_summary(DAY, summaries_for(DAY)) == ([], [], [])
+    assert store.load_day(DAY, include_raw_html=True) == publications
+
+def test_removed_publication_leaves_search_and_returns(store, summaries_for, publications_for):
+    publications = publications_for(DAY)
+    target = publications[0]
+    publications[0] = dict(target, fullContent="Resolução sobre o plantão judiciário")
+    store.save_day(DAY, publications)
+    summaries = summaries_for(DAY)
+
+    store.merge_day_summary(DAY, summaries[1:])
+    assert target["id"] not in store.search("plantao judiciario")
+    assert store.get_publication(target["id"]) is not None # Continua no banco
+
+    assert store.merge_day_summary(DAY, summaries) == ([], [], [])
+    assert target["id"] in store.search("plantao judiciario")
+    assert store.load_day(DAY)[0]["id"] == target["id"]
@@ -0,0 +1,81 @@
+import json
+from datetime import date
+
+import pytest
+
+import chatbot_doe_v10_github as app
+from mock_doe_api import MockDOEAPI
+
+DAY = date.today().isoformat() # O monitor sempre consulta o dia atual
+
+class Monitor:
+    # A API simulada servindo as gravações de `recordings` (lista do dia e conteúdos), o app apontado
+    # para ela e para o banco temporário, e o registro do que cada execução baixou e varreu
+    def __init__(self, recordings, store):
+        self.recordings, self.store = recordings, store
+        self.fetched_slugs, self.scanned_ids = [], []
+        (recordings / "summary").mkdir(parents=True)
+        (recordings / "publications").mkdir()
+
+    def publish(self, publications):
+        # {slug: (título, conteúdo HTML)}; conteúdo "" faz a API responder sem o HTML
+        summary = [{"id": slug, "slug": slug, "title": title, "date": f"{DAY}T00:00:00", "publicationTypeId": "tipo",
+                    "secondLevelSectionId": app.ID_MINISTERIO_PUBLICO_SECOND_LEVEL} for slug, (title, _) in publications.items()]
+        (self.recordings / "summary" / f"{DAY}.json").write_text(json.dumps({"publications": summary}), encoding="utf-8")
+        for slug, (_, content) in publications.items():
+            (self.recordings / "publications" / f"{slug}.json").write_text(json.dumps({"content": content}), encoding="utf-8")
+
+    def run_once(self):
+        self.fetched_slugs.clear(); self.scanned_ids.clear()
+        app.run_monitor(min_interval=0, max_interval=0, once=True)
+        return json.loads(self.store.get_meta("monitor_status"))
+
+@pytest.fixture
+def monitor(store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = MockDOEAPI(gravacoes=str(tmp_path / "gravacoes")).iniciar()
+    monitor = Monitor(tmp_path / "gravacoes", store)
+    monkeypatch.setattr(app, "URL_SUMMARY_LIST_PUBLICATIONS", f"{server.base_url}/summary/list")
+    monkeypatch.setattr(app, "URL_PUBLICATION_CONTENT_BASE", f"{server.base_url}/publications")
+    monkeypatch.setattr(app, "get_publication_store", lambda: store)
+    day_cache = app.DayDatasetCache(store)
+    monkeypatch.setattr(app, "get_day_dataset_cache", lambda: day_cache)
+    monkeypatch.setattr(app, "get_doe_rate_limiter", lambda: app.TokenBucket(0))
+    scan_cache = {"lock": app.threading.Lock(), "entries": app.OrderedDict()}
+    monkeypatch.setattr(app, "get_watch_list_scan_cache", lambda: scan_cache)
+
+    fetch = app._fetch_publication_content_and_html
+    monkeypatch.setattr(app, "_fetch_publication_content_and_html",
+                        lambda slug, clean=True: monitor.fetched_slugs.append(slug) or fetch(slug, clean))
+    scan = app.search_publications_for_watch_lists
+    monkeypatch.setattr(app, "search_publications_for_watch_lists",
+                        lambda publications, config=None: monitor.scanned_ids.extend(pub["id"] for pub in publications) or scan(publications, config))
+    yield monitor
+    server.parar()
+
+def html(text):
+    return f'<div><p class="texto">{text}</p></div>'
+
+def test_pending_ids_carry_over_and_only_new_or_changed_publications_are_scanned(monitor):
+    monitor.publish({"pub-a": ("PORTARIA Nº 1", html("Designa o Dr. Eduardo Tostes para a comarca.")),
+                     "pub-b": ("PORTARIA Nº 2", ""), # Ainda sem conteúdo na API
+                     "pub-c": ("PORTARIA Nº 3", html("Expediente da secretaria."))})
+    status = monitor.run_once()
+    assert sorted(set(monitor.scanned_ids)) == ["pub-a", "pub-b", "pub-c"] # Dia fora do cache: tudo é novo
+    assert status["pending_ids"] == ["pub-b"]
+    assert [alert["publication_id"] for alert in monitor.store.list_watch_list_alerts()] == ["pub-a"]
+
+    # Outra execução (--uma-vez no cron): o conteúdo de pub-b chegou, pub-c foi retificada e pub-d é nova
+    monitor.publish({"pub-a": ("PORTARIA Nº 1", html("Designa o Dr. Eduardo Tostes para a comarca.")),
+                     "pub-b": ("PORTARIA Nº 2", html("Eduardo Tostes assume a promotoria.")),
+                     "pub-c": ("PORTARIA Nº 3 (RETIFICAÇÃO)", html("Expediente da secretaria, retificado.")),
+                     "pub-d": ("PORTARIA Nº 4", html("Férias do servidor."))})
+    status = monitor.run_once()
+    assert sorted(set(monitor.scanned_ids)) == ["pub-b", "pub-c", "pub-d"]
+    assert sorted(set(monitor.fetched_slugs)) == ["pub-b", "pub-c", "pub-d"]
+    assert status["pending_ids"] == []
+    assert sorted(alert["publication_id"] for alert in monitor.store.list_watch_list_alerts()) == ["pub-a", "pub-b"]
+
+    status = monitor.run_once()
+    assert monitor.scanned_ids == [] and monitor.fetched_slugs == [] # Nada mudou: só a lista do dia é consultada
+    assert status["message"].startswith("0 nova(s), 0 alterada(s), 0 removida(s), 0 completada(s)")
@@ -0,0 +1,88 @@
+import chatbot_doe_v10_github as app
+
+DAYS = ("2024-01-02", "2024-01-03")
+
+def save_days(store, publications_for):
+    publications = {day: publications_for(day) for day in DAYS}
+    for day, day_publications in publications.items(): store.save_day(day, day_publications)
+    return publications
+
+def test_phrase_search_finds_consecutive_terms_only(store, publications_for):
+    publications = save_days(store, publications_for)
+    target = publications[DAYS[0]][0]
+    store.update_publication(target["id"], fullContent="Fica designada a Promotora de Justiça Julia Tostes para a comarca.")
+
+    assert list(store.search("promotora de justica julia tostes")) == [target["id"]] # Sem acentos e sem maiúsculas
+    assert target["id"] not in store.search("julia promotora")
+
+def test_phrase_search_offsets_point_to_the_text(store, publications_for):
+    publications = save_days(store, publications_for)
+    text = "Designação: Eduardo Rigoni, promotor substituto."
+    store.update_publication(publications[DAYS[1]][0]["id"], fullContent=text)
+
+    offsets = store.search("eduardo rigoni")[publications[DAYS[1]][0]["id"]]
+    assert [text[offset:offset + len("Eduardo")] for offset in offsets] == ["Eduardo"]
+
+def test_phrase_search_respects_the_date_range(store, publications_for):
+    publications = save_days(store, publications_for)
+    for day in DAYS: store.update_publication(publications[day][0]["id"], fullContent="Comunicado da Corregedoria Geral")
+
+    assert set(store.search("corregedoria geral")) == {publications[day][0]["id"] for day in DAYS}
+    assert list(store.search("corregedoria geral", DAYS[1], DAYS[1])) == [publications[DAYS[1]][0]["id"]]
+
+def test_removed_content_leaves_the_index(store, publications_for):
+    publications = save_days(store, publications_for)
+    target = publications[DAYS[0]][0]
+    store.update_publication(target["id"], fullContent="Portaria sobre a vaga de entrância final")
+    assert target["id"] in store.search("entrancia final")
+
+    store.update_publication(target["id"], fullContent="Conteúdo não disponível.")
+    assert target["id"] not in store.search("entrancia final")
+
+def test_term_ids_follow_a_rebuild_in_another_connection(store, publications_for, tmp_path):
+    # Outro processo reconstrói o índice: os mesmos termos ganham outros term_id
+    publications = save_days(store, publications_for)
+    target = publications[DAYS[0]][0]
+    store.update_publication(target["id"], fullContent="Ato da Ouvidoria Regional")
+    assert list(store.search("ouvidoria regional")) == [target["id"]]
+
+    other = app.PublicationStore(store.db_path)
+    with other._index_transaction():
+        other.index.clear()
+        other.index.index_publication("outra", DAYS[1], "termos novos antes: regional ouvidoria")
+        other.index.index_publication(target["id"], DAYS[0], "Ato da Ouvidoria Regional")
+    other.conn.close()
+
+    assert list(store.search("ouvidoria regional")) == [target["id"]]
+    assert list(store.search("regional ouvidoria")) == ["outra"]
+
+def test_rolled_back_write_leaves_no_cached_term_ids(store, publications_for):
+    save_days(store, publications_for)
+    try:
+        with store._index_transaction():
+            store.index.index_publication("desfeita", DAYS[0], "palavraquenuncaficou")
+            raise RuntimeError("falha no meio da gravação")
+    except RuntimeError: pass
+
+    assert "palavraquenuncaficou" not in store.index._term_ids
+    assert store.search("palavraquenuncaficou") == {}
+
+def test_bm25_ranks_the_most_relevant_publication_first(store, publications_for):
+    publications = save_days(store, publications_for)
+    best, other = publications[DAYS[0]][0]["id"], publications[DAYS[1]][0]["id"]
+    store.update_publication(best, fullContent="Ouvidoria. Relatório da ouvidoria sobre a ouvidoria regional.")
+    store.update_publication(other, fullContent="Menção única à ouvidoria num texto bem mais longo " + "sobre outros assuntos " * 30)
+
+    ranking = [pub_id for pub_id, _ in store.rank_publications("O que diz a ouvidoria?")]
+    assert ranking[:2] == [best, other]
+    assert store.rank_publications("O que diz a ouvidoria?", DAYS[1], DAYS[1])[0][0] == other
+
+def test_bm25_cache_follows_writes_from_another_connection(store, publications_for):
+    publications = save_days(store, publications_for)
+    target = publications[DAYS[1]][3]["id"]
+    assert target not in [pub_id for pub_id, _ in store.rank_publications("Qual promotora da ouvidoria?")] # Carrega o cache do BM25
+
+    other = app.PublicationStore(store.db_path)
+    other.update_publication(target, fullContent="Relatório da ouvidoria, assinado pela promotora.")
+    other.conn.close()
+    assert store.rank_publications("Qual promotora da ouvidoria?")[0][0] == target
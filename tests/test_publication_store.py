@@ -0,0 +1,76 @@
+import json
+
+import chatbot_doe_v10_github as app
+
+DAY = "2024-01-03"
+
+def test_save_and_load_day_round_trip(store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+
+    hot_fields = [field for field in app.PUBLICATION_FIELDS_TO_COLUMNS if field != "rawHtmlContent"]
+    assert store.load_day(DAY) == [{field: pub[field] for field in hot_fields} for pub in publications]
+    assert store.load_day(DAY, include_raw_html=True) == publications
+    assert store.get_publication(publications[0]["id"]) == publications[0]
+    assert store.get_day_status(DAY) == (len(publications), True)
+    assert store.list_days() == [DAY]
+
+def test_save_day_replaces_the_day(store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+    store.save_day(DAY, publications[1:])
+
+    assert [pub["id"] for pub in store.load_day(DAY)] == [pub["id"] for pub in publications[1:]]
+    assert store.get_publication(publications[0]["id"]) is None
+
+def test_day_without_content_is_incomplete(store, summaries_for):
+    summaries = summaries_for(DAY)
+    store.save_day(DAY, summaries)
+
+    assert store.get_day_status(DAY) == (len(summaries), False)
+    assert store.get_day_status("2024-01-04") is None
+
+def test_delete_day(store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+
+    assert store.delete_day(DAY) == len(publications)
+    assert not store.has_day(DAY)
+    assert store.load_day(DAY) == []
+
+def test_import_json_cache(store, publications_for, tmp_path):
+    # Os arquivos DOE_MP_AAAAMMDD.json das versões anteriores (indent=4) entram no banco, um dia por arquivo
+    json_dir = tmp_path / "DOE_JSONs_Cloud"
+    json_dir.mkdir()
+    days = {"2024-01-02": publications_for("2024-01-02"), DAY: publications_for(DAY)}
+    for day, publications in days.items():
+        (json_dir / f"DOE_MP_{day.replace('-', '')}.json").write_text(json.dumps(publications, indent=4), encoding="utf-8")
+    (json_dir / "outro_arquivo.json").write_text("[]", encoding="utf-8")
+    (json_dir / "DOE_MP_20240104.json").write_text("{ inválido", encoding="utf-8")
+
+    assert store.import_json_cache(str(json_dir)) == (2, sum(map(len, days.values())))
+    assert store.list_days() == sorted(days)
+    for day, publications in days.items(): assert store.load_day(day, include_raw_html=True) == publications
+    assert store.import_json_cache(str(tmp_path / "nao_existe")) == (0, 0)
+
+def test_identical_html_is_stored_once(store, publications_for):
+    publications = publications_for(DAY)
+    copy = dict(publications[1], rawHtmlContent=publications[0]["rawHtmlContent"], fullContent=publications[0]["fullContent"])
+    store.save_day(DAY, [publications[0], copy])
+
+    assert store.get_html_blob_stats()[0] == 1
+    assert store.get_raw_html(copy["id"]) == publications[0]["rawHtmlContent"]
+
+def test_replaced_html_without_references_is_deleted(store, publications_for):
+    publications = publications_for(DAY)
+    store.save_day(DAY, publications)
+    blob_count = store.get_html_blob_stats()[0]
+
+    store.update_publication(publications[0]["id"], rawHtmlContent="<p>Texto corrigido</p>")
+    assert store.get_raw_html(publications[0]["id"]) == "<p>Texto corrigido</p>"
+    assert store.get_html_blob_stats()[0] == blob_count # O HTML anterior, sem outra referência, foi apagado
+
+    store.save_day(DAY, publications[1:])
+    assert store.get_html_blob_stats()[0] == blob_count - 1
+    store.delete_day(DAY)
+    assert store.get_html_blob_stats() == (0, 0)
@@ -0,0 +1,39 @@
+import chatbot_doe_v10_github as app
+
+DAYS = ["2024-01-02", "2024-01-03", "2024-01-04"]
+TERMS = ["promotora", "comarca"]
+
+def save_days(store, publications_for):
+    for day in DAYS: store.save_day(day, publications_for(day))
+
+def range_results(terms, max_results):
+    return [result["id"] for result in app.iter_range_search_results(terms, DAYS[0], DAYS[-1], max_results)]
+
+def test_search_limit_returns_a_subset(store, publications_for):
+    save_days(store, publications_for)
+    everything = store.search("comarca")
+
+    limited = store.search("comarca", limit=5)
+    assert len(limited) == 5
+    assert all(everything[pub_id] == offsets for pub_id, offsets in limited.items())
+    assert store.search("comarca", limit=len(everything) + 10) == everything
+
+def test_early_stop_queries_only_the_days_it_needs(store, publications_for, monkeypatch):
+    save_days(store, publications_for)
+    monkeypatch.setattr(app, "get_publication_store", lambda: store)
+    calls = []
+    search = store.search
+    monkeypatch.setattr(store, "search", lambda *args, **kwargs: calls.append(args) or search(*args, **kwargs))
+
+    results = list(app.iter_range_search_results(TERMS, DAYS[0], DAYS[-1], max_results=3))
+
+    assert [result["day"] for result in results] == [DAYS[-1]] * 3 # O dia mais recente já preenche o limite
+    assert {args[1:] for args in calls} == {(DAYS[-1], DAYS[-1], 3)}
+
+def test_limited_results_follow_the_unlimited_order(store, publications_for, monkeypatch):
+    save_days(store, publications_for)
+    monkeypatch.setattr(app, "get_publication_store", lambda: store)
+    everything = range_results(TERMS, 10_000)
+
+    assert len(everything) > 40
+    for max_results in (1, 7, 30, len(everything)): assert range_results(TERMS, max_results) == everything[:max_results]
@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import chatbot_doe_v10_github as app
+
+CALLERS = 8
+
+def call_together(single_flight, key, func):
+    # Todas as threads chamam do() ao mesmo tempo; a função só termina depois que todas chegaram
+    barrier, release, calls = threading.Barrier(CALLERS + 1), threading.Event(), []
+
+    def slow_func():
+        calls.append(threading.get_ident())
+        release.wait(timeout=5)
+        return func()
+
+    def caller():
+        barrier.wait()
+        try: return single_flight.do(key, slow_func)
+        except Exception as e: return e
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        futures = [executor.submit(caller) for _ in range(CALLERS)]
+        barrier.wait()
+        time.sleep(0.2) # Tempo para todas as threads entrarem em do() antes de a primeira terminar
+        release.set()
+        return calls, [future.result() for future in futures]
+
+def test_concurrent_callers_share_one_execution():
+    single_flight = app.SingleFlight()
+    result = object()
+
+    calls, results = call_together(single_flight, "day:2024-01-03", lambda: result)
+    assert len(calls) == 1
+    assert all(item is result for item in results)
+
+def test_concurrent_callers_share_the_exception():
+    single_flight = app.SingleFlight()
+    error = RuntimeError("API indisponível")
+    def fail(): raise error
+
+    calls, results = call_together(single_flight, "day:2024-01-03", fail)
+    assert len(calls) == 1
+    assert all(item is error for item in results)
+
+def test_key_is_released_after_the_call():
+    single_flight = app.SingleFlight()
+    calls = []
+
+    assert single_flight.do("day:2024-01-03", lambda: calls.append(1) or len(calls)) == 1
+    assert single_flight.do("day:2024-01-03", lambda: calls.append(1) or len(calls)) == 2 # Nova chamada, nova execução
+    with pytest.raises(ValueError): single_flight.do("day:2024-01-04", int, "x")
+    assert single_flight.do("day:2024-01-04", lambda: "ok") == "ok"
@@ -0,0 +1,70 @@
+import random
+
+import chatbot_doe_v10_github as app
+
+def naive_scan(watch_lists, text):
+    # Referência: cada termo procurado separadamente, palavra a palavra, sobre os mesmos tokens normalizados
+    tokens = [(app.normalize_search_token(match.group()), match.start(), match.end()) for match in app.TOKEN_PATTERN.finditer(text)]
+    hits = {}
+    for label, terms in watch_lists:
+        for term in terms:
+            term_tokens = [token for token, _ in app.tokenize_for_index(term)]
+            for i in range(len(tokens) - len(term_tokens) + 1):
+                if [token for token, _, _ in tokens[i:i + len(term_tokens)]] == term_tokens:
+                    hits.setdefault(label, []).append({"term": term, "start": tokens[i][1], "end": tokens[i + len(term_tokens) - 1][2]})
+    return hits
+
+def sorted_hits(hits):
+    return {label: sorted(label_hits, key=lambda hit: (hit["start"], hit["end"], hit["term"])) for label, label_hits in hits.items()}
+
+def assert_same_as_naive(watch_lists, text):
+    hits = app.WatchListMatcher(watch_lists).scan(text)
+    assert sorted_hits(hits) == sorted_hits(naive_scan(watch_lists, text))
+    return hits
+
+def test_matching_ignores_case_and_accents():
+    watch_lists = (("Franca", ("Promotoria de Justiça de Franca",)),)
+    text = "Designação para a PROMOTORIA DE JUSTICA DE FRANCA e para a promotoria de justiça de franca."
+
+    hits = assert_same_as_naive(watch_lists, text)
+    assert [text[hit["start"]:hit["end"]] for hit in hits["Franca"]] == ["PROMOTORIA DE JUSTICA DE FRANCA", "promotoria de justiça de franca"]
+
+def test_multi_word_terms_match_whole_words_only():
+    watch_lists = (("Franca", ("PJ de Franca",)),)
+
+    assert assert_same_as_naive(watch_lists, "Atuará na PJ de Francana e na PJ de Franca.") == {"Franca": [{"term": "PJ de Franca", "start": 30, "end": 42}]}
+    assert assert_same_as_naive(watch_lists, "PJ de, Franca") != {} # Pontuação entre as palavras não impede o acerto
+    assert assert_same_as_naive(watch_lists, "PJ Franca") == {}
+
+def test_overlapping_terms_across_lists():
+    watch_lists = (("Eduardo", ("Eduardo Tostes", "Dr. Eduardo Tostes")),
+                   ("Tostes", ("Tostes",)),
+                   ("Rigoni", ("Tostes Rigoni", "Eduardo Tostes Rigoni Barros")))
+    text = "Portaria: o Dr. Eduardo Tostes Rigoni fica designado."
+
+    hits = assert_same_as_naive(watch_lists, text)
+    assert {label: sorted(hit["term"] for hit in label_hits) for label, label_hits in hits.items()} == {
+        "Eduardo": ["Dr. Eduardo Tostes", "Eduardo Tostes"], "Tostes": ["Tostes"], "Rigoni": ["Tostes Rigoni"]}
+    assert all(app.normalize_search_token(text[hit["start"]:hit["end"]]).replace(".", "") ==
+               app.normalize_search_token(hit["term"]).replace(".", "")
+               for label_hits in hits.values() for hit in label_hits)
+
+def test_random_texts_match_the_naive_scan():
+    rng = random.Random(7)
+    watch_lists = app.watch_lists_from_config(app.DEFAULT_SEARCH_TERMS_CONFIG)
+    terms = [term for _, list_terms in watch_lists for term in list_terms]
+    words = "designar promotor comarca Franca Eduardo Tostes PJ de da Justiça Promotoria Dr. Bruno Barros".split()
+    for _ in range(200):
+        pieces = [rng.choice(words) for _ in range(rng.randint(0, 60))]
+        for _ in range(rng.randint(0, 3)):
+            term = rng.choice(terms)
+            pieces.insert(rng.randint(0, len(pieces)), rng.choice((term, term.upper(), term.lower())))
+        assert_same_as_naive(watch_lists, " ".join(pieces))
+
+def test_same_lists_as_the_original_substring_loop_on_plain_text():
+    # O laço original (term.lower() in texto.lower()) e o autômato concordam quando os termos aparecem como palavras inteiras
+    watch_lists = app.watch_lists_from_config(app.DEFAULT_SEARCH_TERMS_CONFIG)
+    text = "Resolucao: o DR. EDUARDO TOSTES atuara na Comarca de Franca, com Bruno Henrique Rigoni Barros."
+
+    matched_labels = {label for label, terms in watch_lists if any(term.lower() in text.lower() for term in terms)}
+    assert set(assert_same_as_naive(watch_lists, text)) == matched_labels